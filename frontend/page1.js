@@ -1600,23 +1600,24 @@ async function initializePage1() {
     async function updateScannedEchosAnalysis() {
         const scoreThres = parseFloat(calculateTotalScore());
     
-        const promises = scannedProfiles.map(item => {
-            const payload = {
-                coef: userSelection.entry_weights,
-                score_thres: scoreThres,
-                scheduler: userSelection.discard_scheduler,
-                profile: item.profile,
-                locked_keys: userSelection.locked_keys
-            };
-            return fetch(`${API_BASE_URL}/api/get_full_analysis`, {
+        const payload = {
+            coef: userSelection.entry_weights,
+            score_thres: scoreThres,
+            scheduler: userSelection.discard_scheduler,
+            profiles: scannedProfiles.map(item => item.profile),
+            locked_keys: userSelection.locked_keys
+        };
+    
+        try {
+            const response = await fetch(`${API_BASE_URL}/api/get_batch_analysis`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload)
-            }).then(res => res.ok ? res.json() : Promise.reject(`HTTP error! status: ${res.status}`));
-        });
-    
-        try {
-            const results = await Promise.all(promises);
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const results = await response.json();
             results.forEach((result, index) => {
                 scannedProfiles[index].analysis = result;
             });
@@ -72,6 +72,19 @@ async def scan_echo_endpoint():
     profiles = await api.scan_echo()
     return profiles
 
+@app.post("/api/get_inventory")
+async def get_inventory_endpoint(data: dict):
+    """
+    Returns the stored inventory, optionally filtered by name, suit and level range.
+    """
+    profiles = await api.get_inventory(
+        name=data.get("name") or None,
+        suit=data.get("suit") or None,
+        min_level=int(data.get("min_level", 0)),
+        max_level=int(data.get("max_level", 25)),
+    )
+    return profiles
+
 @app.get("/api/get_entry_coef/{character_name}")
 async def get_entry_coef(character_name: str):
     return coef_data.get(character_name, {})
@@ -92,6 +105,29 @@ async def get_brief_analysis_endpoint(data: dict):
     result = await api.get_brief_analysis(profile, coef, score_thres, locked_keys)
     return result
 
+@app.post("/api/get_score_distribution")
+async def get_score_distribution_endpoint(data: dict):
+    coef_data = data.get("coef", {})
+    profile_data = data.get("profile", None)
+    locked_keys = data.get("locked_keys", [])
+
+    coef = EntryCoef()
+    for key, value in coef_data.items():
+        if hasattr(coef, key):
+            setattr(coef, key, value)
+
+    if profile_data:
+        profile = EchoProfile().from_dict(profile_data)
+    else:
+        profile = EchoProfile(level=0)
+
+    distribution = await api.get_score_distribution(profile, coef, locked_keys)
+    return {
+        "scores": distribution.scores.tolist(),
+        "pmf": distribution.pmf.tolist(),
+        "cdf": distribution.cdf.tolist()
+    }
+
 @app.post("/api/get_full_analysis")
 async def get_full_analysis_endpoint(data: dict):
     coef_data_dict = data.get("coef", {})
@@ -128,6 +164,124 @@ async def get_full_analysis_endpoint(data: dict):
 
     return result
 
+@app.post("/api/get_sensitivity")
+async def get_sensitivity_endpoint(data: dict):
+    coef_data_dict = data.get("coef", {})
+    score_thres = data.get("score_thres", 0.0)
+    scheduler_thresholds = data.get("scheduler", [])
+    profile_data = data.get("profile", None)
+    locked_keys = data.get("locked_keys", [])
+    bandwidth = data.get("bandwidth", 0.5)
+
+    coef = EntryCoef()
+    for key, value in coef_data_dict.items():
+        if hasattr(coef, key):
+            setattr(coef, key, value)
+
+    if profile_data:
+        profile = EchoProfile().from_dict(profile_data)
+    else:
+        profile = EchoProfile(level=0)
+
+    scheduler = DiscardScheduler()
+    if len(scheduler_thresholds) == 4:
+        scheduler.level_5_9 = scheduler_thresholds[0]
+        scheduler.level_10_14 = scheduler_thresholds[1]
+        scheduler.level_15_19 = scheduler_thresholds[2]
+        scheduler.level_20_24 = scheduler_thresholds[3]
+
+    result = await api.get_sensitivity(profile, coef, score_thres, scheduler, locked_keys, bandwidth)
+
+    for total in (result.expected_total_wasted_exp, result.expected_total_wasted_tuner):
+        if total.value == float('inf'):
+            total.value = -1
+
+    return result
+
+@app.post("/api/get_batch_analysis")
+async def get_batch_analysis_endpoint(data: dict):
+    coef_data_dict = data.get("coef", {})
+    score_thres = data.get("score_thres", 0.0)
+    scheduler_thresholds = data.get("scheduler", [])
+    profiles_data = data.get("profiles", [])
+    locked_keys = data.get("locked_keys", [])
+
+    coef = EntryCoef()
+    for key, value in coef_data_dict.items():
+        if hasattr(coef, key):
+            setattr(coef, key, value)
+
+    profiles = [EchoProfile().from_dict(profile_data) for profile_data in profiles_data]
+
+    scheduler = DiscardScheduler()
+    if len(scheduler_thresholds) == 4:
+        scheduler.level_5_9 = scheduler_thresholds[0]
+        scheduler.level_10_14 = scheduler_thresholds[1]
+        scheduler.level_15_19 = scheduler_thresholds[2]
+        scheduler.level_20_24 = scheduler_thresholds[3]
+
+    results = await api.get_batch_analysis(profiles, coef, score_thres, scheduler, locked_keys)
+
+    for result in results:
+        if result.expected_total_wasted_exp == float('inf'):
+            result.expected_total_wasted_exp = -1
+
+        if result.expected_total_wasted_tuner == float('inf'):
+            result.expected_total_wasted_tuner = -1
+
+    return results
+
+@app.post("/api/evaluate_characters")
+async def evaluate_characters_endpoint(data: dict):
+    profiles_data = data.get("profiles", [])
+    score_thres = data.get("score_thres", 0.0)
+    char_names = data.get("char_names", None)
+    locked_keys = data.get("locked_keys", [])
+
+    profiles = [EchoProfile().from_dict(profile_data) for profile_data in profiles_data]
+
+    try:
+        evaluation = await api.evaluate_characters(profiles, score_thres, char_names, locked_keys)
+    except (KeyError, ValueError) as e:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=400, detail=f"Unknown character or missing threshold: {e}")
+
+    return {
+        "char_names": evaluation.char_names,
+        "score": evaluation.score.tolist(),
+        "expected_score": evaluation.expected_score.tolist(),
+        "prob_above_threshold": evaluation.prob_above_threshold.tolist(),
+        "best_characters": evaluation.best_characters()
+    }
+
+@app.post("/api/get_best_loadouts")
+async def get_best_loadouts_endpoint(data: dict):
+    profiles_data = data.get("profiles", [])
+    coef_data_dict = data.get("coef", {})
+    suit = data.get("suit", None)
+    top_k = data.get("top_k", 5)
+
+    coef = EntryCoef()
+    for key, value in coef_data_dict.items():
+        if hasattr(coef, key):
+            setattr(coef, key, value)
+
+    profiles = [EchoProfile().from_dict(profile_data) for profile_data in profiles_data]
+
+    loadouts = await api.get_best_loadouts(profiles, coef, suit, top_k)
+
+    return {
+        "loadouts": [
+            {
+                "suit": loadout.suit,
+                "score": loadout.score,
+                "indices": loadout.indices,
+                "names": [profile.name for profile in loadout.profiles]
+            }
+            for loadout in loadouts
+        ]
+    }
+
 @app.post("/api/get_example_profile")
 async def get_example_profile_endpoint(data: dict):
     level = data.get("level")
@@ -166,6 +320,8 @@ async def get_optimal_scheduler_endpoint(data: dict):
     score_thres = data.get("score_thres", 0.0)
     locked_keys = data.get("locked_keys", [])
     iterations = data.get("iterations", 20)
+    num_threads = data.get("num_threads", 0)
+    method = data.get("method", "dinkelbach")
 
     coef = EntryCoef()
     for key, value in coef_data_dict.items():
@@ -174,7 +330,7 @@ async def get_optimal_scheduler_endpoint(data: dict):
 
     scheduler = await api.get_optimal_scheduler(
         num_echo_weight, exp_weight, tuner_weight,
-        coef, score_thres, locked_keys, iterations
+        coef, score_thres, locked_keys, iterations, num_threads, method
     )
 
     return {
@@ -186,6 +342,40 @@ async def get_optimal_scheduler_endpoint(data: dict):
         ]
     }
 
+@app.post("/api/get_scheduler_front")
+async def get_scheduler_front_endpoint(data: dict):
+    coef_data_dict = data.get("coef", {})
+    score_thres = data.get("score_thres", 0.0)
+    locked_keys = data.get("locked_keys", [])
+    weights = data.get("weights", None)
+    steps = data.get("steps", 6)
+    num_threads = data.get("num_threads", 0)
+
+    coef = EntryCoef()
+    for key, value in coef_data_dict.items():
+        if hasattr(coef, key):
+            setattr(coef, key, value)
+
+    front = await api.get_scheduler_front(coef, score_thres, locked_keys, weights, steps, num_threads)
+
+    return {
+        "front": [
+            {
+                "weights": list(point.weights),
+                "thresholds": [
+                    point.scheduler.level_5_9,
+                    point.scheduler.level_10_14,
+                    point.scheduler.level_15_19,
+                    point.scheduler.level_20_24
+                ],
+                "expected_num_echo": point.expected_resource[0],
+                "expected_exp": point.expected_resource[1],
+                "expected_tuner": point.expected_resource[2]
+            }
+            for point in front
+        ]
+    }
+
 @app.post("/api/upgrade_echo")
 async def upgrade_echo_endpoint(profile_data: dict):
     # Reset cancellation flag at the start of a new task
@@ -0,0 +1,69 @@
+import numpy as np
+from PIL import Image
+
+from toolbox.core.profile import EchoProfile
+from toolbox.core.inventory_store import GridCell, GridMatcher, InventoryStore, grid_fingerprint
+
+def cell_image(icon: int, level: int) -> Image.Image:
+    """A synthetic grid cell: a block for the icon and one for the level digits."""
+    pixels = np.full((80, 70), 40, dtype=np.uint8)
+    pixels[12:40, 10 + 8 * icon:26 + 8 * icon] = 220
+    pixels[52:64, 12 + 6 * level:20 + 6 * level] = 255
+    return Image.fromarray(pixels)
+
+def echo(name: str, level: int, cri_rate: float) -> EchoProfile:
+    return EchoProfile(level=level, name=name, cri_rate=cri_rate)
+
+def scan(matcher: GridMatcher, screen: list[tuple[Image.Image, EchoProfile]]) -> list[tuple[int | None, EchoProfile]]:
+    """The loop of EchoScan._scan_cell, with a read that always returns the true echo."""
+    fingerprints = [grid_fingerprint(image) for image, _ in screen]
+    cells = []
+    for position, (fingerprint, (_, profile)) in enumerate(zip(fingerprints, screen)):
+        neighbours = fingerprints[max(position - 1, 0):position] + fingerprints[position + 1:position + 2]
+        cell = matcher.match(position, fingerprint, neighbours)
+        if cell is not None:
+            cells.append((cell.echo_id, cell.profile))
+        else:
+            matcher.resync(position, fingerprint, profile)
+            cells.append((None, profile))
+    return cells
+
+def test_look_alike_inserted_before_recorded_run():
+    a_1, a_2, a_3, b = echo("A", 5, 0.063), echo("A", 5, 0.069), echo("A", 5, 0.075), echo("B", 10, 0.081)
+    a_image, b_image = cell_image(0, 5), cell_image(3, 10)
+    recorded = [GridCell(position, grid_fingerprint(image), echo_id, profile)
+                for position, (echo_id, image, profile) in enumerate([(1, a_image, a_1), (2, a_image, a_2), (3, b_image, b)])]
+
+    cells = scan(GridMatcher(recorded), [(a_image, a_3), (a_image, a_1), (a_image, a_2), (b_image, b)])
+
+    assert [profile for _, profile in cells] == [a_3, a_1, a_2, b]
+    # Look-alikes are read, the cell after them is still taken from the store.
+    assert [echo_id for echo_id, _ in cells] == [None, None, None, 3]
+
+def test_look_alike_inserted_before_single_recorded_cell():
+    a_1, a_2, b = echo("A", 5, 0.063), echo("A", 5, 0.069), echo("B", 10, 0.081)
+    a_image, b_image = cell_image(0, 5), cell_image(3, 10)
+    recorded = [GridCell(0, grid_fingerprint(a_image), 1, a_1), GridCell(1, grid_fingerprint(b_image), 2, b)]
+
+    cells = scan(GridMatcher(recorded), [(a_image, a_2), (a_image, a_1), (b_image, b)])
+
+    assert cells == [(None, a_2), (None, a_1), (2, b)]
+
+def test_unchanged_grid_is_reused():
+    profiles = [echo(name, level, 0.063) for name, level in [("A", 5), ("B", 10), ("C", 15)]]
+    images = [cell_image(icon, level) for icon, level in [(0, 5), (3, 10), (1, 15)]]
+    recorded = [GridCell(position, grid_fingerprint(image), position + 1, profile)
+                for position, (image, profile) in enumerate(zip(images, profiles))]
+
+    cells = scan(GridMatcher(recorded), list(zip(images, profiles)))
+
+    assert cells == [(1, profiles[0]), (2, profiles[1]), (3, profiles[2])]
+
+def test_remove_keeps_echoes_of_other_names(tmp_path):
+    store = InventoryStore(tmp_path / "inventory.db")
+    a, b = echo("A", 5, 0.063), echo("B", 5, 0.063)
+    store.save_scan("", [(grid_fingerprint(cell_image(0, 5)), None, a), (grid_fingerprint(cell_image(3, 5)), None, b)])
+
+    store.remove([b])
+
+    assert store.query() == [a]
@@ -1,9 +1,15 @@
+import numpy as np
+
 from dataclasses import dataclass
 from toolbox.tasks import EchoFilter, EchoPageSelector, EchoScan, EchoSearch, EchoPunch, EchoDiscard, EchoManipulate
-from .profile import EchoProfile, EntryCoef, DiscardScheduler, get_example_profile_above_threshold as get_example_profile_py, get_optimal_scheduler as get_optimal_scheduler_py
+from .profile import ECHO_EXP, EchoProfile, EntryCoef, DiscardScheduler, ScoreDistribution, ScoreSensitivity, SchedulerFrontPoint, CharacterEvaluation, evaluate_characters as evaluate_characters_py, get_scheduler_front as get_scheduler_front_py, analyze_profiles, get_example_profile_above_threshold as get_example_profile_py, get_optimal_scheduler as get_optimal_scheduler_py
+from .loadout import Loadout, best_loadouts
+from .inventory_store import InventoryStore
+from toolbox.utils.generic import get_project_root
 from fastapi.concurrency import run_in_threadpool
 
 current_filter: EchoFilter = None
+inventory_store = InventoryStore(get_project_root() / "cache" / "inventory.db")
 
 async def apply_filter(filter: EchoFilter) -> bool:
     global current_filter
@@ -16,10 +22,15 @@ async def apply_filter(filter: EchoFilter) -> bool:
 
 async def scan_echo() -> list[EchoProfile]:
     scan_task = EchoScan()
-    result = await run_in_threadpool(scan_task.run)
+    # The grid layout depends on the page filter, so every filter is its own view.
+    view = repr(current_filter) if current_filter is not None else ""
+    result = await run_in_threadpool(scan_task.run, inventory_store, view)
 
     return result
 
+async def get_inventory(name: str = None, suit: str = None, min_level: int = 0, max_level: int = 25) -> list[EchoProfile]:
+    return await run_in_threadpool(inventory_store.query, name, suit, min_level, max_level)
+
 async def start_manual_mode(
     coef: EntryCoef, 
     score_thres: float, 
@@ -36,6 +47,7 @@ async def start_manual_mode(
 async def discard_echo(discard_list: list[EchoProfile]):
     task = EchoDiscard()
     await run_in_threadpool(task.run, discard_list)
+    await run_in_threadpool(inventory_store.remove, discard_list)
     return True
 
 @dataclass
@@ -66,7 +78,8 @@ async def get_brief_analysis(
         locked_keys = []
     score = profile.get_score(coef)
     expected_score = profile.get_expected_score(coef)
-    prob_above_threshold = profile.prob_above_score(coef, score_thres, locked_keys)
+    distribution = await run_in_threadpool(profile.score_distribution, coef, locked_keys)
+    prob_above_threshold = distribution.prob_above(score_thres)
 
     return AnalysisResult(
         score=score,
@@ -78,6 +91,15 @@ async def get_brief_analysis(
         expected_total_wasted_tuner=None
     )
 
+async def get_score_distribution(
+    profile: EchoProfile,
+    coef: EntryCoef,
+    locked_keys: list = None
+) -> ScoreDistribution:
+    if locked_keys is None:
+        locked_keys = []
+    return await run_in_threadpool(profile.score_distribution, coef, locked_keys)
+
 async def get_analysis(
     profile: EchoProfile, 
     coef: EntryCoef, 
@@ -89,14 +111,14 @@ async def get_analysis(
         locked_keys = []
     score = profile.get_score(coef)
     expected_score = profile.get_expected_score(coef)
-    prob_above_threshold = profile.prob_above_score(coef, score_thres, locked_keys)
-    prob_above_threshold_with_discard, expected_wasted_exp, expected_wasted_tuner = profile.get_statistics(coef, score_thres, scheduler, locked_keys)
+    # The backend releases the GIL, so these run alongside other requests and the tasks.
+    prob_above_threshold = await run_in_threadpool(profile.prob_above_score, coef, score_thres, locked_keys)
+    prob_above_threshold_with_discard, expected_wasted_exp, expected_wasted_tuner = await run_in_threadpool(
+        profile.get_statistics, coef, score_thres, scheduler, locked_keys
+    )
 
-    exp = [0, 500, 1000, 2000, 3000, 4500, 6500, 8500, 10500, 13500, 16500, 20500, 
-        24500, 29000, 34000, 40000, 46000, 53500, 61000, 70000, 79500, 90000, 101500, 114000, 127500, 143000]
-    
     if profile.level != 0:
-        expected_wasted_exp -= exp[profile.level] * (1 - prob_above_threshold)
+        expected_wasted_exp -= ECHO_EXP[profile.level] * (1 - prob_above_threshold)
         expected_wasted_tuner -= (profile.level // 5) * (1 - prob_above_threshold)
     
     if prob_above_threshold_with_discard == 0:
@@ -121,6 +143,133 @@ async def get_analysis(
         expected_total_wasted_tuner=expected_total_wasted_tuner
     )
 
+@dataclass
+class SensitivityResult:
+    # The probabilities and totals of AnalysisResult, each with its derivatives with respect
+    # to the coef weights and the score threshold.
+    prob_above_threshold: ScoreSensitivity
+    prob_above_threshold_with_discard: ScoreSensitivity
+    expected_total_wasted_exp: ScoreSensitivity
+    expected_total_wasted_tuner: ScoreSensitivity
+
+def _combine(value: float, terms: list[tuple[float, ScoreSensitivity]]) -> ScoreSensitivity:
+    """value with the derivatives of sum(factor * output) over the terms."""
+    return ScoreSensitivity(
+        value=value,
+        coef={key: sum(factor * output.coef[key] for factor, output in terms) for key in terms[0][1].coef},
+        threshold=sum(factor * output.threshold for factor, output in terms)
+    )
+
+def _total_wasted(wasted: ScoreSensitivity, prob: ScoreSensitivity) -> ScoreSensitivity:
+    """wasted / prob with its derivatives, with the same special cases as get_analysis."""
+    if prob.value == 0:
+        return ScoreSensitivity(value=float("inf"), coef={key: 0.0 for key in prob.coef}, threshold=0.0)
+    return _combine(wasted.value / prob.value, [(1 / prob.value, wasted), (-wasted.value / prob.value ** 2, prob)])
+
+async def get_sensitivity(
+    profile: EchoProfile,
+    coef: EntryCoef,
+    score_thres: float,
+    scheduler: DiscardScheduler,
+    locked_keys: list = None,
+    bandwidth: float = 0.5
+) -> SensitivityResult:
+    """Derivatives of the get_analysis outputs, for extrapolating while the weights are edited."""
+    if locked_keys is None:
+        locked_keys = []
+    prob = await run_in_threadpool(profile.prob_above_score_gradient, coef, score_thres, locked_keys, bandwidth)
+    statistics = await run_in_threadpool(profile.get_statistics_gradient, coef, score_thres, scheduler, locked_keys, bandwidth)
+
+    wasted_exp, wasted_tuner = statistics.expected_wasted_exp, statistics.expected_wasted_tuner
+    if profile.level != 0:
+        # Same correction as get_analysis: -exp * (1 - prob) has derivative exp * dprob.
+        exp, tuner = ECHO_EXP[profile.level], profile.level // 5
+        wasted_exp = _combine(wasted_exp.value - exp * (1 - prob.value), [(1.0, wasted_exp), (exp, prob)])
+        wasted_tuner = _combine(wasted_tuner.value - tuner * (1 - prob.value), [(1.0, wasted_tuner), (tuner, prob)])
+
+    prob_with_discard = statistics.prob_above_threshold_with_discard
+    return SensitivityResult(
+        prob_above_threshold=prob,
+        prob_above_threshold_with_discard=prob_with_discard,
+        expected_total_wasted_exp=_total_wasted(wasted_exp, prob_with_discard),
+        expected_total_wasted_tuner=_total_wasted(wasted_tuner, prob_with_discard)
+    )
+
+async def get_batch_analysis(
+    profiles: list[EchoProfile],
+    coef: EntryCoef,
+    score_thres: float,
+    scheduler: DiscardScheduler,
+    locked_keys: list = None
+) -> list[AnalysisResult]:
+    """Same as get_analysis for every profile, computed in one batched backend call."""
+    if locked_keys is None:
+        locked_keys = []
+    if not profiles:
+        return []
+
+    columns = await run_in_threadpool(analyze_profiles, profiles, coef, score_thres, scheduler, locked_keys)
+
+    levels = np.array([profile.level for profile in profiles])
+    prob_above_threshold = columns["prob_above_threshold"]
+    prob_above_threshold_with_discard = columns["prob_above_threshold_with_discard"]
+
+    # Same corrections as get_analysis, applied to all profiles at once.
+    upgraded = levels != 0
+    expected_wasted_exp = columns["expected_wasted_exp"] - np.where(
+        upgraded, np.array(ECHO_EXP)[levels] * (1 - prob_above_threshold), 0)
+    expected_wasted_tuner = columns["expected_wasted_tuner"] - np.where(
+        upgraded, (levels // 5) * (1 - prob_above_threshold), 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected_total_wasted_exp = np.where(
+            prob_above_threshold_with_discard == 0, float("inf"),
+            np.where(prob_above_threshold_with_discard == 1, 0, expected_wasted_exp / prob_above_threshold_with_discard))
+        expected_total_wasted_tuner = np.where(
+            prob_above_threshold_with_discard == 0, float("inf"),
+            np.where(prob_above_threshold_with_discard == 1, 0, expected_wasted_tuner / prob_above_threshold_with_discard))
+
+    return [
+        AnalysisResult(
+            score=score,
+            expected_score=expected_score,
+            expected_wasted_exp=wasted_exp,
+            prob_above_threshold=prob,
+            prob_above_threshold_with_discard=prob_with_discard,
+            expected_total_wasted_exp=total_exp,
+            expected_total_wasted_tuner=total_tuner
+        )
+        for score, expected_score, wasted_exp, prob, prob_with_discard, total_exp, total_tuner in zip(
+            columns["score"].tolist(),
+            columns["expected_score"].tolist(),
+            expected_wasted_exp.tolist(),
+            prob_above_threshold.tolist(),
+            prob_above_threshold_with_discard.tolist(),
+            expected_total_wasted_exp.tolist(),
+            expected_total_wasted_tuner.tolist()
+        )
+    ]
+
+async def evaluate_characters(
+    profiles: list[EchoProfile],
+    score_thres: float | dict[str, float],
+    char_names: list[str] = None,
+    locked_keys: list = None
+) -> CharacterEvaluation:
+    """Scores and probabilities of every profile for every character, in one backend call."""
+    if locked_keys is None:
+        locked_keys = []
+    return await run_in_threadpool(evaluate_characters_py, profiles, score_thres, char_names, locked_keys)
+
+async def get_best_loadouts(
+    profiles: list[EchoProfile],
+    coef: EntryCoef,
+    suit: str = None,
+    top_k: int = 5
+) -> list[Loadout]:
+    """Top-K 5-echo loadouts of the inventory within a cost of 12, by total score."""
+    return await run_in_threadpool(best_loadouts, profiles, coef, suit, top_k)
+
 async def get_example_profile(level: int, prob: float, coef: EntryCoef, score_thres: float, locked_keys: list = None) -> EchoProfile:
     if locked_keys is None:
         locked_keys = []
@@ -141,7 +290,9 @@ async def get_optimal_scheduler(
     coef: EntryCoef,
     score_thres: float,
     locked_keys: list = None,
-    iterations: int = 20
+    iterations: int = 20,
+    num_threads: int = 0,
+    method: str = "dinkelbach"
 ) -> DiscardScheduler:
     """Calculate optimal discard scheduler based on resource weights."""
     if locked_keys is None:
@@ -154,10 +305,34 @@ async def get_optimal_scheduler(
         coef,
         score_thres,
         locked_keys,
-        iterations
+        iterations,
+        num_threads,
+        method
     )
     return scheduler
 
+async def get_scheduler_front(
+    coef: EntryCoef,
+    score_thres: float,
+    locked_keys: list = None,
+    weights: list = None,
+    steps: int = 6,
+    num_threads: int = 0
+) -> list[SchedulerFrontPoint]:
+    """Pareto front of optimal schedulers over a grid of resource weights."""
+    if locked_keys is None:
+        locked_keys = []
+    return await run_in_threadpool(
+        get_scheduler_front_py,
+        coef,
+        score_thres,
+        locked_keys,
+        weights,
+        steps,
+        20,
+        num_threads
+    )
+
 async def upgrade_echo(profile: EchoProfile, work_state: dict) -> EchoProfile:
     global current_filter
     
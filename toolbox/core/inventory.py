@@ -0,0 +1,170 @@
+import numpy as np
+
+from .profile import EchoProfile, EntryCoef, echo_data, profile_cpp, stat_data
+
+ENTRY_KEYS = list(profile_cpp.ENTRY_KEYS)
+NUM_ENTRIES = len(ENTRY_KEYS)
+# Echo names in echo.json order; a name id indexes this list, -1 for an unknown name.
+ECHO_NAMES = list(echo_data.keys())
+_NAME_IDS = {name: i for i, name in enumerate(ECHO_NAMES)}
+# Expected value of every entry when it is drawn.
+_EXPECTED_VALUES = np.array([
+    sum(entry["value"] * entry["probability"] for entry in stat_data[key]["distribution"]) for key in ENTRY_KEYS
+])
+# 64-bit FNV-1a constants for the content hash.
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+def _coef_vector(coef: EntryCoef) -> np.ndarray:
+    return np.array([float(getattr(coef, key)) for key in ENTRY_KEYS])
+
+def content_hash(levels: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """64-bit hash of (level, entry values) per row, ignoring the name like EchoProfile.__hash__.
+
+    Entry values have one decimal (entry_stats.yml), so they are hashed in tenths, which
+    makes the hash independent of the float precision they are stored with.
+    """
+    columns = np.concatenate([np.asarray(levels, dtype=np.int64)[:, None],
+        np.rint(np.asarray(values, dtype=np.float64) * 10).astype(np.int64)], axis=1).astype(np.uint64)
+    h = np.full(len(columns), _FNV_OFFSET, dtype=np.uint64)
+    for column in columns.T:
+        h = (h ^ column) * _FNV_PRIME
+    return h
+
+class EchoRow:
+    """Read-only view of one echo of an EchoInventory, with the attributes of EchoProfile."""
+    __slots__ = ("_inventory", "_row")
+
+    def __init__(self, inventory: "EchoInventory", row: int):
+        self._inventory = inventory
+        self._row = row
+
+    @property
+    def level(self) -> int:
+        return int(self._inventory.levels[self._row])
+
+    @property
+    def name(self) -> str:
+        name_id = int(self._inventory.name_ids[self._row])
+        return ECHO_NAMES[name_id] if name_id >= 0 else ""
+
+    @property
+    def content_hash(self) -> int:
+        return int(self._inventory.hashes[self._row])
+
+    def get_score(self, coef: EntryCoef) -> float:
+        return float(self._inventory.entry_values(self._row) @ _coef_vector(coef))
+
+    def to_profile(self) -> EchoProfile:
+        return self._inventory.to_profiles(np.array([self._row]))[0]
+
+    def __repr__(self) -> str:
+        return f"EchoRow({self._row}, level={self.level}, name={self.name!r})"
+
+# Entry attributes read through to the value matrix, e.g. row.cri_rate.
+for _i, _key in enumerate(ENTRY_KEYS):
+    setattr(EchoRow, _key, property(lambda self, i=_i: round(float(self._inventory.values[self._row, i]), 1)))
+
+class EchoInventory:
+    """Array-backed collection of echoes, so operations over an inventory are single NumPy expressions.
+
+    Rows are echoes. values holds the entry values in ENTRY_KEYS order as float32, levels the
+    levels, name_ids the index of the name in ECHO_NAMES and hashes the content hash of
+    every row (see content_hash). Indexing with an int returns an EchoRow view; indexing
+    with a slice, an index array or a boolean mask returns a new inventory.
+    """
+    __slots__ = ("values", "levels", "name_ids", "hashes", "_hash_index")
+
+    def __init__(self, values: np.ndarray = None, levels: np.ndarray = None, name_ids: np.ndarray = None):
+        self.values = np.zeros((0, NUM_ENTRIES), dtype=np.float32) if values is None else np.asarray(values, dtype=np.float32).reshape(-1, NUM_ENTRIES)
+        n = len(self.values)
+        self.levels = np.zeros(n, dtype=np.int8) if levels is None else np.asarray(levels, dtype=np.int8)
+        self.name_ids = np.full(n, -1, dtype=np.int16) if name_ids is None else np.asarray(name_ids, dtype=np.int16)
+        if len(self.levels) != n or len(self.name_ids) != n:
+            raise ValueError("values, levels and name_ids must have the same number of rows")
+        self.hashes = content_hash(self.levels, self.values)
+        self._hash_index = None
+
+    @classmethod
+    def from_profiles(cls, profiles: list[EchoProfile]) -> "EchoInventory":
+        values = np.array([[getattr(profile, key) for key in ENTRY_KEYS] for profile in profiles], dtype=np.float32)
+        levels = [profile.level for profile in profiles]
+        name_ids = [_NAME_IDS.get(profile.name, -1) for profile in profiles]
+        return cls(values, levels, name_ids)
+
+    def entry_values(self, rows=slice(None)) -> np.ndarray:
+        """Entry values as float64, rounded back to the one decimal they have in game."""
+        return np.round(self.values[rows].astype(np.float64), 1)
+
+    def to_array(self) -> np.ndarray:
+        """(N, 14) array of the level followed by the entry values, as profiles_to_array."""
+        return np.concatenate([self.levels[:, None].astype(np.float64), self.entry_values()], axis=1)
+
+    def to_profiles(self, rows: np.ndarray = None) -> list[EchoProfile]:
+        rows = np.arange(len(self)) if rows is None else rows
+        values = self.entry_values(rows)
+        profiles = []
+        for row, row_values in zip(rows, values.tolist()):
+            name_id = int(self.name_ids[row])
+            profile = EchoProfile(level=int(self.levels[row]), name=ECHO_NAMES[name_id] if name_id >= 0 else "")
+            profile.from_dict(dict(zip(ENTRY_KEYS, row_values)))
+            profiles.append(profile)
+        return profiles
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self):
+        return (EchoRow(self, row) for row in range(len(self)))
+
+    def __getitem__(self, rows):
+        if isinstance(rows, (int, np.integer)):
+            if not -len(self) <= rows < len(self):
+                raise IndexError("inventory index out of range")
+            return EchoRow(self, int(rows) % len(self))
+        return EchoInventory(self.values[rows], self.levels[rows], self.name_ids[rows])
+
+    def scores(self, coef: EntryCoef) -> np.ndarray:
+        """EchoProfile.get_score of every echo."""
+        return self.entry_values() @ _coef_vector(coef)
+
+    def expected_scores(self, coef: EntryCoef) -> np.ndarray:
+        """EchoProfile.get_expected_score of every echo: the remaining slots are spread evenly
+        over the expected values of the absent entries."""
+        values = self.entry_values()
+        coef_values = _coef_vector(coef)
+        absent = values == 0
+        remain_slots = (25 - self.levels.astype(np.int64)) // 5
+        num_absent = absent.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            extra = (absent * _EXPECTED_VALUES) @ coef_values * remain_slots / num_absent
+        return values @ coef_values + np.where(num_absent == 0, 0.0, extra)
+
+    def filter(self, min_level: int = 0, max_level: int = 25, names: list[str] = None, required_keys: list[str] = None) -> "EchoInventory":
+        """Echoes within the level range, with one of the names and all of the required entries."""
+        keep = (self.levels >= min_level) & (self.levels <= max_level)
+        if names is not None:
+            keep &= np.isin(self.name_ids, [_NAME_IDS[name] for name in names if name in _NAME_IDS])
+        if required_keys:
+            keep &= (self.values[:, [ENTRY_KEYS.index(key) for key in required_keys]] != 0).all(axis=1)
+        return self[keep]
+
+    def argsort(self, key: np.ndarray, descending: bool = True) -> np.ndarray:
+        """Stable order of the rows by a per-row key such as scores(coef)."""
+        key = np.asarray(key)
+        return np.argsort(-key if descending else key, kind="stable")
+
+    def sort(self, key: np.ndarray, descending: bool = True) -> "EchoInventory":
+        return self[self.argsort(key, descending)]
+
+    def find(self, profile: EchoProfile) -> int:
+        """Row holding the same level and entries as profile, -1 if there is none."""
+        if self._hash_index is None:
+            self._hash_index = {}
+            for row, h in enumerate(self.hashes.tolist()):
+                self._hash_index.setdefault(h, row)
+        values = np.array([[getattr(profile, key) for key in ENTRY_KEYS]], dtype=np.float64)
+        return self._hash_index.get(content_hash(np.array([profile.level]), values).tolist()[0], -1)
+
+    def __contains__(self, profile: EchoProfile) -> bool:
+        return self.find(profile) >= 0
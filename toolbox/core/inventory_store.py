@@ -0,0 +1,295 @@
+import time
+import sqlite3
+import threading
+import numpy as np
+
+from dataclasses import dataclass
+from pathlib import Path
+from PIL import Image
+from toolbox.utils.logger import logger
+from .profile import EchoProfile, echo_data
+from .inventory import ENTRY_KEYS, EchoInventory, content_hash
+
+# Pixels along the border left out of the comparison: the selection frame is drawn there.
+_FINGERPRINT_MARGIN = 6
+# Largest offset in pixels between the detected boxes of the same cell in two screenshots.
+_MAX_SHIFT = 4
+# A pixel differs when its gray level moves by more than this.
+_PIXEL_TOLERANCE = 24
+# A cell has changed when more pixels than this differ under the best alignment.
+_CHANGED_PIXELS = 10
+# Recorded cells on either side of the expected one that a reused cell must not look like.
+_MATCH_REACH = 4
+
+def grid_fingerprint(cell: Image.Image) -> bytes:
+    """Grayscale copy of an echo cell of the inventory grid, prefixed with its height and width.
+
+    The cell shows the icon, the rarity and the level of the echo, so it changes whenever
+    the echo is upgraded or replaced by another one. It is kept at screen resolution: the
+    UI renders pixel-exact, so two screenshots of an unchanged cell differ only by the
+    integer offset of the detected box, while the level digits span just a few pixels.
+    """
+    pixels = np.asarray(cell.convert("L"), dtype=np.uint8)
+    return np.array(pixels.shape, dtype=np.uint16).tobytes() + pixels.tobytes()
+
+def _decode_fingerprint(fingerprint: bytes) -> np.ndarray:
+    height, width = np.frombuffer(fingerprint[:4], dtype=np.uint16)
+    return np.frombuffer(fingerprint[4:], dtype=np.uint8).reshape(height, width).astype(np.int16)
+
+def fingerprints_match(a: bytes, b: bytes) -> bool:
+    """Whether two fingerprints show the same cell, under the best integer alignment."""
+    if a is None or b is None:
+        return False
+    a, b = _decode_fingerprint(a), _decode_fingerprint(b)
+    m = _FINGERPRINT_MARGIN
+    if abs(a.shape[0] - b.shape[0]) > _MAX_SHIFT or abs(a.shape[1] - b.shape[1]) > _MAX_SHIFT:
+        # Another window size: the cells cannot be compared.
+        return False
+    height, width = min(a.shape[0], b.shape[0]) - 2 * m, min(a.shape[1], b.shape[1]) - 2 * m
+    if height <= 0 or width <= 0:
+        return False
+    inner = a[m:m + height, m:m + width]
+    for dy in range(-_MAX_SHIFT, _MAX_SHIFT + 1):
+        for dx in range(-_MAX_SHIFT, _MAX_SHIFT + 1):
+            y, x = m + dy, m + dx
+            if y < 0 or x < 0 or y + height > b.shape[0] or x + width > b.shape[1]:
+                continue
+            if np.count_nonzero(np.abs(inner - b[y:y + height, x:x + width]) > _PIXEL_TOLERANCE) <= _CHANGED_PIXELS:
+                return True
+    return False
+
+def _signed(h: int) -> int:
+    # SQLite integers are signed 64-bit.
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+def _profile_hash(profile: EchoProfile) -> int:
+    values = np.array([[getattr(profile, key) for key in ENTRY_KEYS]], dtype=np.float64)
+    return _signed(int(content_hash(np.array([profile.level]), values)[0]))
+
+@dataclass
+class GridCell:
+    # Position of the cell in scan order, counted from the top-left of the grid.
+    position: int
+    # grid_fingerprint of the cell.
+    fingerprint: bytes
+    # Id of the echo in the store.
+    echo_id: int
+    # The echo shown in the cell.
+    profile: EchoProfile
+
+class InventoryStore:
+    """SQLite database of the scanned inventory, kept between sessions.
+
+    Echoes are indexed by content hash, name, level and suit. Every scan also records the
+    grid layout it saw (position, fingerprint and echo of every cell) under a view key,
+    the page filter the grid was scanned with, so that the next scan of the same view can
+    take unchanged cells from the store instead of clicking and reading each of them.
+    """
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        entry_columns = ", ".join(f"{key} REAL NOT NULL DEFAULT 0" for key in ENTRY_KEYS)
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS echoes (
+                id INTEGER PRIMARY KEY,
+                content_hash INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                level INTEGER NOT NULL,
+                {entry_columns},
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS echoes_hash ON echoes (content_hash);
+            CREATE INDEX IF NOT EXISTS echoes_name ON echoes (name, level);
+            CREATE INDEX IF NOT EXISTS echoes_level ON echoes (level);
+            CREATE TABLE IF NOT EXISTS echo_suits (
+                echo_id INTEGER NOT NULL REFERENCES echoes (id) ON DELETE CASCADE,
+                suit TEXT NOT NULL,
+                PRIMARY KEY (echo_id, suit)
+            );
+            CREATE INDEX IF NOT EXISTS echo_suits_suit ON echo_suits (suit);
+            CREATE TABLE IF NOT EXISTS grid (
+                view TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                echo_id INTEGER NOT NULL REFERENCES echoes (id) ON DELETE CASCADE,
+                fingerprint BLOB NOT NULL,
+                PRIMARY KEY (view, position)
+            );
+        """)
+        conn.commit()
+
+    def _open(self) -> sqlite3.Connection:
+        # One connection per call: scans and requests run on different worker threads.
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("PRAGMA foreign_keys = ON")
+        with self._lock:
+            if not self._initialized:
+                self._create_tables(conn)
+                self._initialized = True
+        return conn
+
+    @staticmethod
+    def _row_to_profile(row) -> EchoProfile:
+        name, level, *values = row
+        return EchoProfile(level=level, name=name).from_dict(dict(zip(ENTRY_KEYS, values)))
+
+    def _select(self, where: str = "", params: tuple = ()) -> tuple[list[int], list[EchoProfile]]:
+        columns = ", ".join(["id", "name", "level", *ENTRY_KEYS])
+        conn = self._open()
+        try:
+            rows = conn.execute(f"SELECT {columns} FROM echoes {where} ORDER BY id", params).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows], [self._row_to_profile(row[1:]) for row in rows]
+
+    def query(self, name: str = None, suit: str = None, min_level: int = 0, max_level: int = 25) -> list[EchoProfile]:
+        """Stored echoes of a name and suit within a level range."""
+        conditions, params = ["level BETWEEN ? AND ?"], [min_level, max_level]
+        if name:
+            conditions.append("name = ?")
+            params.append(name)
+        if suit:
+            conditions.append("id IN (SELECT echo_id FROM echo_suits WHERE suit = ?)")
+            params.append(suit)
+        return self._select("WHERE " + " AND ".join(conditions), tuple(params))[1]
+
+    def to_inventory(self, **filters) -> EchoInventory:
+        return EchoInventory.from_profiles(self.query(**filters))
+
+    def find(self, profile: EchoProfile) -> list[int]:
+        """Ids of the stored echoes with the name, level and entries of profile."""
+        ids, profiles = self._select("WHERE content_hash = ? AND name = ?", (_profile_hash(profile), profile.name))
+        return [echo_id for echo_id, stored in zip(ids, profiles) if hash(stored) == hash(profile)]
+
+    def grid(self, view: str) -> list[GridCell]:
+        """Layout recorded by the last scan of a view, by position."""
+        columns = ", ".join(["g.position", "g.fingerprint", "e.id", "e.name", "e.level", *(f"e.{key}" for key in ENTRY_KEYS)])
+        conn = self._open()
+        try:
+            rows = conn.execute(
+                f"SELECT {columns} FROM grid g JOIN echoes e ON e.id = g.echo_id WHERE g.view = ? ORDER BY g.position",
+                (view,)).fetchall()
+        finally:
+            conn.close()
+        return [GridCell(position=row[0], fingerprint=row[1], echo_id=row[2], profile=self._row_to_profile(row[3:]))
+                for row in rows]
+
+    def save_scan(self, view: str, cells: list[tuple[bytes, int | None, EchoProfile]]) -> list[int]:
+        """Record a finished scan of a view.
+
+        Args:
+            view: The view key the grid was scanned under
+            cells: (fingerprint, echo id or None, profile) of every cell in scan order. Cells
+                taken from the store carry their echo id; cells that were read carry None
+                and are matched to a stored echo with the same content, or inserted.
+
+        Returns:
+            list[int]: The echo id of every cell
+        """
+        now = time.time()
+        conn = self._open()
+        try:
+            with conn:
+                claimed = {echo_id for _, echo_id, _ in cells if echo_id is not None}
+                echo_ids = []
+                for fingerprint, echo_id, profile in cells:
+                    if echo_id is None:
+                        echo_id = self._match_or_insert(conn, profile, claimed, now)
+                        claimed.add(echo_id)
+                    else:
+                        conn.execute("UPDATE echoes SET last_seen = ? WHERE id = ?", (now, echo_id))
+                    echo_ids.append(echo_id)
+
+                conn.execute("DELETE FROM grid WHERE view = ?", (view,))
+                conn.executemany(
+                    "INSERT INTO grid (view, position, echo_id, fingerprint) VALUES (?, ?, ?, ?)",
+                    [(view, position, echo_id, fingerprint)
+                     for position, (echo_id, (fingerprint, _, _)) in enumerate(zip(echo_ids, cells))])
+                # Echoes no scanned view shows any more were upgraded into a new row or left the inventory.
+                removed = conn.execute("DELETE FROM echoes WHERE id NOT IN (SELECT echo_id FROM grid)").rowcount
+        finally:
+            conn.close()
+        logger.info(f"Saved {len(cells)} echoes of view {view!r} to the inventory store, {removed} removed")
+        return echo_ids
+
+    def _match_or_insert(self, conn: sqlite3.Connection, profile: EchoProfile, claimed: set[int], now: float) -> int:
+        h = _profile_hash(profile)
+        # Identical copies of an echo share a content hash: take one not already in this scan.
+        for (echo_id,) in conn.execute(
+                "SELECT id FROM echoes WHERE content_hash = ? AND name = ? ORDER BY id", (h, profile.name)):
+            if echo_id not in claimed:
+                conn.execute("UPDATE echoes SET last_seen = ? WHERE id = ?", (now, echo_id))
+                return echo_id
+
+        columns = ["content_hash", "name", "level", *ENTRY_KEYS, "last_seen"]
+        values = [h, profile.name, profile.level, *(float(getattr(profile, key)) for key in ENTRY_KEYS), now]
+        cursor = conn.execute(
+            f"INSERT INTO echoes ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values)
+        echo_id = cursor.lastrowid
+        suits = echo_data.get(profile.name, {}).get("suit", [])
+        conn.executemany("INSERT INTO echo_suits (echo_id, suit) VALUES (?, ?)", [(echo_id, suit) for suit in suits])
+        return echo_id
+
+    def remove(self, profiles: list[EchoProfile]):
+        """Delete one stored copy of every profile, e.g. after discarding them in game."""
+        conn = self._open()
+        try:
+            with conn:
+                for profile in profiles:
+                    row = conn.execute("SELECT id FROM echoes WHERE content_hash = ? AND name = ? ORDER BY id LIMIT 1",
+                                       (_profile_hash(profile), profile.name)).fetchone()
+                    if row is not None:
+                        conn.execute("DELETE FROM echoes WHERE id = ?", row)
+        finally:
+            conn.close()
+
+class GridMatcher:
+    """Tells which cells of a rescan can be taken from the grid recorded by the last scan.
+
+    A cell is reused when its fingerprint matches the recorded cell at the same position,
+    shifted by the offset between the two scans. The fingerprint only shows the icon and
+    the level, so echoes of the same name and level look alike: an echo inserted next to
+    them would take the row of one of them. A cell that looks like another recorded cell
+    within _MATCH_REACH of the expected one, or like its neighbours on screen, is read
+    instead. When echoes were added or removed, the first cell that no longer lines up
+    is read, and the read echo is looked up in the recorded grid to pick up the new
+    offset, so every change costs only a read or two.
+    """
+
+    def __init__(self, recorded: list[GridCell]):
+        self.recorded = recorded
+        # Echoes removed from the store since leave gaps in the positions.
+        self.by_position = {cell.position: cell for cell in recorded}
+        self.offset = 0
+
+    def match(self, position: int, fingerprint: bytes, neighbours: list[bytes] = ()) -> GridCell | None:
+        """
+        The recorded cell shown at position, None if the cell has to be read.
+        Args:
+            position: Position of the cell in scan order
+            fingerprint: grid_fingerprint of the cell
+            neighbours: Fingerprints of the cells next to it on screen, where known
+        """
+        expected = position + self.offset
+        cell = self.by_position.get(expected)
+        if cell is None or not fingerprints_match(fingerprint, cell.fingerprint):
+            return None
+        look_alikes = [other.fingerprint for p, other in self.by_position.items()
+                       if p != expected and abs(p - expected) <= _MATCH_REACH]
+        if any(fingerprints_match(fingerprint, other) for other in [*look_alikes, *neighbours]):
+            return None
+        return cell
+
+    def resync(self, position: int, fingerprint: bytes, profile: EchoProfile):
+        """Realign on a cell that had to be read."""
+        expected = position + self.offset
+        candidates = [cell.position for cell in self.recorded
+                      if cell.profile.name == profile.name and hash(cell.profile) == hash(profile)
+                      and fingerprints_match(fingerprint, cell.fingerprint)]
+        if candidates:
+            # Duplicates: the copy nearest to where the cell was expected.
+            self.offset = min(candidates, key=lambda p: abs(p - expected)) - position
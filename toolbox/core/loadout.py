@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import numpy as np
+
+from dataclasses import dataclass
+from toolbox.utils.logger import logger
+from .profile import EchoProfile, EntryCoef, echo_data, profile_cpp, profiles_to_array
+
+# A loadout holds 5 echoes whose costs add up to at most 12.
+LOADOUT_SIZE = 5
+MAX_COST = 12
+
+@dataclass
+class Loadout:
+    # The sonata suit shared by all echoes of the loadout.
+    suit: str
+    # The echoes, by decreasing cost and then decreasing score.
+    profiles: list[EchoProfile]
+    # Positions of the echoes in the inventory passed to best_loadouts.
+    indices: list[int]
+    # Sum of EchoProfile.get_score over the echoes.
+    score: float
+
+def cost_patterns(costs: list[int] = None) -> list[tuple[int, ...]]:
+    """Every multiset of LOADOUT_SIZE echo costs within MAX_COST, e.g. (4, 3, 3, 1, 1).
+
+    Patterns below the budget are kept: a weak cost-4 echo can lose to a cost-3 one.
+    """
+    if costs is None:
+        costs = sorted({info["cost"] for info in echo_data.values()}, reverse=True)
+    return [pattern for pattern in itertools.combinations_with_replacement(sorted(costs, reverse=True), LOADOUT_SIZE)
+            if sum(pattern) <= MAX_COST]
+
+def index_inventory(profiles: list[EchoProfile], scores: np.ndarray) -> dict[str, dict[int, np.ndarray]]:
+    """Inventory positions grouped by suit and cost, each group sorted by decreasing score.
+
+    The scan does not read which of its possible suits a copy rolled, so an echo is listed
+    under every suit of its name in echo.json. Echoes with an unknown name are left out.
+    """
+    groups = {}
+    unknown = 0
+    for idx, profile in enumerate(profiles):
+        info = echo_data.get(profile.name)
+        if info is None:
+            unknown += 1
+            continue
+        for suit in info["suit"]:
+            groups.setdefault(suit, {}).setdefault(info["cost"], []).append(idx)
+    if unknown:
+        logger.warning(f"{unknown} echoes with an unknown name are left out of the loadouts")
+
+    # Stable sort, so echoes with equal scores keep their inventory order.
+    return {
+        suit: {cost: np.array(sorted(group, key=lambda idx: -scores[idx]), dtype=np.int64) for cost, group in by_cost.items()}
+        for suit, by_cost in groups.items()
+    }
+
+def best_loadouts(
+    profiles: list[EchoProfile],
+    coef: EntryCoef,
+    suit: str = None,
+    top_k: int = 5
+) -> list[Loadout]:
+    """Find the top-K 5-echo loadouts of one suit by total score.
+
+    Every suit and cost pattern is searched depth-first, one cost group after the other, with
+    the echoes of a group taken in decreasing score. A branch is cut as soon as its best
+    possible completion (the next echoes of the current group plus the best echoes of the
+    remaining groups) cannot beat the K-th loadout found so far. Within a group that bound
+    only decreases, so the rest of the group is skipped at once. The set bonus counts each
+    echo name once, so a loadout never holds two echoes of the same name.
+
+    Args:
+        profiles: The inventory, e.g. as returned by EchoScan
+        coef: Entry coefficients the echoes are scored with
+        suit: Only build loadouts of this suit, every suit by default
+        top_k: Number of loadouts to return
+
+    Returns:
+        list[Loadout]: At most top_k loadouts by decreasing score. A set of echoes that fits
+            several suits is only returned once, under the first suit in sorted order.
+    """
+    if top_k <= 0 or not profiles:
+        return []
+    coef_values = np.array([float(getattr(coef, key)) for key in profile_cpp.ENTRY_KEYS])
+    scores = profiles_to_array(profiles)[:, 1:] @ coef_values
+    groups = index_inventory(profiles, scores)
+    suits = sorted(groups) if suit is None else [suit] if suit in groups else []
+    patterns = cost_patterns()
+
+    # Min-heap of the best loadouts so far; on equal scores the one found last is dropped first.
+    best = []
+    found = set()
+    order = itertools.count()
+
+    def kth_score() -> float:
+        return best[0][0] if len(best) == top_k else -np.inf
+
+    for current_suit in suits:
+        by_cost = groups[current_suit]
+        for pattern in patterns:
+            slots = [(by_cost.get(cost, np.zeros(0, dtype=np.int64)), count) for cost, count in
+                     ((cost, pattern.count(cost)) for cost in sorted(set(pattern), reverse=True))]
+            if any(len(group) < count for group, count in slots):
+                continue
+            # prefix[s][i]: total of the first i echoes of slot s; rest[s]: best total of slots s and after.
+            prefix = [np.concatenate([[0.0], np.cumsum(scores[group])]) for group, _ in slots]
+            tops = [prefix[s][count] for s, (_, count) in enumerate(slots)]
+            rest = np.append(np.cumsum(tops[::-1])[::-1], 0.0)
+            chosen, names = [], set()
+
+            def search(slot: int, start: int, left: int, total: float):
+                group, _ = slots[slot]
+                group_prefix = prefix[slot]
+                for pos in range(start, len(group) - left + 1):
+                    bound = total + group_prefix[pos + left] - group_prefix[pos] + rest[slot + 1]
+                    if bound <= kth_score():
+                        break
+                    idx = int(group[pos])
+                    name = profiles[idx].name
+                    if name in names:
+                        continue
+                    chosen.append(idx)
+                    names.add(name)
+                    score = total + scores[idx]
+                    if left > 1:
+                        search(slot, pos + 1, left - 1, score)
+                    elif slot + 1 < len(slots):
+                        search(slot + 1, 0, slots[slot + 1][1], score)
+                    else:
+                        record(score)
+                    chosen.pop()
+                    names.remove(name)
+
+            def record(score: float):
+                key = tuple(sorted(chosen))
+                if key in found:
+                    return
+                found.add(key)
+                heapq.heappush(best, (score, -next(order), key, current_suit, list(chosen)))
+                if len(best) > top_k:
+                    found.discard(heapq.heappop(best)[2])
+
+            search(0, 0, slots[0][1], 0.0)
+
+    return [
+        Loadout(suit=loadout_suit, profiles=[profiles[idx] for idx in indices], indices=indices, score=float(score))
+        for score, _, _, loadout_suit, indices in sorted(best, reverse=True)
+    ]
@@ -1,26 +1,89 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <pybind11/numpy.h>
 #include <unordered_map>
 #include <vector>
 #include <string>
 #include <cmath>
-#include <iostream>
 #include <algorithm>
+#include <array>
+#include <bitset>
+#include <chrono>
+#include <cstdint>
+#include <functional>
+#include <list>
+#include <map>
+#include <atomic>
+#include <condition_variable>
+#include <memory>
+#include <mutex>
+#include <thread>
+#include <tuple>
+#include <stdexcept>
 
 namespace py = pybind11;
 
+// Entries are mapped to fixed slots following the order of entry_stats.yml, so
+// profiles and coefficients can be stored as plain arrays instead of string maps.
+constexpr int NUM_ENTRIES = 13;
+
+static const std::array<const char*, NUM_ENTRIES> ENTRY_KEYS = {
+    "cri_rate", "cri_dmg", "atk_rate", "atk_num", "def_rate", "def_num", "hp_rate",
+    "hp_num", "normal_dmg", "resonance_skill", "resonance_burst", "resonance_eff", "charged_atk"
+};
+
+typedef std::array<double, NUM_ENTRIES> EntryValues;
+typedef uint32_t EntryMask;
+
+inline EntryMask entry_bit(int idx) { return EntryMask(1) << idx; }
+
+int entry_index(const std::string& key) {
+    static const std::unordered_map<std::string, int> index = [] {
+        std::unordered_map<std::string, int> result;
+        for (int i = 0; i < NUM_ENTRIES; ++i) result[ENTRY_KEYS[i]] = i;
+        return result;
+    }();
+    auto it = index.find(key);
+    if (it == index.end()) throw std::runtime_error("Unknown entry key: " + key);
+    return it->second;
+}
+
+EntryValues values_from_dict(const std::unordered_map<std::string, double>& v) {
+    EntryValues values{};
+    for (const auto& kv : v) values[entry_index(kv.first)] = kv.second;
+    return values;
+}
+
+EntryMask mask_of(const EntryValues& values) {
+    EntryMask mask = 0;
+    for (int i = 0; i < NUM_ENTRIES; ++i) if (std::abs(values[i]) > 1e-5) mask |= entry_bit(i);
+    return mask;
+}
+
 struct EntryCoef {
-    std::unordered_map<std::string, double> values;
+    EntryValues values{};
     EntryCoef() = default;
-    EntryCoef(const std::unordered_map<std::string, double>& v) : values(v) {}
+    EntryCoef(const std::unordered_map<std::string, double>& v) : values(values_from_dict(v)) {}
+    EntryCoef(const EntryValues& v) : values(v) {}
+
+    std::unordered_map<std::string, double> to_dict() const {
+        std::unordered_map<std::string, double> result;
+        for (int i = 0; i < NUM_ENTRIES; ++i) result[ENTRY_KEYS[i]] = values[i];
+        return result;
+    }
+
+    bool is_effective(int idx) const { return std::abs(values[idx]) >= 1e-5; }
+
+    EntryMask effective_mask() const {
+        EntryMask mask = 0;
+        for (int i = 0; i < NUM_ENTRIES; ++i) if (is_effective(i)) mask |= entry_bit(i);
+        return mask;
+    }
 
     bool operator==(const EntryCoef& other) const {
-        if (values.size() != other.values.size()) return false;
-        for (const auto& kv : values) {
-            auto it = other.values.find(kv.first);
-            if (it == other.values.end()) return false;
-            double v1 = std::round(kv.second * 10) / 10.0;
-            double v2 = std::round(it->second * 10) / 10.0;
+        for (int i = 0; i < NUM_ENTRIES; ++i) {
+            double v1 = std::round(values[i] * 10) / 10.0;
+            double v2 = std::round(other.values[i] * 10) / 10.0;
             if (std::abs(v1 - v2) > 1e-6) return false;
         }
         return true;
@@ -29,43 +92,75 @@ struct EntryCoef {
 
 struct EchoProfile {
     int level = 0;
-    std::unordered_map<std::string, double> values;
+    EntryValues values{};
+    EntryMask mask = 0;
     EchoProfile() = default;
-    EchoProfile(int lvl, const std::unordered_map<std::string, double>& v) : level(lvl), values(v) {}
+    EchoProfile(int lvl, const std::unordered_map<std::string, double>& v) : level(lvl), values(values_from_dict(v)), mask(mask_of(values)) {}
+    EchoProfile(int lvl, const EntryValues& v) : level(lvl), values(v), mask(mask_of(values)) {}
+
+    void set_value(int idx, double value) {
+        values[idx] = value;
+        if (std::abs(value) > 1e-5) mask |= entry_bit(idx);
+        else mask &= ~entry_bit(idx);
+    }
+
+    std::unordered_map<std::string, double> to_dict() const {
+        std::unordered_map<std::string, double> result;
+        for (int i = 0; i < NUM_ENTRIES; ++i) if (mask & entry_bit(i)) result[ENTRY_KEYS[i]] = values[i];
+        return result;
+    }
+
+    void from_dict(const std::unordered_map<std::string, double>& v) {
+        values = values_from_dict(v);
+        mask = mask_of(values);
+    }
 
     bool operator==(const EchoProfile& other) const {
         if (level != other.level) return false;
-        if (values.size() != other.values.size()) return false;
-        for (const auto& kv : values) {
-            auto it = other.values.find(kv.first);
-            if (it == other.values.end()) return false;
-            double v1 = std::round(kv.second * 10) / 10.0;
-            double v2 = std::round(it->second * 10) / 10.0;
+        for (int i = 0; i < NUM_ENTRIES; ++i) {
+            double v1 = std::round(values[i] * 10) / 10.0;
+            double v2 = std::round(other.values[i] * 10) / 10.0;
             if (std::abs(v1 - v2) > 1e-6) return false;
         }
         return true;
     }
 };
 
+// Scores are handled in fixed-point units of 1/20. Every entry contributes its own
+// rounded bin, so the bin of a profile is the sum of the bins of its entries.
+constexpr double SCORE_BIN_SCALE = 20.0;
+
+inline int entry_score_bin(double value, double coef_value) {
+    return (int)std::lround(value * coef_value * SCORE_BIN_SCALE);
+}
+
+inline int threshold_score_bin(double threshold) {
+    return (int)std::ceil(threshold * SCORE_BIN_SCALE - 1e-9);
+}
+
+// A memo key packs (level, non-zero entry mask, score bin) into one integer.
 struct MemoKey {
-    int level;
-    std::vector<std::string> non_zero_keys;
-    double score, score_rounded;
+    uint64_t packed;
+
+    int level() const { return int(packed & 0x1f); }
+    EntryMask mask() const { return EntryMask((packed >> 5) & 0x1fff); }
+    int score_bin() const { return int(int32_t(uint32_t(packed >> 32))); }
 
     bool operator==(const MemoKey& other) const {
-        return level == other.level &&
-               score_rounded == other.score_rounded &&
-               non_zero_keys == other.non_zero_keys;
+        return packed == other.packed;
     }
 };
 
 double get_score(const EchoProfile& profile, const EntryCoef& coef) {
     double total = 0.0;
-    for (std::unordered_map<std::string, double>::const_iterator it = coef.values.begin(); it != coef.values.end(); ++it) {
-        double v = 0.0;
-        std::unordered_map<std::string, double>::const_iterator it2 = profile.values.find(it->first);
-        if (it2 != profile.values.end()) v = it2->second;
-        total += v * it->second;
+    for (int i = 0; i < NUM_ENTRIES; ++i) total += profile.values[i] * coef.values[i];
+    return total;
+}
+
+int get_score_bin(const EchoProfile& profile, const EntryCoef& coef) {
+    int total = 0;
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        if (profile.mask & entry_bit(i)) total += entry_score_bin(profile.values[i], coef.values[i]);
     }
     return total;
 }
@@ -74,12 +169,7 @@ namespace std {
     template <>
     struct hash<MemoKey> {
         std::size_t operator()(const MemoKey& k) const {
-            std::size_t h = std::hash<int>()(k.level);
-            h ^= std::hash<double>()(k.score_rounded) + 0x9e3779b9 + (h << 6) + (h >> 2);
-            for (const auto& key_str : k.non_zero_keys) {
-                h ^= std::hash<std::string>()(key_str) + 0x9e3779b9 + (h << 6) + (h >> 2);
-            }
-            return h;
+            return std::hash<uint64_t>()(k.packed);
         }
     };
 }
@@ -111,17 +201,23 @@ struct DiscardScheduler {
 
 typedef std::vector<std::string> LockedKeys;
 
+EntryMask locked_mask_of(const LockedKeys& locked_keys) {
+    EntryMask mask = 0;
+    for (const auto& key : locked_keys) mask |= entry_bit(entry_index(key));
+    return mask;
+}
+
 struct CacheKey {
     EntryCoef coef;
     double score_thres;
     DiscardScheduler scheduler;
-    LockedKeys locked_keys;
+    EntryMask locked_mask;
 
     bool operator==(const CacheKey& other) const {
-        return coef == other.coef && 
+        return coef.values == other.coef.values && 
                 std::abs(score_thres - other.score_thres) < 1e-6 &&
                 scheduler == other.scheduler &&
-                locked_keys == other.locked_keys;
+                locked_mask == other.locked_mask;
     }
 };
 
@@ -129,54 +225,80 @@ struct CacheKey {
 struct CacheKeyHash {
     std::size_t operator()(const CacheKey& key) const {
         std::size_t h = 0;
-        for (const auto& kv : key.coef.values) {
-            h ^= std::hash<std::string>()(kv.first) + 
-                    std::hash<int>()(int(std::round(kv.second * 10)));
+        for (int i = 0; i < NUM_ENTRIES; ++i) {
+            h ^= std::hash<double>()(key.coef.values[i]) + 0x9e3779b9 + (h << 6) + (h >> 2);
         }
         h ^= std::hash<int>()(int(std::round(key.score_thres * 10)));
         for (const auto& threshold : key.scheduler.thresholds) {
             h ^= std::hash<int>()(int(std::round(threshold * 1000)));
         }
-        for (const auto& locked_key : key.locked_keys) {
-            h ^= std::hash<std::string>()(locked_key) + 0x9e3779b9 + (h << 6) + (h >> 2);
-        }
+        h ^= std::hash<EntryMask>()(key.locked_mask) + 0x9e3779b9 + (h << 6) + (h >> 2);
         return h;
     }
 };
 
+// Thread-safe LRU cache of shared values. Callers keep a shared_ptr to the value, so an
+// entry evicted by another thread stays alive until they are done with it.
 template<typename Key, typename Value, typename Hasher>
 class LRUCache {
 public:
     LRUCache(size_t max_size) : max_size_(max_size) {}
 
-    Value& operator[](const Key& key) {
+    std::shared_ptr<Value> find(const Key& key) {
+        std::lock_guard<std::mutex> lock(mutex_);
         auto it = map_.find(key);
+        if (it == map_.end()) return nullptr;
+        // Key found, move to front (most recently used)
+        list_.splice(list_.begin(), list_, it->second.second);
+        return it->second.first;
+    }
 
+    // Store value unless another thread got there first; returns the value that is cached.
+    std::shared_ptr<Value> insert(const Key& key, std::shared_ptr<Value> value) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        auto it = map_.find(key);
         if (it != map_.end()) {
-            // Key found, move to front (most recently used)
             list_.splice(list_.begin(), list_, it->second.second);
             return it->second.first;
         }
 
-        // Key not found, must insert
         if (map_.size() >= max_size_ && !list_.empty()) {
             // Cache is full, evict least recently used
-            Key lru_key = list_.back();
+            map_.erase(list_.back());
             list_.pop_back();
-            map_.erase(lru_key);
         }
+        list_.push_front(key);
+        map_.emplace(key, CacheEntry(value, list_.begin()));
+        return value;
+    }
 
-        // Insert new element
+    // For values that are cheap to construct: the factory runs under the cache lock.
+    template<typename Factory>
+    std::shared_ptr<Value> get_or_create(const Key& key, Factory&& create) {
+        std::shared_ptr<Value> value = find(key);
+        return value ? value : insert(key, create());
+    }
+
+    void replace(const Key& key, std::shared_ptr<Value> value) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        auto it = map_.find(key);
+        if (it != map_.end()) {
+            list_.erase(it->second.second);
+            map_.erase(it);
+        }
+        if (map_.size() >= max_size_ && !list_.empty()) {
+            map_.erase(list_.back());
+            list_.pop_back();
+        }
         list_.push_front(key);
-        auto& entry = map_[key];
-        entry.second = list_.begin();
-        return entry.first;
+        map_.emplace(key, CacheEntry(value, list_.begin()));
     }
 
 private:
     using ListIterator = typename std::list<Key>::iterator;
-    using CacheEntry = std::pair<Value, ListIterator>;
+    using CacheEntry = std::pair<std::shared_ptr<Value>, ListIterator>;
     size_t max_size_;
+    std::mutex mutex_;
     std::list<Key> list_;
     std::unordered_map<Key, CacheEntry, Hasher> map_;
 };
@@ -213,122 +335,379 @@ struct Result {
 
 MemoKey get_memo_key(const EchoProfile& profile, const EntryCoef& coef) {
     MemoKey key;
-    key.level = profile.level;
-    for (const auto& kv : profile.values) {
-        if (std::abs(kv.second) > 1e-5) {
-            key.non_zero_keys.push_back(kv.first);
-        }
-    }
-    std::sort(key.non_zero_keys.begin(), key.non_zero_keys.end());
-    key.score = get_score(profile, coef);
-    key.score_rounded = std::round(key.score * 20) / 20.0;
+    key.packed = uint64_t(profile.level & 0x1f)
+        | (uint64_t(profile.mask & 0x1fff) << 5)
+        | (uint64_t(uint32_t(int32_t(get_score_bin(profile, coef)))) << 32);
     return key;
 }
 
-std::vector<std::string> get_avail_keys(const EchoProfile& profile, const EntryCoef& coef, bool include_non_effective = false) {
-    std::vector<std::string> avail_keys;
-    for (std::unordered_map<std::string, double>::const_iterator it2 = coef.values.begin(); it2 != coef.values.end(); ++it2) {
-        if (std::abs(it2->second) < 1e-5 && !include_non_effective) continue;
-        double v = 0.0;
-        std::unordered_map<std::string, double>::const_iterator it3 = profile.values.find(it2->first);
-        if (it3 != profile.values.end()) v = it3->second;
-        if (std::abs(v) < 1e-5) avail_keys.push_back(it2->first);
+std::vector<int> get_avail_keys(const EchoProfile& profile, const EntryCoef& coef, bool include_non_effective = false) {
+    std::vector<int> avail_keys;
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        if (!coef.is_effective(i) && !include_non_effective) continue;
+        if (!(profile.mask & entry_bit(i))) avail_keys.push_back(i);
     }
     return avail_keys;
 }
 
-using StatDataCpp = std::unordered_map<std::string, std::vector<std::pair<double, double>>>;
+using StatDataCpp = std::array<std::vector<std::pair<double, double>>, NUM_ENTRIES>;
 
-StatDataCpp pre_process_stat_data(const EntryCoef& coef, const py::dict& stat_data_py) {
+StatDataCpp pre_process_stat_data(const py::dict& stat_data_py) {
     StatDataCpp stat_data;
-    for (const auto& kv : coef.values) {
-        const std::string& key = kv.first;
-        if (stat_data_py.contains(key.c_str())) {
-            py::object stat_info = stat_data_py[key.c_str()];
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        const char* key = ENTRY_KEYS[i];
+        if (stat_data_py.contains(key)) {
+            py::object stat_info = stat_data_py[key];
             py::list dist_py = stat_info.attr("get")("distribution", py::list());
-            if (!dist_py.empty()) {
-                std::vector<std::pair<double, double>> dist;
-                dist.reserve(dist_py.size());
-                for (auto entry_py : dist_py) {
-                    dist.emplace_back(py::float_(entry_py["value"]), py::float_(entry_py["probability"]));
-                }
-                stat_data[key] = std::move(dist);
+            std::vector<std::pair<double, double>>& dist = stat_data[i];
+            dist.reserve(dist_py.size());
+            for (auto entry_py : dist_py) {
+                dist.emplace_back(py::float_(entry_py["value"]), py::float_(entry_py["probability"]));
             }
         }
     }
     return stat_data;
 }
 
-bool satisfies_locked_keys(const EchoProfile& profile, const LockedKeys& locked_keys) {
-    for (const auto& key : locked_keys) {
-        auto it = profile.values.find(key);
-        if (it == profile.values.end() || std::abs(it->second) < 1e-5) {
-            return false;
+// Stat data converted once on the Python side and reused by every call, so the
+// bindings no longer walk the nested yaml dict on each request.
+struct StatTable {
+    StatDataCpp data;
+    StatTable(const py::dict& stat_data_py) : data(pre_process_stat_data(stat_data_py)) {}
+};
+
+bool satisfies_locked_keys(const EchoProfile& profile, EntryMask locked_mask) {
+    return (profile.mask & locked_mask) == locked_mask;
+}
+
+typedef std::array<std::vector<std::pair<int, double>>, NUM_ENTRIES> EntryBins;
+
+// Value distribution of every effective entry, converted to score bins under `coef`.
+EntryBins get_entry_bins(const EntryCoef& coef, const StatDataCpp& stat_data) {
+    EntryBins entry_bins;
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        if (!coef.is_effective(i)) continue;
+        entry_bins[i].reserve(stat_data[i].size());
+        for (const auto& entry : stat_data[i]) {
+            entry_bins[i].emplace_back(entry_score_bin(entry.first, coef.values[i]), entry.second);
+        }
+    }
+    return entry_bins;
+}
+
+// Distribution of the final score bin, stored densely from `offset` upwards. `tail`
+// holds the suffix sums of `pmf`, so any threshold query is a single lookup.
+struct ScoreHistogram {
+    int offset = 0;
+    std::vector<double> pmf;
+    std::vector<double> tail;
+
+    void build_tail() {
+        tail.assign(pmf.size() + 1, 0.0);
+        for (int i = (int)pmf.size() - 1; i >= 0; --i) tail[i] = tail[i + 1] + pmf[i];
+    }
+
+    double prob_at_least(int bin) const {
+        int idx = std::clamp(bin - offset, 0, (int)pmf.size());
+        return tail[idx];
+    }
+};
+
+ScoreHistogram _score_histogram(
+    const MemoKey& profile_key,
+    const EntryCoef& coef,
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data
+) {
+    int level = profile_key.level();
+    EntryMask profile_mask = profile_key.mask();
+    int remain_slots = std::max(0, 5 - level / 5);
+    int m = NUM_ENTRIES - (level / 5);
+
+    // Each available key adds one of its values, pre-converted to score bins.
+    EntryBins entry_bins = get_entry_bins(coef, stat_data);
+    std::vector<int> avail_keys;
+    int min_add = 0, max_add = 0;
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        if (!coef.is_effective(i) || (profile_mask & entry_bit(i))) continue;
+        avail_keys.push_back(i);
+        for (const auto& [add, p] : entry_bins[i]) {
+            min_add = std::min(min_add, add);
+            max_add = std::max(max_add, add);
+        }
+    }
+
+    // dp[j * width + b]: probability of having j slots left with score bin `lo + b`.
+    int lo = profile_key.score_bin() + remain_slots * min_add;
+    int hi = profile_key.score_bin() + remain_slots * max_add;
+    int width = hi - lo + 1;
+    std::vector<double> dp((remain_slots + 1) * width, 0.0), next_dp(dp.size(), 0.0);
+    std::vector<int> first(remain_slots + 1, width), last(remain_slots + 1, -1);
+    std::vector<int> next_first(first), next_last(last);
+    dp[remain_slots * width + (profile_key.score_bin() - lo)] = 1.0;
+    first[remain_slots] = last[remain_slots] = profile_key.score_bin() - lo;
+
+    for (int i = 0; i < (int)avail_keys.size(); ++i) {
+        bool locked = (locked_mask & entry_bit(avail_keys[i])) != 0;
+        int max_j = std::min(m - i, remain_slots);
+        std::fill(next_dp.begin(), next_dp.end(), 0.0);
+        std::fill(next_first.begin(), next_first.end(), width);
+        std::fill(next_last.begin(), next_last.end(), -1);
+        for (int j = 0; j <= max_j; ++j) {
+            if (first[j] > last[j]) continue;
+            double appear_prob = m - i > 0 ? double(j) / (m - i) : 0.0;
+            const double* row = &dp[j * width];
+            if (!locked && appear_prob < 1.0) {
+                double* out = &next_dp[j * width];
+                for (int b = first[j]; b <= last[j]; ++b) out[b] += row[b] * (1 - appear_prob);
+                next_first[j] = std::min(next_first[j], first[j]);
+                next_last[j] = std::max(next_last[j], last[j]);
+            }
+            if (j > 0) {
+                // Drawing this key is a convolution with its value distribution.
+                double* out = &next_dp[(j - 1) * width];
+                for (const auto& [add, p] : entry_bins[avail_keys[i]]) {
+                    double factor = appear_prob * p;
+                    for (int b = first[j]; b <= last[j]; ++b) out[b + add] += row[b] * factor;
+                }
+                next_first[j - 1] = std::min(next_first[j - 1], first[j] + min_add);
+                next_last[j - 1] = std::max(next_last[j - 1], last[j] + max_add);
+            }
         }
+        dp.swap(next_dp);
+        first.swap(next_first);
+        last.swap(next_last);
     }
-    return true;
+
+    ScoreHistogram histogram;
+    histogram.offset = lo;
+    histogram.pmf.assign(width, 0.0);
+    for (int j = 0; j <= remain_slots; ++j) {
+        for (int b = std::max(0, first[j]); b <= std::min(width - 1, last[j]); ++b) histogram.pmf[b] += dp[j * width + b];
+    }
+    histogram.build_tail();
+    return histogram;
+}
+
+struct HistogramTable {
+    std::mutex mutex;
+    std::unordered_map<uint64_t, std::shared_ptr<const ScoreHistogram>> histograms;
+};
+
+// Score histograms are cached per (coef, locked keys) and per state. The histogram only
+// depends on the stage, the effective entries already present and the score bin. The
+// cache holds more tables than the others so that evaluating an inventory against every
+// character in entry_coef.yml does not evict its own tables.
+std::shared_ptr<const ScoreHistogram> get_score_histogram(
+    const MemoKey& profile_key,
+    const EntryCoef& coef,
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data
+) {
+    static LRUCache<CacheKey, HistogramTable, CacheKeyHash> histogram_cache(64);
+    std::shared_ptr<HistogramTable> table = histogram_cache.get_or_create(
+        CacheKey{coef, 0.0, DiscardScheduler(), locked_mask}, [] { return std::make_shared<HistogramTable>(); });
+
+    EntryMask mask = profile_key.mask() & coef.effective_mask();
+    uint64_t state = uint64_t(profile_key.level() / 5) | (uint64_t(mask) << 3) | (uint64_t(uint32_t(profile_key.score_bin())) << 32);
+    {
+        std::lock_guard<std::mutex> lock(table->mutex);
+        auto it = table->histograms.find(state);
+        if (it != table->histograms.end()) return it->second;
+    }
+
+    // Build outside the lock so other states can be served meanwhile; the first insert wins.
+    auto histogram = std::make_shared<const ScoreHistogram>(_score_histogram(profile_key, coef, locked_mask, stat_data));
+    std::lock_guard<std::mutex> lock(table->mutex);
+    return table->histograms.emplace(state, histogram).first->second;
 }
 
 double _prob_above_score(
     const MemoKey& profile_key,
     const EntryCoef& coef,
     double threshold,
-    const LockedKeys& locked_keys,
+    EntryMask locked_mask,
     const StatDataCpp& stat_data
 ) {
-    std::vector<std::string> keys;
-    for (std::unordered_map<std::string, double>::const_iterator it = coef.values.begin(); it != coef.values.end(); ++it) keys.push_back(it->first);
-    int remain_slots = 5 - profile_key.level / 5;
-    double init_score = profile_key.score;
+    return get_score_histogram(profile_key, coef, locked_mask, stat_data)->prob_at_least(threshold_score_bin(threshold));
+}
 
-    std::vector<std::string> avail_keys;
-    for (std::unordered_map<std::string, double>::const_iterator it = coef.values.begin(); it != coef.values.end(); ++it) {
-        if (std::abs(it->second) < 1e-5) continue;
-        if (std::find(profile_key.non_zero_keys.begin(), profile_key.non_zero_keys.end(), it->first) == profile_key.non_zero_keys.end()) {
-            avail_keys.push_back(it->first);
-        }
+// Upgrade states reachable from an empty profile under a coef, grouped by stage (level / 5).
+// A state only depends on states of the next stage, so every solver can sweep the stages
+// backwards as flat arrays, in parallel if needed. Edges keep the enumeration order of the
+// recursive solvers, which keeps the floating-point sums identical to theirs.
+//
+// The graph does not depend on the threshold. A state is finished once its score bin
+// reaches the threshold with the locked keys present; all descendants of a finished state
+// are finished too, so a non-finished state is always reached through non-finished ones.
+struct UpgradeGraph {
+    struct State {
+        MemoKey key;
+        uint32_t edge_begin, edge_end;
+    };
+    struct Edge {
+        uint32_t child;  // index into the next stage
+        double prob;
+    };
+
+    std::array<std::vector<State>, 6> stages;
+    std::array<std::unordered_map<uint64_t, uint32_t>, 6> index;
+    std::vector<Edge> edges;
+
+    // Index of the state within its stage, or -1 if the key is not a state of the graph.
+    int64_t find(const MemoKey& key) const {
+        if (key.level() % 5 != 0) return -1;
+        const auto& stage_index = index[key.level() / 5];
+        auto it = stage_index.find(key.packed);
+        return it == stage_index.end() ? -1 : (int64_t)it->second;
     }
+};
 
-    typedef std::map<double, double> ScoreMap;
-    int num_avail_keys = (int)avail_keys.size();
-    std::vector<std::vector<ScoreMap>> dp(num_avail_keys + 1, std::vector<ScoreMap>(remain_slots + 1));
-    dp[0][remain_slots][init_score] = 1.0;
+inline bool is_finished(const MemoKey& key, int thres_bin, EntryMask locked_mask) {
+    return key.score_bin() >= thres_bin && (key.mask() & locked_mask) == locked_mask;
+}
 
-    int m = (int)keys.size() - (profile_key.level / 5);
+std::shared_ptr<const UpgradeGraph> build_upgrade_graph(const EntryCoef& coef, const StatDataCpp& stat_data) {
+    auto graph = std::make_shared<UpgradeGraph>();
+    EntryBins entry_bins = get_entry_bins(coef, stat_data);
+
+    MemoKey root;
+    root.packed = 0;
+    graph->stages[0].push_back({root, 0, 0});
+    graph->index[0].emplace(root.packed, 0);
+    for (int stage = 0; stage < 5; ++stage) {
+        auto& current = graph->stages[stage];
+        auto& next = graph->stages[stage + 1];
+        auto& next_index = graph->index[stage + 1];
+        auto child_of = [&](EntryMask mask, int score_bin) -> uint32_t {
+            MemoKey key;
+            key.packed = uint64_t((stage + 1) * 5) | (uint64_t(mask) << 5) | (uint64_t(uint32_t(score_bin)) << 32);
+            auto [it, inserted] = next_index.emplace(key.packed, (uint32_t)next.size());
+            if (inserted) next.push_back({key, 0, 0});
+            return it->second;
+        };
 
-    for (int i = 0; i < num_avail_keys; ++i) {
-        const std::string& key = avail_keys[i];
-        auto it_dist = stat_data.find(key);
-        int max_j = std::min(m - i, remain_slots);
-        for (int j = 0; j <= max_j; ++j) {
-            double appear_prob = double(j) / (m - i);
-            for (ScoreMap::const_iterator it = dp[i][j].begin(); it != dp[i][j].end(); ++it) {
-                double score = it->first;
-                double prob = it->second;
-                if (std::find(locked_keys.begin(), locked_keys.end(), key) == locked_keys.end()) {
-                    dp[i + 1][j][score] += prob * (1 - appear_prob);
-                }
-                if (j > 0 && it_dist != stat_data.end()) {
-                    const auto& dist = it_dist->second;
-                    for (const auto& entry : dist) {
-                        double value = entry.first;
-                        double p = entry.second;
-                        double add_score = value * coef.values.at(key);
-                        double new_score = std::round((score + add_score) * 20) / 20.0;
-                        dp[i + 1][j - 1][new_score] += prob * appear_prob * p;
-                    }
+        int m = NUM_ENTRIES - stage;
+        for (auto& state : current) {
+            state.edge_begin = (uint32_t)graph->edges.size();
+            EntryMask mask = state.key.mask();
+            int score_bin = state.key.score_bin();
+            int num_avail = 0;
+            for (int i = 0; i < NUM_ENTRIES; ++i) {
+                if (!coef.is_effective(i) || (mask & entry_bit(i))) continue;
+                ++num_avail;
+                for (const auto& [add, p] : entry_bins[i]) {
+                    graph->edges.push_back({child_of(mask | entry_bit(i), score_bin + add), p / m});
                 }
             }
+            graph->edges.push_back({child_of(mask, score_bin), double(m - num_avail) / m});
+            state.edge_end = (uint32_t)graph->edges.size();
         }
     }
+    return graph;
+}
 
-    double result = 0.0;
+std::shared_ptr<const UpgradeGraph> get_upgrade_graph(const EntryCoef& coef, const StatDataCpp& stat_data) {
+    static LRUCache<CacheKey, const UpgradeGraph, CacheKeyHash> graph_cache(20);
+    CacheKey key{coef, 0.0, DiscardScheduler(), 0};
+    std::shared_ptr<const UpgradeGraph> graph = graph_cache.find(key);
+    return graph ? graph : graph_cache.insert(key, build_upgrade_graph(coef, stat_data));
+}
 
-    for (auto& score_map: dp[num_avail_keys]) {
-        for (auto& [score, prob] : score_map) if (score >= threshold) result += prob;
+// Probability of finishing at or above the threshold from every upgrade state when
+// nothing is discarded. A state is (stage, effective entry mask, score bin) and its
+// probability follows from its children, so each state is solved exactly once and
+// the table is shared by the statistics, scheduler and example-profile routines.
+// All public methods lock the table, so one instance can be shared between threads.
+class ReachProbTable {
+public:
+    ReachProbTable(const EntryCoef& coef, double score_thres, EntryMask locked_mask, const StatDataCpp& stat_data)
+        : entry_bins_(get_entry_bins(coef, stat_data)), threshold_bin_(threshold_score_bin(score_thres)) {
+        effective_mask_ = coef.effective_mask();
+        locked_mask_ = locked_mask & effective_mask_;
     }
-    
-    return result;
+
+    double get(const MemoKey& key) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        return solve(key.level() / 5, key.mask(), key.score_bin());
+    }
+
+    // Snapshot of every state reachable from an empty profile, for the persistent cache.
+    std::pair<std::vector<uint64_t>, std::vector<double>> export_states() {
+        std::lock_guard<std::mutex> lock(mutex_);
+        solve(0, 0, 0);
+        std::pair<std::vector<uint64_t>, std::vector<double>> states;
+        states.first.reserve(probs_.size());
+        states.second.reserve(probs_.size());
+        for (const auto& [state, prob] : probs_) {
+            states.first.push_back(state);
+            states.second.push_back(prob);
+        }
+        return states;
+    }
+
+    // Probabilities of a whole stage of the upgrade graph under a single lock.
+    std::vector<double> get_stage(const std::vector<UpgradeGraph::State>& states) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        std::vector<double> probs(states.size());
+        for (size_t j = 0; j < states.size(); ++j) {
+            const MemoKey& key = states[j].key;
+            probs[j] = solve(key.level() / 5, key.mask(), key.score_bin());
+        }
+        return probs;
+    }
+
+    void load_states(const uint64_t* states, const double* probs, size_t n) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        probs_.reserve(probs_.size() + n);
+        for (size_t i = 0; i < n; ++i) probs_.emplace(states[i], probs[i]);
+    }
+
+private:
+    double solve(int stage, EntryMask mask, int score_bin) {
+        mask &= effective_mask_;
+        if (stage >= 5) {
+            return score_bin >= threshold_bin_ && (mask & locked_mask_) == locked_mask_ ? 1.0 : 0.0;
+        }
+
+        uint64_t state = uint64_t(stage) | (uint64_t(mask) << 3) | (uint64_t(uint32_t(score_bin)) << 32);
+        auto it = probs_.find(state);
+        if (it != probs_.end()) return it->second;
+
+        int m = NUM_ENTRIES - stage;
+        int num_avail = 0;
+        double prob = 0.0;
+        for (int i = 0; i < NUM_ENTRIES; ++i) {
+            if (!(effective_mask_ & entry_bit(i)) || (mask & entry_bit(i))) continue;
+            ++num_avail;
+            for (const auto& [add, p] : entry_bins_[i]) {
+                prob += solve(stage + 1, mask | entry_bit(i), score_bin + add) * (p / m);
+            }
+        }
+        if (m > num_avail) prob += solve(stage + 1, mask, score_bin) * (double(m - num_avail) / m);
+
+        probs_[state] = prob;
+        return prob;
+    }
+
+    std::mutex mutex_;
+    EntryBins entry_bins_;
+    int threshold_bin_;
+    EntryMask effective_mask_ = 0;
+    EntryMask locked_mask_ = 0;
+    std::unordered_map<uint64_t, double> probs_;
+};
+
+std::shared_ptr<ReachProbTable> get_reach_prob_table(
+    const EntryCoef& coef,
+    double score_thres,
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data
+) {
+    static LRUCache<CacheKey, ReachProbTable, CacheKeyHash> reach_prob_cache(20);
+    return reach_prob_cache.get_or_create(CacheKey{coef, score_thres, DiscardScheduler(), locked_mask}, [&] {
+        return std::make_shared<ReachProbTable>(coef, score_thres, locked_mask, stat_data);
+    });
 }
 
 double prob_above_score(
@@ -336,314 +715,1152 @@ double prob_above_score(
     const EntryCoef& coef,
     double threshold,
     const LockedKeys& locked_keys,
-    const py::dict& stat_data_py
+    const StatTable& stat_table
 ) {
-    StatDataCpp stat_data = pre_process_stat_data(coef, stat_data_py);
-    return _prob_above_score(get_memo_key(profile, coef), coef, threshold, locked_keys, stat_data);
+    const StatDataCpp& stat_data = stat_table.data;
+    py::gil_scoped_release release;
+    return _prob_above_score(get_memo_key(profile, coef), coef, threshold, locked_mask_of(locked_keys), stat_data);
 }
 
-static std::vector<int> echo_exp = {0, 500, 1000, 2000, 3000, 4500, 6500, 8500, 10500, 13500, 16500, 20500, 
+// Final score distribution of a profile as (scores, probabilities), restricted to reachable scores.
+py::tuple score_distribution(
+    const EchoProfile& profile,
+    const EntryCoef& coef,
+    const LockedKeys& locked_keys,
+    const StatTable& stat_table
+) {
+    const StatDataCpp& stat_data = stat_table.data;
+    std::vector<double> scores, pmf;
+    {
+        py::gil_scoped_release release;
+        std::shared_ptr<const ScoreHistogram> histogram = get_score_histogram(get_memo_key(profile, coef), coef, locked_mask_of(locked_keys), stat_data);
+        for (int i = 0; i < (int)histogram->pmf.size(); ++i) {
+            if (histogram->pmf[i] <= 0.0) continue;
+            scores.push_back((histogram->offset + i) / SCORE_BIN_SCALE);
+            pmf.push_back(histogram->pmf[i]);
+        }
+    }
+    return py::make_tuple(py::array_t<double>(scores.size(), scores.data()), py::array_t<double>(pmf.size(), pmf.data()));
+}
+
+static const std::vector<int> echo_exp = {0, 500, 1000, 2000, 3000, 4500, 6500, 8500, 10500, 13500, 16500, 20500, 
     24500, 29000, 34000, 40000, 46000, 53500, 61000, 70000, 79500, 90000, 101500, 114000, 127500, 143000};
 
+// Statistics of every graph state for one (threshold, scheduler, locked keys), filled by a
+// single backward sweep over the upgrade graph.
+typedef std::array<std::vector<Result>, 6> StatisticsTable;
+
+StatisticsTable sweep_statistics(
+    const UpgradeGraph& graph,
+    ReachProbTable& reach_prob,
+    int thres_bin,
+    EntryMask locked_mask,
+    const DiscardScheduler& scheduler
+) {
+    StatisticsTable table;
+    for (int stage = 5; stage >= 0; --stage) {
+        const auto& states = graph.stages[stage];
+        int level = stage * 5;
+        double discard_thres = scheduler.get_threshold_for_level(level);
+        std::vector<double> reach_probs;
+        if (stage < 5 && discard_thres > 0.0) reach_probs = reach_prob.get_stage(states);
+
+        auto& results = table[stage];
+        results.resize(states.size());
+        for (size_t j = 0; j < states.size(); ++j) {
+            const auto& state = states[j];
+            if (is_finished(state.key, thres_bin, locked_mask)) {
+                results[j] = Result(1.0, 0.0, 0.0);
+            } else if (stage == 5) {
+                results[j] = Result(0.0, echo_exp[25], 50);
+            } else if (!reach_probs.empty() && reach_probs[j] < discard_thres) {
+                results[j] = Result(0.0, echo_exp[level], level / 5 * 10);
+            } else {
+                Result result(0.0, 0.0, 0.0);
+                for (uint32_t e = state.edge_begin; e < state.edge_end; ++e) {
+                    result += table[stage + 1][graph.edges[e].child] * graph.edges[e].prob;
+                }
+                results[j] = result;
+            }
+        }
+    }
+    return table;
+}
+
+LRUCache<CacheKey, const StatisticsTable, CacheKeyHash>& statistics_cache() {
+    static LRUCache<CacheKey, const StatisticsTable, CacheKeyHash> cache(20);
+    return cache;
+}
+
+std::shared_ptr<const StatisticsTable> get_statistics_table(
+    const EntryCoef& coef,
+    double score_thres,
+    const DiscardScheduler& scheduler,
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data
+) {
+    CacheKey key{coef, score_thres, scheduler, locked_mask};
+    std::shared_ptr<const StatisticsTable> table = statistics_cache().find(key);
+    if (table) return table;
+
+    std::shared_ptr<const UpgradeGraph> graph = get_upgrade_graph(coef, stat_data);
+    std::shared_ptr<ReachProbTable> reach_prob = get_reach_prob_table(coef, score_thres, locked_mask, stat_data);
+    auto swept = std::make_shared<StatisticsTable>(
+        sweep_statistics(*graph, *reach_prob, threshold_score_bin(score_thres), locked_mask, scheduler));
+    return statistics_cache().insert(key, swept);
+}
+
+// Statistics of a profile from the swept table. Profiles between two stages (e.g. lv 7) or
+// with entry sets that cannot come from an empty echo are not graph states; they are
+// solved from their children like the table itself.
+Result statistics_of(
+    const EchoProfile& p,
+    const EntryCoef& coef,
+    int thres_bin,
+    EntryMask locked_mask,
+    const DiscardScheduler& scheduler,
+    const UpgradeGraph& graph,
+    const StatisticsTable& table,
+    ReachProbTable& reach_prob,
+    const StatDataCpp& stat_data
+) {
+    MemoKey key = get_memo_key(p, coef);
+    int64_t idx = graph.find(key);
+    if (idx >= 0) return table[key.level() / 5][idx];
+
+    if (is_finished(key, thres_bin, locked_mask)) return Result(1.0, 0.0, 0.0);
+    if (p.level == 25) return Result(0.0, echo_exp[25], 50);
+    if (reach_prob.get(key) < scheduler.get_threshold_for_level(p.level)) {
+        return Result(0.0, echo_exp[p.level], p.level / 5 * 10);
+    }
+
+    Result result(0.0, 0.0, 0.0);
+    std::vector<int> avail_keys = get_avail_keys(p, coef, false);
+    int m = NUM_ENTRIES - (p.level / 5);
+    EchoProfile new_p = p;
+    new_p.level = ((p.level / 5) + 1) * 5;
+    for (int key_idx : avail_keys) {
+        for (const auto& entry : stat_data[key_idx]) {
+            new_p.set_value(key_idx, entry.first);
+            result += statistics_of(new_p, coef, thres_bin, locked_mask, scheduler, graph, table, reach_prob, stat_data) * (entry.second / m);
+        }
+        new_p.set_value(key_idx, 0.0);
+    }
+    int useless_keys = m - (int)avail_keys.size();
+    result += statistics_of(new_p, coef, thres_bin, locked_mask, scheduler, graph, table, reach_prob, stat_data) * ((double)useless_keys / m);
+    return result;
+}
+
 Result _get_statistics_internal(
     const EchoProfile& profile,
     const EntryCoef& coef,
     double score_thres,
-    const LockedKeys& locked_keys,
+    EntryMask locked_mask,
     const DiscardScheduler& scheduler,
     const StatDataCpp& stat_data
 ) {
-    static LRUCache<CacheKey, std::unordered_map<MemoKey, Result>, CacheKeyHash> waste_exp_cache(20);
-    CacheKey current_key{coef, score_thres, scheduler, locked_keys};
+    std::shared_ptr<const UpgradeGraph> graph = get_upgrade_graph(coef, stat_data);
+    std::shared_ptr<const StatisticsTable> table = get_statistics_table(coef, score_thres, scheduler, locked_mask, stat_data);
+    std::shared_ptr<ReachProbTable> reach_prob = get_reach_prob_table(coef, score_thres, locked_mask, stat_data);
 
-    auto& stored_expectations = waste_exp_cache[current_key];
+    EchoProfile p = profile;
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        if (!coef.is_effective(i)) p.set_value(i, 0.0);
+    }
+    return statistics_of(p, coef, threshold_score_bin(score_thres), locked_mask, scheduler, *graph, *table, *reach_prob, stat_data);
+}
 
-    std::function<Result(const EchoProfile&)> solve = [&](const EchoProfile& p) -> Result {
-        MemoKey key = get_memo_key(p, coef);
+Result get_statistics(
+    const EchoProfile& profile,
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    const DiscardScheduler& scheduler,
+    const StatTable& stat_table
+) {
+    const StatDataCpp& stat_data = stat_table.data;
+    py::gil_scoped_release release;
+    return _get_statistics_internal(profile, coef, score_thres, locked_mask_of(locked_keys), scheduler, stat_data);
+}
 
-        double score = key.score;
+double _get_expected_score(const EchoProfile& profile, const EntryCoef& coef, const StatDataCpp& stat_data) {
+    int remain_slots = (25 - profile.level) / 5;
+    int num_possible = NUM_ENTRIES - (int)std::bitset<NUM_ENTRIES>(profile.mask).count();
+    double total = get_score(profile, coef);
+    if (num_possible == 0) return total;
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        if (profile.mask & entry_bit(i)) continue;
+        double expected_value = 0.0;
+        for (const auto& entry : stat_data[i]) expected_value += entry.first * entry.second;
+        total += expected_value * remain_slots / num_possible * coef.values[i];
+    }
+    return total;
+}
 
-        auto it = stored_expectations.find(key);
-        if (it != stored_expectations.end()) return it->second;
+// Analyze a whole inventory at once. Each row of `profiles` holds the level followed by
+// the entry values in ENTRY_KEYS order; all rows share the same solver tables.
+py::dict analyze_profiles(
+    py::array_t<double, py::array::c_style | py::array::forcecast> profiles,
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    const DiscardScheduler& scheduler,
+    const StatTable& stat_table
+) {
+    if (profiles.ndim() != 2 || profiles.shape(1) != NUM_ENTRIES + 1) {
+        throw std::runtime_error("profiles must be an (N, " + std::to_string(NUM_ENTRIES + 1) + ") array");
+    }
+    const StatDataCpp& stat_data = stat_table.data;
+    EntryMask locked_mask = locked_mask_of(locked_keys);
+
+    py::ssize_t n = profiles.shape(0);
+    py::array_t<double> score(n), expected_score(n), prob_above_threshold(n);
+    py::array_t<double> prob_with_discard(n), expected_wasted_exp(n), expected_wasted_tuner(n);
+    auto rows = profiles.unchecked<2>();
+    auto score_out = score.mutable_unchecked<1>();
+    auto expected_out = expected_score.mutable_unchecked<1>();
+    auto prob_out = prob_above_threshold.mutable_unchecked<1>();
+    auto discard_out = prob_with_discard.mutable_unchecked<1>();
+    auto exp_out = expected_wasted_exp.mutable_unchecked<1>();
+    auto tuner_out = expected_wasted_tuner.mutable_unchecked<1>();
+
+    // The inputs and outputs are plain buffers from here on, so the GIL can be dropped.
+    py::gil_scoped_release release;
+    std::shared_ptr<ReachProbTable> reach_prob = get_reach_prob_table(coef, score_thres, locked_mask, stat_data);
+    for (py::ssize_t r = 0; r < n; ++r) {
+        EchoProfile profile;
+        profile.level = (int)rows(r, 0);
+        for (int i = 0; i < NUM_ENTRIES; ++i) profile.set_value(i, rows(r, i + 1));
+
+        Result result = _get_statistics_internal(profile, coef, score_thres, locked_mask, scheduler, stat_data);
+        score_out(r) = get_score(profile, coef);
+        expected_out(r) = _get_expected_score(profile, coef, stat_data);
+        prob_out(r) = reach_prob->get(get_memo_key(profile, coef));
+        discard_out(r) = result.prob_above_threshold_with_discard;
+        exp_out(r) = result.expected_wasted_exp;
+        tuner_out(r) = result.expected_wasted_tuner;
+    }
+    py::gil_scoped_acquire acquire;
+
+    py::dict output;
+    output["score"] = score;
+    output["expected_score"] = expected_score;
+    output["prob_above_threshold"] = prob_above_threshold;
+    output["prob_above_threshold_with_discard"] = prob_with_discard;
+    output["expected_wasted_exp"] = expected_wasted_exp;
+    output["expected_wasted_tuner"] = expected_wasted_tuner;
+    return output;
+}
 
-        if (score >= score_thres && satisfies_locked_keys(p, locked_keys)) {
-            return stored_expectations[key] = Result(1.0, 0.0, 0.0);
-        }
+// Derivatives of the reach probability and of the statistics with respect to every coef
+// weight and the threshold, so the frontend can extrapolate while a slider is dragged and
+// only run the exact solvers on release. Scores are compared in bins, so the exact outputs
+// are step functions of both; the success test is therefore replaced by a logistic step of
+// scale `bandwidth` score points, centred half a bin below the threshold bin, which tends
+// to the exact test as the bandwidth goes to zero. Discard decisions are held fixed.
+//
+// Every output is carried through the backward sweep together with its tangents
+// (forward-mode accumulation). Per output, a row holds
+//   SENS_VALUE      the smoothed output,
+//   SENS_DS         its derivative with respect to the score collected so far,
+//   SENS_DC + i     its derivative with respect to coef i through the entries still to come,
+//   SENS_DNONE      the same through the non-effective entries, summed over all of them.
+// The threshold only enters through score - threshold, so its derivative is -ds.
+enum { SENS_VALUE = 0, SENS_DS = 1, SENS_DC = 2, SENS_DNONE = SENS_DC + NUM_ENTRIES, SENS_STRIDE };
+
+struct SensitivityRules {
+    const DiscardScheduler* scheduler;  // nullptr for the reach probability
+    int thres_bin;
+    EntryMask locked_mask;
+    double bandwidth;
+
+    // One output for the reach probability, three for the statistics.
+    int outputs() const { return scheduler ? 3 : 1; }
+
+    // Smoothed success indicator of a score bin and its derivative with respect to the score.
+    std::pair<double, double> step(int score_bin) const {
+        double z = (score_bin - thres_bin + 0.5) / SCORE_BIN_SCALE / bandwidth;
+        double w = 1.0 / (1.0 + std::exp(-z));
+        return {w, w * (1.0 - w) / bandwidth};
+    }
+};
 
-        if (p.level == 25) {
-            return stored_expectations[key] = Result(0.0, echo_exp[25], 50);
+// Row of one state from the rows of its children. `for_each_child(visit)` calls
+// visit(prob, key_idx, value, child_row) for every upgrade, with key_idx -1 for the
+// non-effective entries; it is not called for states that stop upgrading.
+template <typename ForEachChild>
+void sensitivity_row(const SensitivityRules& rules, const MemoKey& key, bool discard, ForEachChild&& for_each_child, double* row) {
+    int outputs = rules.outputs();
+    int level = key.level();
+    std::fill(row, row + outputs * SENS_STRIDE, 0.0);
+
+    // Outputs on success, and when upgrading stops here without it.
+    const double success[3] = {1.0, 0.0, 0.0};
+    bool stops = level >= 25 || discard;
+    if (stops) {
+        if (rules.scheduler) {
+            row[SENS_STRIDE + SENS_VALUE] = echo_exp[level];
+            row[2 * SENS_STRIDE + SENS_VALUE] = level / 5 * 10;
         }
+    } else {
+        for_each_child([&](double prob, int key_idx, double value, const double* child) {
+            for (int o = 0; o < outputs; ++o) {
+                double* out = row + o * SENS_STRIDE;
+                const double* in = child + o * SENS_STRIDE;
+                for (int t = 0; t < SENS_STRIDE; ++t) out[t] += prob * in[t];
+                // The drawn entry moves the score by its value per unit of its coef.
+                if (key_idx >= 0) out[SENS_DC + key_idx] += prob * value * in[SENS_DS];
+                else out[SENS_DNONE] += prob * in[SENS_DS];
+            }
+        });
+    }
 
-        double prob = _prob_above_score(get_memo_key(p, coef), coef, score_thres, locked_keys, stat_data);
-        double discard_thres = scheduler.get_threshold_for_level(p.level);
-        if (prob < discard_thres) {
-            return stored_expectations[key] = Result(0.0, echo_exp[p.level], p.level / 5 * 10);
-        }
+    // The reach probability is only decided at lv 25, the statistics stop as soon as the
+    // threshold is reached.
+    if (!rules.scheduler && level < 25) return;
+    if ((key.mask() & rules.locked_mask) != rules.locked_mask) return;
+    auto [w, dw] = rules.step(key.score_bin());
+    for (int o = 0; o < outputs; ++o) {
+        double* out = row + o * SENS_STRIDE;
+        double cont = out[SENS_VALUE];
+        out[SENS_VALUE] = w * success[o] + (1.0 - w) * cont;
+        out[SENS_DS] = dw * (success[o] - cont) + (1.0 - w) * out[SENS_DS];
+        for (int t = SENS_DC; t < SENS_STRIDE; ++t) out[t] *= 1.0 - w;
+    }
+}
 
-        Result result(0.0, 0.0, 0.0);
-        std::vector<std::string> avail_keys = get_avail_keys(p, coef, false);
-        int m = (int)coef.values.size() - (p.level / 5);
-        int next_level = ((p.level / 5) + 1) * 5;
-        for (size_t i = 0; i < avail_keys.size(); ++i) {
-            const std::string& key_str = avail_keys[i];
-            EchoProfile new_p = p;
-            new_p.level = next_level;
-            
-            auto it_dist = stat_data.find(key_str);
-            if (it_dist != stat_data.end()) {
-                const auto& dist = it_dist->second;
-                for (const auto& entry : dist) {
-                    double value = entry.first;
-                    double pprob = entry.second;
-                    new_p.values[key_str] = value;
-                    result += solve(new_p) * (pprob / m);
+struct SensitivityTable {
+    double bandwidth;
+    std::array<std::vector<double>, 6> rows;  // rules.outputs() * SENS_STRIDE per state
+};
+
+SensitivityTable sweep_sensitivities(
+    const UpgradeGraph& graph,
+    const EntryCoef& coef,
+    const SensitivityRules& rules,
+    ReachProbTable* reach_prob,
+    const StatDataCpp& stat_data
+) {
+    int width = rules.outputs() * SENS_STRIDE;
+    SensitivityTable table;
+    table.bandwidth = rules.bandwidth;
+    for (int stage = 5; stage >= 0; --stage) {
+        const auto& states = graph.stages[stage];
+        int level = stage * 5;
+        double discard_thres = rules.scheduler ? rules.scheduler->get_threshold_for_level(level) : 0.0;
+        std::vector<double> reach_probs;
+        if (stage < 5 && discard_thres > 0.0) reach_probs = reach_prob->get_stage(states);
+
+        auto& rows = table.rows[stage];
+        rows.assign(states.size() * width, 0.0);
+        for (size_t j = 0; j < states.size(); ++j) {
+            const auto& state = states[j];
+            // Edges follow the build order: effective keys by index and value, then the useless draw.
+            auto for_each_child = [&](auto&& visit) {
+                const auto& next_rows = table.rows[stage + 1];
+                uint32_t e = state.edge_begin;
+                for (int i = 0; i < NUM_ENTRIES; ++i) {
+                    if (!coef.is_effective(i) || (state.key.mask() & entry_bit(i))) continue;
+                    for (const auto& entry : stat_data[i]) {
+                        const auto& edge = graph.edges[e++];
+                        visit(edge.prob, i, entry.first, &next_rows[edge.child * width]);
+                    }
                 }
+                const auto& edge = graph.edges[e];
+                visit(edge.prob, -1, 0.0, &next_rows[edge.child * width]);
+            };
+            bool discard = !reach_probs.empty() && reach_probs[j] < discard_thres;
+            sensitivity_row(rules, state.key, discard, for_each_child, &rows[j * width]);
+        }
+    }
+    return table;
+}
+
+// The tables are large (one row per graph state) and only needed while the weights are
+// being edited, so only a few are kept. The bandwidth is not part of the cache key; a
+// table swept with another bandwidth is replaced.
+std::shared_ptr<const SensitivityTable> get_sensitivity_table(
+    const EntryCoef& coef,
+    double score_thres,
+    const SensitivityRules& rules,
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data
+) {
+    static LRUCache<CacheKey, const SensitivityTable, CacheKeyHash> reach_cache(2), statistics_cache(2);
+    auto& cache = rules.scheduler ? statistics_cache : reach_cache;
+    CacheKey key{coef, score_thres, rules.scheduler ? *rules.scheduler : DiscardScheduler(), locked_mask};
+    std::shared_ptr<const SensitivityTable> table = cache.find(key);
+    if (table && table->bandwidth == rules.bandwidth) return table;
+
+    std::shared_ptr<const UpgradeGraph> graph = get_upgrade_graph(coef, stat_data);
+    std::shared_ptr<ReachProbTable> reach_prob;
+    if (rules.scheduler) reach_prob = get_reach_prob_table(coef, score_thres, locked_mask, stat_data);
+    table = std::make_shared<const SensitivityTable>(sweep_sensitivities(*graph, coef, rules, reach_prob.get(), stat_data));
+    cache.replace(key, table);
+    return table;
+}
+
+// Row of a profile from the swept table, solved from its children like statistics_of for
+// profiles that are not graph states. `p` only holds its effective entries.
+std::vector<double> sensitivity_of(
+    const EchoProfile& p,
+    const EntryCoef& coef,
+    const SensitivityRules& rules,
+    const UpgradeGraph& graph,
+    const SensitivityTable& table,
+    ReachProbTable* reach_prob,
+    const StatDataCpp& stat_data
+) {
+    int width = rules.outputs() * SENS_STRIDE;
+    MemoKey key = get_memo_key(p, coef);
+    // The reach probability does not depend on the level within a stage.
+    MemoKey graph_key = key;
+    if (!rules.scheduler) graph_key.packed = (key.packed & ~uint64_t(0x1f)) | uint64_t(key.level() / 5 * 5);
+    int64_t idx = graph.find(graph_key);
+    if (idx >= 0) {
+        const double* row = &table.rows[key.level() / 5][idx * width];
+        return std::vector<double>(row, row + width);
+    }
+
+    double discard_thres = rules.scheduler && p.level < 25 ? rules.scheduler->get_threshold_for_level(p.level) : 0.0;
+    bool discard = discard_thres > 0.0 && reach_prob->get(key) < discard_thres;
+    auto for_each_child = [&](auto&& visit) {
+        std::vector<int> avail_keys = get_avail_keys(p, coef, false);
+        int m = NUM_ENTRIES - (p.level / 5);
+        EchoProfile new_p = p;
+        new_p.level = ((p.level / 5) + 1) * 5;
+        for (int key_idx : avail_keys) {
+            for (const auto& entry : stat_data[key_idx]) {
+                new_p.set_value(key_idx, entry.first);
+                visit(entry.second / m, key_idx, entry.first, sensitivity_of(new_p, coef, rules, graph, table, reach_prob, stat_data).data());
             }
+            new_p.set_value(key_idx, 0.0);
         }
         int useless_keys = m - (int)avail_keys.size();
-        EchoProfile new_p = p;
-        new_p.level = next_level;
-        result += solve(new_p) * ((double)useless_keys / m);
-
-        stored_expectations[key] = result;
-        return result;
+        visit((double)useless_keys / m, -1, 0.0, sensitivity_of(new_p, coef, rules, graph, table, reach_prob, stat_data).data());
     };
+    std::vector<double> row(width);
+    sensitivity_row(rules, key, discard, for_each_child, row.data());
+    return row;
+}
+
+// Smoothed row of a profile, and its gradients as (outputs, NUM_ENTRIES) coef derivatives
+// and (outputs,) threshold derivatives.
+std::vector<double> _sensitivity_internal(
+    const EchoProfile& profile,
+    const EntryCoef& coef,
+    double score_thres,
+    EntryMask locked_mask,
+    const DiscardScheduler* scheduler,
+    double bandwidth,
+    const StatDataCpp& stat_data,
+    double* coef_grad,
+    double* thres_grad
+) {
+    if (!(bandwidth > 0.0)) throw std::invalid_argument("bandwidth must be positive");
+    // The reach probability ignores locked keys that are not effective, like ReachProbTable.
+    SensitivityRules rules{scheduler, threshold_score_bin(score_thres), scheduler ? locked_mask : locked_mask & coef.effective_mask(), bandwidth};
+    std::shared_ptr<const UpgradeGraph> graph = get_upgrade_graph(coef, stat_data);
+    std::shared_ptr<const SensitivityTable> table = get_sensitivity_table(coef, score_thres, rules, locked_mask, stat_data);
+    std::shared_ptr<ReachProbTable> reach_prob;
+    if (scheduler) reach_prob = get_reach_prob_table(coef, score_thres, locked_mask, stat_data);
 
     EchoProfile p = profile;
-    for (std::unordered_map<std::string, double>::const_iterator it = coef.values.begin(); it != coef.values.end(); ++it) {
-        if (std::abs(it->second) < 1e-5) p.values[it->first] = 0.0;
+    for (int i = 0; i < NUM_ENTRIES; ++i) {
+        if (!coef.is_effective(i)) p.set_value(i, 0.0);
     }
-    return solve(p);
+    std::vector<double> row = sensitivity_of(p, coef, rules, *graph, *table, reach_prob.get(), stat_data);
+
+    // A non-effective entry still to come is drawn uniformly among the absent ones.
+    int num_avail = (int)std::bitset<NUM_ENTRIES>(coef.effective_mask() & ~profile.mask).count();
+    int num_none = NUM_ENTRIES - profile.level / 5 - num_avail;
+    for (int o = 0; o < rules.outputs(); ++o) {
+        const double* r = &row[o * SENS_STRIDE];
+        for (int i = 0; i < NUM_ENTRIES; ++i) {
+            double grad = profile.values[i] * r[SENS_DS];
+            if (coef.is_effective(i)) {
+                grad += r[SENS_DC + i];
+            } else if (!(profile.mask & entry_bit(i)) && num_none > 0) {
+                double expected_value = 0.0;
+                for (const auto& entry : stat_data[i]) expected_value += entry.first * entry.second;
+                grad += expected_value * r[SENS_DNONE] / num_none;
+            }
+            coef_grad[o * NUM_ENTRIES + i] = grad;
+        }
+        thres_grad[o] = -r[SENS_DS];
+    }
+    return row;
 }
 
-Result get_statistics(
+// Exact reach probability, with its derivatives with respect to every coef weight (in
+// ENTRY_KEYS order) and the threshold.
+py::dict prob_above_score_gradient(
     const EchoProfile& profile,
     const EntryCoef& coef,
-    double score_thres,
+    double threshold,
     const LockedKeys& locked_keys,
-    const DiscardScheduler& scheduler,
-    const py::dict& stat_data_py
+    const StatTable& stat_table,
+    double bandwidth
 ) {
-    StatDataCpp stat_data = pre_process_stat_data(coef, stat_data_py);
-    return _get_statistics_internal(profile, coef, score_thres, locked_keys, scheduler, stat_data);
+    const StatDataCpp& stat_data = stat_table.data;
+    EntryMask locked_mask = locked_mask_of(locked_keys);
+    py::array_t<double> coef_grad(NUM_ENTRIES);
+    double value, thres_grad;
+    {
+        py::gil_scoped_release release;
+        _sensitivity_internal(profile, coef, threshold, locked_mask, nullptr, bandwidth, stat_data, coef_grad.mutable_data(), &thres_grad);
+        value = _prob_above_score(get_memo_key(profile, coef), coef, threshold, locked_mask, stat_data);
+    }
+    py::dict output;
+    output["value"] = value;
+    output["coef"] = coef_grad;
+    output["threshold"] = thres_grad;
+    return output;
 }
 
-EchoProfile _get_example_profile_above_threshold_internal(
-    int level,
-    double prob_above_threshold,
-    const EntryCoef& coef, 
+// Exact statistics as (prob_above_threshold_with_discard, expected_wasted_exp,
+// expected_wasted_tuner), with a (3, 13) array of coef derivatives and a (3,) array of
+// threshold derivatives.
+py::dict get_statistics_gradient(
+    const EchoProfile& profile,
+    const EntryCoef& coef,
     double score_thres,
     const LockedKeys& locked_keys,
-    const StatDataCpp& stat_data
+    const DiscardScheduler& scheduler,
+    const StatTable& stat_table,
+    double bandwidth
 ) {
-    static std::map<double, EchoProfile> example_profiles[5];
-    static std::optional<CacheKey> last_key;
+    const StatDataCpp& stat_data = stat_table.data;
+    EntryMask locked_mask = locked_mask_of(locked_keys);
+    py::array_t<double> value(3), coef_grad({3, NUM_ENTRIES}), thres_grad(3);
+    {
+        py::gil_scoped_release release;
+        _sensitivity_internal(profile, coef, score_thres, locked_mask, &scheduler, bandwidth, stat_data, coef_grad.mutable_data(), thres_grad.mutable_data());
+        Result result = _get_statistics_internal(profile, coef, score_thres, locked_mask, scheduler, stat_data);
+        double* out = value.mutable_data();
+        out[0] = result.prob_above_threshold_with_discard;
+        out[1] = result.expected_wasted_exp;
+        out[2] = result.expected_wasted_tuner;
+    }
+    py::dict output;
+    output["value"] = value;
+    output["coef"] = coef_grad;
+    output["threshold"] = thres_grad;
+    return output;
+}
+
+// Example profiles per stage, keyed by their score rounded to 0.1. Only the coef matters here.
+typedef std::array<std::map<double, EchoProfile>, 5> ExampleTable;
 
-    std::vector<std::string> keys;
-    for (std::unordered_map<std::string, double>::const_iterator it = coef.values.begin(); it != coef.values.end(); ++it) keys.push_back(it->first);
+double example_score_key(const EchoProfile& p, const EntryCoef& coef) {
+    return std::round(get_score(p, coef) * 10) / 10.0;
+}
+
+// Example tables are never modified once cached, so readers need no lock of their own.
+LRUCache<CacheKey, const ExampleTable, CacheKeyHash>& example_cache() {
+    static LRUCache<CacheKey, const ExampleTable, CacheKeyHash> cache(20);
+    return cache;
+}
+
+std::shared_ptr<const ExampleTable> get_example_table(const EntryCoef& coef, const StatDataCpp& stat_data) {
+    CacheKey key{coef, 0.0, DiscardScheduler(), 0};
+    std::shared_ptr<const ExampleTable> cached = example_cache().find(key);
+    if (cached) return cached;
 
     std::function<double(const EchoProfile&)> statistic_significance = [&](const EchoProfile& p) -> double {
         double result = 0.0;
-        for (const auto& kv : p.values) {
-            if (std::abs(kv.second) < 1e-5) continue;
-            auto it_dist = stat_data.find(kv.first);
-            if (it_dist != stat_data.end()) {
-                const auto& dist = it_dist->second;
-                for (const auto& entry : dist) {
-                    double value = entry.first;
-                    double pprob = entry.second;
-                    if (std::abs(value - kv.second) < 1e-5) result += log(pprob);
-                }
+        for (int i = 0; i < NUM_ENTRIES; ++i) {
+            if (!(p.mask & entry_bit(i))) continue;
+            for (const auto& entry : stat_data[i]) {
+                double value = entry.first;
+                double pprob = entry.second;
+                if (std::abs(value - p.values[i]) < 1e-5) result += log(pprob);
             }
         }
         return result;
     };
 
-    CacheKey key{coef, score_thres, DiscardScheduler(), locked_keys};
-
-    if (!last_key || !(*last_key == key)) {
-        last_key = key;
-        for (int i = 0; i < 5; ++i) example_profiles[i].clear();
-        example_profiles[0][0.0] = EchoProfile();
-        for (int i = 0; i < 4; ++i) {
-            for (const auto& kv : example_profiles[i]) {
-                EchoProfile p = kv.second;
-                std::vector<std::string> avail_keys = get_avail_keys(p, coef, true);
-                for (const auto& key_str : avail_keys) {
-                    EchoProfile new_p = p;
-                    new_p.level = (i + 1) * 5;
-                    auto it_dist = stat_data.find(key_str);
-                    if (it_dist != stat_data.end()) {
-                        const auto& dist = it_dist->second;
-                        for (const auto& entry : dist) {
-                            double value = entry.first;
-                            new_p.values[key_str] = value;
-
-                            double stat_sig = statistic_significance(new_p);
-                            double score_rounded = std::round(get_score(new_p, coef) * 10) / 10.0;
-
-                            if (example_profiles[i + 1].count(score_rounded) == 0) {
-                                example_profiles[i + 1][score_rounded] = new_p;
-                            } else if (statistic_significance(example_profiles[i + 1][score_rounded]) < stat_sig) {
-                                example_profiles[i + 1][score_rounded] = new_p;
-                            }
-                        }
+    auto table = std::make_shared<ExampleTable>();
+    ExampleTable& example_profiles = *table;
+    // Significance of every stored profile, so the incumbent is not re-evaluated on each candidate.
+    std::array<std::map<double, double>, 5> significance;
+    example_profiles[0][0.0] = EchoProfile();
+    for (int i = 0; i < 4; ++i) {
+        for (const auto& kv : example_profiles[i]) {
+            const EchoProfile& p = kv.second;
+            std::vector<int> avail_keys = get_avail_keys(p, coef, true);
+            for (int key_idx : avail_keys) {
+                EchoProfile new_p = p;
+                new_p.level = (i + 1) * 5;
+                for (const auto& entry : stat_data[key_idx]) {
+                    double value = entry.first;
+                    new_p.set_value(key_idx, value);
+
+                    double stat_sig = statistic_significance(new_p);
+                    double score_rounded = example_score_key(new_p, coef);
+
+                    auto [it, inserted] = significance[i + 1].emplace(score_rounded, stat_sig);
+                    if (inserted || it->second < stat_sig) {
+                        it->second = stat_sig;
+                        example_profiles[i + 1][score_rounded] = new_p;
                     }
                 }
             }
         }
     }
+    return example_cache().insert(key, table);
+}
 
-    double min_prob = 2.0;
-    EchoProfile best_profile;
-    for (const auto& p : example_profiles[level / 5]) {
-        double prob = _prob_above_score(get_memo_key(p.second, coef), coef, score_thres, locked_keys, stat_data);
-        if (prob >= prob_above_threshold && prob < min_prob) {
-            min_prob = prob;
-            best_profile = p.second;
+// Example profiles of every stage sorted by their probability to reach the threshold, so
+// a lookup is a binary search. Profiles with equal probabilities keep the score order of
+// the example table. `source` is the table the index was built from; loading a new table
+// from the persistent cache makes the index stale.
+struct ExampleIndex {
+    std::shared_ptr<const ExampleTable> source;
+    std::array<std::vector<std::pair<double, EchoProfile>>, 5> stages;
+};
+
+std::shared_ptr<const ExampleIndex> get_example_index(
+    const EntryCoef& coef,
+    double score_thres,
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data
+) {
+    static LRUCache<CacheKey, const ExampleIndex, CacheKeyHash> index_cache(20);
+    std::shared_ptr<const ExampleTable> table = get_example_table(coef, stat_data);
+    CacheKey key{coef, score_thres, DiscardScheduler(), locked_mask};
+    std::shared_ptr<const ExampleIndex> cached = index_cache.find(key);
+    if (cached && cached->source == table) return cached;
+
+    std::shared_ptr<ReachProbTable> reach_prob = get_reach_prob_table(coef, score_thres, locked_mask, stat_data);
+    auto index = std::make_shared<ExampleIndex>();
+    index->source = table;
+    for (int stage = 0; stage < 5; ++stage) {
+        auto& entries = index->stages[stage];
+        entries.reserve((*table)[stage].size());
+        for (const auto& kv : (*table)[stage]) {
+            entries.emplace_back(reach_prob->get(get_memo_key(kv.second, coef)), kv.second);
         }
+        std::stable_sort(entries.begin(), entries.end(), [](const auto& a, const auto& b) { return a.first < b.first; });
     }
-
-    return best_profile;
+    if (cached) {
+        index_cache.replace(key, index);
+        return index;
+    }
+    return index_cache.insert(key, index);
 }
 
-EchoProfile get_example_profile_above_threshold(
+EchoProfile _get_example_profile_above_threshold_internal(
     int level,
     double prob_above_threshold,
     const EntryCoef& coef, 
     double score_thres,
-    const LockedKeys& locked_keys,
-    const py::dict& stat_data_py
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data
 ) {
-    StatDataCpp stat_data = pre_process_stat_data(coef, stat_data_py);
-    return _get_example_profile_above_threshold_internal(level, prob_above_threshold, coef, score_thres, locked_keys, stat_data);
+    if (level < 0 || level / 5 >= 5) return EchoProfile();
+    std::shared_ptr<const ExampleIndex> index = get_example_index(coef, score_thres, locked_mask, stat_data);
+
+    // The profile with the smallest probability that is still at least the requested one.
+    const auto& entries = index->stages[level / 5];
+    auto it = std::lower_bound(entries.begin(), entries.end(), prob_above_threshold,
+        [](const std::pair<double, EchoProfile>& entry, double prob) { return entry.first < prob; });
+    return it == entries.end() ? EchoProfile() : it->second;
 }
 
-DiscardScheduler _get_optimal_scheduler_internal(
-    double num_echo_weight,
-    double exp_weight,
-    double tuner_weight,
-    const EntryCoef& coef,
+EchoProfile get_example_profile_above_threshold(
+    int level,
+    double prob_above_threshold,
+    const EntryCoef& coef, 
     double score_thres,
     const LockedKeys& locked_keys,
-    const StatDataCpp& stat_data,
-    int iterations = 20
+    const StatTable& stat_table
 ) {
-    double sum_weights = num_echo_weight + exp_weight + tuner_weight;
-    num_echo_weight /= sum_weights, exp_weight /= sum_weights, tuner_weight /= sum_weights;
+    const StatDataCpp& stat_data = stat_table.data;
+    py::gil_scoped_release release;
+    return _get_example_profile_above_threshold_internal(level, prob_above_threshold, coef, score_thres, locked_mask_of(locked_keys), stat_data);
+}
 
-    Result default_result = _get_statistics_internal(EchoProfile(), coef, score_thres, locked_keys, DiscardScheduler(), stat_data);
+// Fixed set of worker threads for data-parallel loops. The calling thread takes part in
+// every loop, so a pool of one thread runs everything inline.
+class WorkerPool {
+public:
+    explicit WorkerPool(int num_threads) {
+        if (num_threads <= 0) num_threads = std::max(1u, std::thread::hardware_concurrency());
+        for (int i = 1; i < num_threads; ++i) workers_.emplace_back([this] { worker_loop(); });
+    }
 
-    struct Resource {
-        double num_echo, exp, tuner;
+    ~WorkerPool() {
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            stop_ = true;
+        }
+        start_cv_.notify_all();
+        for (auto& worker : workers_) worker.join();
+    }
 
-        Resource() : num_echo(0.0), exp(0.0), tuner(0.0) {}
-        Resource(double num_echo, double exp, double tuner) : num_echo(num_echo), exp(exp), tuner(tuner) {}
+    int size() const { return (int)workers_.size() + 1; }
 
-        Resource operator+(const Resource& other) const {
-            return Resource(num_echo + other.num_echo, exp + other.exp, tuner + other.tuner);
+    // Calls fn(begin, end) on disjoint chunks of `grain` items covering [0, n) and returns
+    // once all are done. Use a small grain when every item is expensive on its own.
+    void parallel_for(size_t n, const std::function<void(size_t, size_t)>& fn, size_t grain = PARALLEL_GRAIN) {
+        if (workers_.empty() || n < 2 * grain) {
+            if (n > 0) fn(0, n);
+            return;
+        }
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            job_ = &fn;
+            job_size_ = n;
+            job_grain_ = grain;
+            next_ = 0;
+            pending_ = (int)workers_.size();
+            ++generation_;
         }
+        start_cv_.notify_all();
+        run_chunks();
+        std::unique_lock<std::mutex> lock(mutex_);
+        done_cv_.wait(lock, [this] { return pending_ == 0; });
+        job_ = nullptr;
+    }
+
+private:
+    static constexpr size_t PARALLEL_GRAIN = 64;
 
-        Resource operator-(const Resource& other) const {
-            return Resource(num_echo - other.num_echo, exp - other.exp, tuner - other.tuner);
+    void run_chunks() {
+        for (;;) {
+            size_t begin = next_.fetch_add(job_grain_);
+            if (begin >= job_size_) return;
+            (*job_)(begin, std::min(job_size_, begin + job_grain_));
         }
-        
-        Resource operator*(double factor) const {
-            return Resource(num_echo * factor, exp * factor, tuner * factor);
+    }
+
+    void worker_loop() {
+        size_t seen_generation = 0;
+        for (;;) {
+            {
+                std::unique_lock<std::mutex> lock(mutex_);
+                start_cv_.wait(lock, [&] { return stop_ || generation_ != seen_generation; });
+                if (stop_) return;
+                seen_generation = generation_;
+            }
+            run_chunks();
+            {
+                std::lock_guard<std::mutex> lock(mutex_);
+                --pending_;
+            }
+            done_cv_.notify_one();
         }
-    };
+    }
 
-    Resource current_resource = Resource(
-        (1.0 / default_result.prob_above_threshold_with_discard) - 1,
-        default_result.expected_wasted_exp / default_result.prob_above_threshold_with_discard,
-        default_result.expected_wasted_tuner / default_result.prob_above_threshold_with_discard
-    );
+    std::vector<std::thread> workers_;
+    std::mutex mutex_;
+    std::condition_variable start_cv_, done_cv_;
+    const std::function<void(size_t, size_t)>* job_ = nullptr;
+    size_t job_size_ = 0;
+    size_t job_grain_ = PARALLEL_GRAIN;
+    std::atomic<size_t> next_{0};
+    size_t generation_ = 0;
+    int pending_ = 0;
+    bool stop_ = false;
+};
+
+// Score, expected score and probability to reach the threshold of every profile under
+// every coef. Each row of `profiles` holds the level followed by the entry values, each row
+// of `coefs` the coef values, both in ENTRY_KEYS order, and `score_thres` has one threshold
+// per coef. Coefs are evaluated in parallel; the outputs are (profiles, coefs) matrices.
+py::dict evaluate_coefs(
+    py::array_t<double, py::array::c_style | py::array::forcecast> profiles,
+    py::array_t<double, py::array::c_style | py::array::forcecast> coefs,
+    py::array_t<double, py::array::c_style | py::array::forcecast> score_thres,
+    const LockedKeys& locked_keys,
+    const StatTable& stat_table,
+    int num_threads = 0
+) {
+    if (profiles.ndim() != 2 || profiles.shape(1) != NUM_ENTRIES + 1) {
+        throw std::runtime_error("profiles must be an (N, " + std::to_string(NUM_ENTRIES + 1) + ") array");
+    }
+    if (coefs.ndim() != 2 || coefs.shape(1) != NUM_ENTRIES) {
+        throw std::runtime_error("coefs must be a (C, " + std::to_string(NUM_ENTRIES) + ") array");
+    }
+    if (score_thres.ndim() != 1 || score_thres.shape(0) != coefs.shape(0)) {
+        throw std::runtime_error("score_thres must have one threshold per coef");
+    }
+    const StatDataCpp& stat_data = stat_table.data;
+    EntryMask locked_mask = locked_mask_of(locked_keys);
+
+    py::ssize_t n = profiles.shape(0), c = coefs.shape(0);
+    py::array_t<double> score({n, c}), expected_score({n, c}), prob_above_threshold({n, c});
+    auto profile_rows = profiles.unchecked<2>();
+    auto coef_rows = coefs.unchecked<2>();
+    auto thresholds = score_thres.unchecked<1>();
+    auto score_out = score.mutable_unchecked<2>();
+    auto expected_out = expected_score.mutable_unchecked<2>();
+    auto prob_out = prob_above_threshold.mutable_unchecked<2>();
+
+    py::gil_scoped_release release;
+    std::vector<EchoProfile> parsed(n);
+    for (py::ssize_t r = 0; r < n; ++r) {
+        parsed[r].level = (int)profile_rows(r, 0);
+        for (int i = 0; i < NUM_ENTRIES; ++i) parsed[r].set_value(i, profile_rows(r, i + 1));
+    }
 
-    std::cout << "current_resource: " << current_resource.num_echo << ", " << current_resource.exp << ", " << current_resource.tuner << std::endl;
+    WorkerPool pool(num_threads);
+    pool.parallel_for((size_t)c, [&](size_t begin, size_t end) {
+        for (size_t j = begin; j < end; ++j) {
+            EntryCoef coef;
+            for (int i = 0; i < NUM_ENTRIES; ++i) coef.values[i] = coef_rows(j, i);
+            for (py::ssize_t r = 0; r < n; ++r) {
+                const EchoProfile& profile = parsed[r];
+                score_out(r, j) = get_score(profile, coef);
+                expected_out(r, j) = _get_expected_score(profile, coef, stat_data);
+                prob_out(r, j) = _prob_above_score(get_memo_key(profile, coef), coef, thresholds(j), locked_mask, stat_data);
+            }
+        }
+    }, 1);
+    py::gil_scoped_acquire acquire;
+
+    py::dict output;
+    output["score"] = score;
+    output["expected_score"] = expected_score;
+    output["prob_above_threshold"] = prob_above_threshold;
+    return output;
+}
 
-    std::function<double(const Resource&)> get_resource_score = [&](const Resource& resource) -> double {
-        return num_echo_weight * 10 * resource.num_echo 
-            + exp_weight / 1200 * resource.exp 
-            + tuner_weight * resource.tuner;
-    };
+struct Resource {
+    double num_echo, exp, tuner;
+
+    Resource() : num_echo(0.0), exp(0.0), tuner(0.0) {}
+    Resource(double num_echo, double exp, double tuner) : num_echo(num_echo), exp(exp), tuner(tuner) {}
 
-    std::unordered_map<MemoKey, bool> strategies;
+    Resource operator+(const Resource& other) const {
+        return Resource(num_echo + other.num_echo, exp + other.exp, tuner + other.tuner);
+    }
 
+    Resource operator-(const Resource& other) const {
+        return Resource(num_echo - other.num_echo, exp - other.exp, tuner - other.tuner);
+    }
+    
+    Resource operator*(double factor) const {
+        return Resource(num_echo * factor, exp * factor, tuner * factor);
+    }
+};
+
+// Outcome of an optimal-scheduler search and how the solver got there.
+struct SchedulerSolution {
+    DiscardScheduler scheduler;
+    std::string method;
+    int iterations = 0;
+    double residual = 0.0;
+    double wall_time = 0.0;
+    // Expected resources spent per successful echo under the returned strategy.
+    Resource expected_resource;
+};
+
+// Finds the discard strategy minimizing the weighted resources spent per echo that
+// reaches the threshold. Every pass walks the UpgradeGraph backwards: `restart` is the
+// price of starting over with a new echo, and each state keeps whichever of upgrading
+// or discarding is cheaper.
+class SchedulerSolver {
+public:
+    SchedulerSolver(
+        double num_echo_weight,
+        double exp_weight,
+        double tuner_weight,
+        const EntryCoef& coef,
+        double score_thres,
+        EntryMask locked_mask,
+        const StatDataCpp& stat_data,
+        int num_threads
+    ) : coef_(coef), score_thres_(score_thres), locked_mask_(locked_mask), stat_data_(stat_data),
+        graph_(get_upgrade_graph(coef, stat_data)), pool_(num_threads) {
+        set_weights(num_echo_weight, exp_weight, tuner_weight);
+        int thres_bin = threshold_score_bin(score_thres);
+        for (int stage = 0; stage < 6; ++stage) {
+            const auto& states = graph_->stages[stage];
+            resources_[stage].resize(states.size());
+            probs_[stage].resize(states.size());
+            discards_[stage].assign(states.size(), 0);
+            finished_[stage].resize(states.size());
+            for (size_t j = 0; j < states.size(); ++j) finished_[stage][j] = is_finished(states[j].key, thres_bin, locked_mask);
+        }
+    }
+
+    // Only the weights change between the solves of a sweep; the graph, the finished states
+    // and the discards of the previous solve are kept.
+    void set_weights(double num_echo_weight, double exp_weight, double tuner_weight) {
+        double sum_weights = num_echo_weight + exp_weight + tuner_weight;
+        num_echo_weight_ = num_echo_weight / sum_weights;
+        exp_weight_ = exp_weight / sum_weights;
+        tuner_weight_ = tuner_weight / sum_weights;
+    }
+
+    double score(const Resource& resource) const {
+        return num_echo_weight_ * 10 * resource.num_echo 
+            + exp_weight_ / 1200 * resource.exp 
+            + tuner_weight_ * resource.tuner;
+    }
+
+    // Bisection on the restart cost, followed by an extrapolated fixed-point refinement.
     // This iterative algorithm is inspired by Shallea's post https://bbs.nga.cn/read.php?tid=44508135
-    const double stop_thres = 1e-4;
-    Resource lower_bound = Resource(0.0, 0.0, 0.0), upper_bound = current_resource;
-    for (int i = 0; ; ++i) {
-        if (i < iterations) current_resource = (lower_bound + upper_bound) * 0.5;
-        std::unordered_map<MemoKey, Resource> resource_cache;
-        std::function<Resource(const EchoProfile&)> solve = [&](const EchoProfile& profile) -> Resource {
-            double score = get_score(profile, coef);
-            if (score >= score_thres && satisfies_locked_keys(profile, locked_keys)) return Resource(0.0, 0.0, 0.0);
-            if (profile.level == 25) return current_resource + Resource(1.0, echo_exp[25], 50);
-
-            MemoKey key = get_memo_key(profile, coef);
-            auto it = resource_cache.find(key);
-            if (it != resource_cache.end()) return it->second;
-
-            std::vector<std::string> avail_keys = get_avail_keys(profile, coef, false);
-            int m = (int)coef.values.size() - (profile.level / 5);
-            int next_level = ((profile.level / 5) + 1) * 5;
-
-            Resource result(0.0, 0.0, 0.0);
-            for (size_t i = 0; i < avail_keys.size(); ++i) {
-                const std::string& key_str = avail_keys[i];
-                EchoProfile new_p = profile;
-                new_p.level = next_level;
-                auto it_dist = stat_data.find(key_str);
-                if (it_dist != stat_data.end()) {
-                    const auto& dist = it_dist->second;
-                    for (const auto& entry : dist) {
-                        double value = entry.first;
-                        double pprob = entry.second;
-                        new_p.values[key_str] = value;
-                        result = result + solve(new_p) * (pprob / m);
-                    }
-                }
-            }
+    SchedulerSolution solve_bisection(int iterations) {
+        SchedulerSolution solution;
+        solution.method = "bisection";
+        Result default_result = _get_statistics_internal(EchoProfile(), coef_, score_thres_, locked_mask_, DiscardScheduler(), stat_data_);
+        if (default_result.prob_above_threshold_with_discard <= 0.0) return solution;
+
+        Resource current_resource = Resource(
+            (1.0 / default_result.prob_above_threshold_with_discard) - 1,
+            default_result.expected_wasted_exp / default_result.prob_above_threshold_with_discard,
+            default_result.expected_wasted_tuner / default_result.prob_above_threshold_with_discard
+        );
 
-            int useless_keys = m - (int)avail_keys.size();
-            EchoProfile new_p = profile;
-            new_p.level = next_level;
-            result = result + solve(new_p) * ((double)useless_keys / m);
-            Resource resource_if_discard = Resource(1.0, echo_exp[profile.level], profile.level / 5 * 10) + current_resource;
+        const double stop_thres = 1e-4;
+        Resource lower_bound = Resource(0.0, 0.0, 0.0), upper_bound = current_resource;
+        for (int i = 0; i < iterations + MAX_REFINEMENT_PASSES; ++i) {
+            if (i < iterations) current_resource = (lower_bound + upper_bound) * 0.5;
+
+            Resource resource_after_iterate = improve(current_resource);
+            double score_after_iterate = score(resource_after_iterate);
+            double score_current = score(current_resource);
+            solution.iterations = i + 1;
+            solution.residual = std::abs(score_after_iterate - score_current);
+            if (score_after_iterate >= score_current) {
+                lower_bound = current_resource;
+            } else {
+                upper_bound = current_resource;
+            }
+            if (i >= iterations) {
+                if (solution.residual < stop_thres) break;
+                current_resource = current_resource + (resource_after_iterate - current_resource) * 7;
+            }
+        }
 
-            bool discard = get_resource_score(result) > get_resource_score(resource_if_discard);
-            strategies[key] = discard;
-            resource_cache[key] = discard ? resource_if_discard : result;
-            return resource_cache[key];
-        };
+        solution.scheduler = extract_scheduler();
+        solution.expected_resource = current_resource;
+        return solution;
+    }
 
-        Resource resource_after_iterate = solve(EchoProfile());
-        double score_after_iterate = get_resource_score(resource_after_iterate);
-        double score_current = get_resource_score(current_resource);
-        std::cout << "score_after_iterate: " << score_after_iterate << ", score_current: " << score_current << std::endl;
-        if (score_after_iterate >= score_current) {
-            lower_bound = current_resource;
+    // Dinkelbach iteration on the cost-per-success ratio: evaluate the current strategy
+    // exactly, then improve it against its own ratio. The ratio decreases strictly until
+    // the strategy is optimal, which takes a handful of passes in practice. A sweep over
+    // weights passes the resources of the previous solution as `initial_ratio`: it is
+    // usually close to optimal for the new weights, and since any starting ratio converges
+    // to the same fixed point, this skips the evaluation of the never-discard strategy.
+    SchedulerSolution solve_dinkelbach(int max_iterations, const Resource* initial_ratio = nullptr) {
+        SchedulerSolution solution;
+        solution.method = "dinkelbach";
+        Resource ratio;
+        if (initial_ratio) {
+            ratio = *initial_ratio;
         } else {
-            upper_bound = current_resource;
+            auto [cost, restart_prob] = evaluate(true);
+            if (restart_prob >= 1.0) return solution;
+            // The restart cost is the fixed point of cost + restart_prob * ratio.
+            ratio = cost * (1.0 / (1.0 - restart_prob));
         }
-        if (i >= iterations) {
-            std::cout << "current_resource: " << current_resource.num_echo << ", " << current_resource.exp << ", " << current_resource.tuner << std::endl;
-            if (std::abs(score_after_iterate - score_current) < stop_thres) break;
-            current_resource = current_resource + (resource_after_iterate - current_resource) * 7;
+        for (int i = 0; i < max_iterations; ++i) {
+            Resource value = improve(ratio);
+            solution.iterations = i + 1;
+            solution.residual = std::abs(score(ratio) - score(value));
+            if (solution.residual <= 1e-12 * std::max(1.0, score(ratio))) break;
+
+            auto [cost, restart_prob] = evaluate(false);
+            if (restart_prob >= 1.0) break;
+            ratio = cost * (1.0 / (1.0 - restart_prob));
         }
+
+        solution.scheduler = extract_scheduler();
+        solution.expected_resource = ratio;
+        return solution;
     }
 
-    DiscardScheduler scheduler(std::vector<double>(4, 1.0));
-    for (auto& [key, discard] : strategies) if (!discard) {
-        if (5 <= key.level && key.level <= 20) {
-            double prob = _prob_above_score(key, coef, score_thres, locked_keys, stat_data);
-            scheduler.thresholds[key.level / 5 - 1] = std::min(scheduler.thresholds[key.level / 5 - 1], prob);
+private:
+    static constexpr int MAX_REFINEMENT_PASSES = 1000;
+
+    // One backward pass with the given restart cost. Records the cheaper action of every
+    // state and returns the expected resources from an empty echo.
+    Resource improve(const Resource& restart) {
+        const auto& last_stage = graph_->stages[5];
+        for (size_t j = 0; j < last_stage.size(); ++j) {
+            resources_[5][j] = finished_[5][j] ? Resource(0.0, 0.0, 0.0) : restart + Resource(1.0, echo_exp[25], 50);
         }
+        for (int stage = 4; stage >= 0; --stage) {
+            const auto& states = graph_->stages[stage];
+            const auto& next_resources = resources_[stage + 1];
+            int level = stage * 5;
+            Resource resource_if_discard = Resource(1.0, echo_exp[level], level / 5 * 10) + restart;
+            pool_.parallel_for(states.size(), [&](size_t begin, size_t end) {
+                for (size_t j = begin; j < end; ++j) {
+                    const auto& state = states[j];
+                    if (finished_[stage][j]) {
+                        resources_[stage][j] = Resource(0.0, 0.0, 0.0);
+                        continue;
+                    }
+                    Resource result(0.0, 0.0, 0.0);
+                    for (uint32_t e = state.edge_begin; e < state.edge_end; ++e) {
+                        result = result + next_resources[graph_->edges[e].child] * graph_->edges[e].prob;
+                    }
+                    bool discard = score(result) > score(resource_if_discard);
+                    discards_[stage][j] = discard;
+                    resources_[stage][j] = discard ? resource_if_discard : result;
+                }
+            });
+        }
+        return resources_[0][0];
     }
 
-    std::cout << "resource_after_iterate: " << current_resource.num_echo << ", " << current_resource.exp << ", " << current_resource.tuner << std::endl;
+    // Expected resources of a single echo and the probability of having to start over with
+    // a new one, under the recorded discards or without discarding anything. The restart
+    // probability is tracked directly rather than as 1 - P(success), since the entry
+    // distributions in entry_stats.yml do not sum to exactly one.
+    std::pair<Resource, double> evaluate(bool never_discard) {
+        const auto& last_stage = graph_->stages[5];
+        for (size_t j = 0; j < last_stage.size(); ++j) {
+            bool finished = finished_[5][j];
+            resources_[5][j] = finished ? Resource(0.0, 0.0, 0.0) : Resource(1.0, echo_exp[25], 50);
+            probs_[5][j] = finished ? 0.0 : 1.0;
+        }
+        for (int stage = 4; stage >= 0; --stage) {
+            const auto& states = graph_->stages[stage];
+            int level = stage * 5;
+            Resource resource_if_discard = Resource(1.0, echo_exp[level], level / 5 * 10);
+            pool_.parallel_for(states.size(), [&](size_t begin, size_t end) {
+                for (size_t j = begin; j < end; ++j) {
+                    const auto& state = states[j];
+                    if (finished_[stage][j]) {
+                        resources_[stage][j] = Resource(0.0, 0.0, 0.0);
+                        probs_[stage][j] = 0.0;
+                    } else if (!never_discard && discards_[stage][j]) {
+                        resources_[stage][j] = resource_if_discard;
+                        probs_[stage][j] = 1.0;
+                    } else {
+                        Resource result(0.0, 0.0, 0.0);
+                        double prob = 0.0;
+                        for (uint32_t e = state.edge_begin; e < state.edge_end; ++e) {
+                            const auto& edge = graph_->edges[e];
+                            result = result + resources_[stage + 1][edge.child] * edge.prob;
+                            prob += probs_[stage + 1][edge.child] * edge.prob;
+                        }
+                        resources_[stage][j] = result;
+                        probs_[stage][j] = prob;
+                    }
+                }
+            });
+        }
+        return {resources_[0][0], probs_[0][0]};
+    }
 
-    return scheduler;
+    // The threshold of each level range is the lowest reach probability still upgraded.
+    DiscardScheduler extract_scheduler() {
+        if (reach_probs_[1].empty()) {
+            // Fetched once per solver, so a sweep over many weights looks them up only once.
+            std::shared_ptr<ReachProbTable> reach_prob = get_reach_prob_table(coef_, score_thres_, locked_mask_, stat_data_);
+            for (int stage = 1; stage <= 4; ++stage) reach_probs_[stage] = reach_prob->get_stage(graph_->stages[stage]);
+        }
+        DiscardScheduler scheduler(std::vector<double>(4, 1.0));
+        for (int stage = 1; stage <= 4; ++stage) {
+            const auto& states = graph_->stages[stage];
+            for (size_t j = 0; j < states.size(); ++j) {
+                if (finished_[stage][j] || discards_[stage][j]) continue;
+                scheduler.thresholds[stage - 1] = std::min(scheduler.thresholds[stage - 1], reach_probs_[stage][j]);
+            }
+        }
+        return scheduler;
+    }
+
+    double num_echo_weight_, exp_weight_, tuner_weight_;
+    const EntryCoef& coef_;
+    double score_thres_;
+    EntryMask locked_mask_;
+    const StatDataCpp& stat_data_;
+    std::shared_ptr<const UpgradeGraph> graph_;
+    WorkerPool pool_;
+    std::array<std::vector<Resource>, 6> resources_;
+    std::array<std::vector<double>, 6> probs_;
+    std::array<std::vector<char>, 6> discards_;
+    std::array<std::vector<char>, 6> finished_;
+    std::array<std::vector<double>, 6> reach_probs_;
+};
+
+SchedulerSolution _solve_optimal_scheduler_internal(
+    double num_echo_weight,
+    double exp_weight,
+    double tuner_weight,
+    const EntryCoef& coef,
+    double score_thres,
+    EntryMask locked_mask,
+    const StatDataCpp& stat_data,
+    const std::string& method,
+    int iterations,
+    int num_threads
+) {
+    auto start = std::chrono::steady_clock::now();
+    SchedulerSolver solver(num_echo_weight, exp_weight, tuner_weight, coef, score_thres, locked_mask, stat_data, num_threads);
+    SchedulerSolution solution;
+    if (method == "dinkelbach") {
+        solution = solver.solve_dinkelbach(std::max(iterations, 1));
+    } else if (method == "bisection") {
+        solution = solver.solve_bisection(iterations);
+    } else {
+        throw std::invalid_argument("Unknown scheduler method: " + method);
+    }
+    solution.wall_time = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    return solution;
+}
+
+SchedulerSolution solve_optimal_scheduler(
+    double num_echo_weight,
+    double exp_weight,
+    double tuner_weight,
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    const StatTable& stat_table,
+    const std::string& method = "dinkelbach",
+    int iterations = 20,
+    int num_threads = 0
+) {
+    const StatDataCpp& stat_data = stat_table.data;
+    py::gil_scoped_release release;
+    return _solve_optimal_scheduler_internal(num_echo_weight, exp_weight, tuner_weight, coef, score_thres, locked_mask_of(locked_keys), stat_data, method, iterations, num_threads);
+}
+
+// Optimal schedulers for many weight vectors, one (num_echo, exp, tuner) row each. All
+// solves share one solver, so the upgrade graph, its buffers and the reach probabilities
+// are set up once, and each solve starts from the solution of the previous row; rows with
+// similar weights should be adjacent.
+std::vector<SchedulerSolution> solve_scheduler_sweep(
+    py::array_t<double, py::array::c_style | py::array::forcecast> weights,
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    const StatTable& stat_table,
+    int iterations = 20,
+    int num_threads = 0
+) {
+    if (weights.ndim() != 2 || weights.shape(1) != 3) throw std::runtime_error("weights must have shape (N, 3)");
+    const StatDataCpp& stat_data = stat_table.data;
+    EntryMask locked_mask = locked_mask_of(locked_keys);
+    auto rows = weights.unchecked<2>();
+    py::gil_scoped_release release;
+
+    std::vector<SchedulerSolution> solutions;
+    solutions.reserve(rows.shape(0));
+    std::unique_ptr<SchedulerSolver> solver;
+    for (py::ssize_t r = 0; r < rows.shape(0); ++r) {
+        auto start = std::chrono::steady_clock::now();
+        if (!solver) {
+            solver = std::make_unique<SchedulerSolver>(rows(r, 0), rows(r, 1), rows(r, 2), coef, score_thres, locked_mask, stat_data, num_threads);
+        } else {
+            solver->set_weights(rows(r, 0), rows(r, 1), rows(r, 2));
+        }
+        const SchedulerSolution* previous = solutions.empty() || solutions.back().iterations == 0 ? nullptr : &solutions.back();
+        SchedulerSolution solution = solver->solve_dinkelbach(std::max(iterations, 1), previous ? &previous->expected_resource : nullptr);
+        solution.wall_time = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+        solutions.push_back(solution);
+    }
+    return solutions;
 }
 
 DiscardScheduler get_optimal_scheduler(
@@ -653,24 +1870,189 @@ DiscardScheduler get_optimal_scheduler(
     const EntryCoef& coef,
     double score_thres,
     const LockedKeys& locked_keys,
-    const py::dict& stat_data_py,
-    int iterations = 20
+    const StatTable& stat_table,
+    int iterations = 20,
+    int num_threads = 0
+) {
+    const StatDataCpp& stat_data = stat_table.data;
+    py::gil_scoped_release release;
+    return _solve_optimal_scheduler_internal(num_echo_weight, exp_weight, tuner_weight, coef, score_thres, locked_mask_of(locked_keys), stat_data, "bisection", iterations, num_threads).scheduler;
+}
+
+// Hooks for the persistent solver cache. Each table is exported as flat arrays after being
+// filled from an empty profile, and seeded back into the in-memory caches on load.
+typedef py::array_t<uint64_t, py::array::c_style | py::array::forcecast> KeyArray;
+typedef py::array_t<double, py::array::c_style | py::array::forcecast> ValueArray;
+
+py::tuple export_statistics_table(
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    const DiscardScheduler& scheduler,
+    const StatTable& stat_table
+) {
+    const StatDataCpp& stat_data = stat_table.data;
+    EntryMask locked_mask = locked_mask_of(locked_keys);
+    std::vector<uint64_t> keys;
+    std::vector<double> values;
+    {
+        py::gil_scoped_release release;
+        std::shared_ptr<const UpgradeGraph> graph = get_upgrade_graph(coef, stat_data);
+        std::shared_ptr<const StatisticsTable> table = get_statistics_table(coef, score_thres, scheduler, locked_mask, stat_data);
+        for (int stage = 0; stage < 6; ++stage) {
+            for (size_t j = 0; j < graph->stages[stage].size(); ++j) {
+                const Result& result = (*table)[stage][j];
+                keys.push_back(graph->stages[stage][j].key.packed);
+                values.push_back(result.prob_above_threshold_with_discard);
+                values.push_back(result.expected_wasted_exp);
+                values.push_back(result.expected_wasted_tuner);
+            }
+        }
+    }
+    py::ssize_t n = (py::ssize_t)keys.size();
+    return py::make_tuple(
+        py::array_t<uint64_t>(n, keys.data()),
+        py::array_t<double>({n, (py::ssize_t)3}, values.data())
+    );
+}
+
+void load_statistics_table(
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    const DiscardScheduler& scheduler,
+    KeyArray keys,
+    ValueArray values,
+    const StatTable& stat_table
+) {
+    if (values.ndim() != 2 || values.shape(1) != 3 || values.shape(0) != keys.size()) {
+        throw std::runtime_error("statistics table must be keys (N,) and values (N, 3)");
+    }
+    const StatDataCpp& stat_data = stat_table.data;
+    EntryMask locked_mask = locked_mask_of(locked_keys);
+    auto keys_in = keys.unchecked<1>();
+    auto values_in = values.unchecked<2>();
+
+    py::gil_scoped_release release;
+    std::shared_ptr<const UpgradeGraph> graph = get_upgrade_graph(coef, stat_data);
+    auto table = std::make_shared<StatisticsTable>();
+    size_t num_states = 0;
+    for (int stage = 0; stage < 6; ++stage) {
+        (*table)[stage].resize(graph->stages[stage].size());
+        num_states += graph->stages[stage].size();
+    }
+    if ((size_t)keys.size() != num_states) throw std::runtime_error("statistics table does not match the upgrade graph");
+    for (py::ssize_t r = 0; r < keys.size(); ++r) {
+        MemoKey key{keys_in(r)};
+        int64_t idx = graph->find(key);
+        if (idx < 0) throw std::runtime_error("statistics table does not match the upgrade graph");
+        (*table)[key.level() / 5][idx] = Result(values_in(r, 0), values_in(r, 1), values_in(r, 2));
+    }
+    statistics_cache().replace(CacheKey{coef, score_thres, scheduler, locked_mask}, table);
+}
+
+py::tuple export_reach_prob_table(
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    const StatTable& stat_table
+) {
+    const StatDataCpp& stat_data = stat_table.data;
+    std::pair<std::vector<uint64_t>, std::vector<double>> states;
+    {
+        py::gil_scoped_release release;
+        states = get_reach_prob_table(coef, score_thres, locked_mask_of(locked_keys), stat_data)->export_states();
+    }
+    return py::make_tuple(
+        py::array_t<uint64_t>(states.first.size(), states.first.data()),
+        py::array_t<double>(states.second.size(), states.second.data())
+    );
+}
+
+void load_reach_prob_table(
+    const EntryCoef& coef,
+    double score_thres,
+    const LockedKeys& locked_keys,
+    KeyArray states,
+    ValueArray probs,
+    const StatTable& stat_table
 ) {
-    StatDataCpp stat_data = pre_process_stat_data(coef, stat_data_py);
-    return _get_optimal_scheduler_internal(num_echo_weight, exp_weight, tuner_weight, coef, score_thres, locked_keys, stat_data, iterations);
+    if (probs.ndim() != 1 || probs.size() != states.size()) {
+        throw std::runtime_error("reach probability table must be states (N,) and probs (N,)");
+    }
+    const StatDataCpp& stat_data = stat_table.data;
+    const uint64_t* states_in = states.data();
+    const double* probs_in = probs.data();
+    size_t n = (size_t)states.size();
+
+    py::gil_scoped_release release;
+    get_reach_prob_table(coef, score_thres, locked_mask_of(locked_keys), stat_data)->load_states(states_in, probs_in, n);
+}
+
+py::array_t<double> export_example_table(const EntryCoef& coef, const StatTable& stat_table) {
+    const StatDataCpp& stat_data = stat_table.data;
+    std::shared_ptr<const ExampleTable> table;
+    {
+        py::gil_scoped_release release;
+        table = get_example_table(coef, stat_data);
+    }
+
+    py::ssize_t n = 0;
+    for (const auto& stage : *table) n += (py::ssize_t)stage.size();
+    py::array_t<double> rows({n, (py::ssize_t)NUM_ENTRIES + 1});
+    auto rows_out = rows.mutable_unchecked<2>();
+    py::ssize_t r = 0;
+    for (const auto& stage : *table) {
+        for (const auto& kv : stage) {
+            rows_out(r, 0) = kv.second.level;
+            for (int i = 0; i < NUM_ENTRIES; ++i) rows_out(r, i + 1) = kv.second.values[i];
+            ++r;
+        }
+    }
+    return rows;
+}
+
+void load_example_table(const EntryCoef& coef, ValueArray profiles) {
+    if (profiles.ndim() != 2 || profiles.shape(1) != NUM_ENTRIES + 1) {
+        throw std::runtime_error("profiles must be an (N, " + std::to_string(NUM_ENTRIES + 1) + ") array");
+    }
+    auto rows = profiles.unchecked<2>();
+
+    py::gil_scoped_release release;
+    auto table = std::make_shared<ExampleTable>();
+    for (py::ssize_t r = 0; r < rows.shape(0); ++r) {
+        EchoProfile profile;
+        profile.level = (int)rows(r, 0);
+        if (profile.level < 0 || profile.level > 20) throw std::runtime_error("example profile level out of range");
+        for (int i = 0; i < NUM_ENTRIES; ++i) profile.set_value(i, rows(r, i + 1));
+        (*table)[profile.level / 5][example_score_key(profile, coef)] = profile;
+    }
+    example_cache().replace(CacheKey{coef, 0.0, DiscardScheduler(), 0}, table);
 }
 
 PYBIND11_MODULE(profile_cpp, m) {
+    m.attr("ENTRY_KEYS") = std::vector<std::string>(ENTRY_KEYS.begin(), ENTRY_KEYS.end());
+
+    py::class_<StatTable>(m, "StatTable")
+        .def(py::init<const py::dict&>());
+    // Keep accepting the raw yaml dict; it is converted on every call in that case.
+    py::implicitly_convertible<py::dict, StatTable>();
+
+    // Coefficients and profiles can also be built from ENTRY_KEYS-ordered values,
+    // which skips the string lookups of the dict constructors.
     py::class_<EntryCoef>(m, "EntryCoef")
         .def(py::init<>())
         .def(py::init<const std::unordered_map<std::string, double>&>())
-        .def_readwrite("values", &EntryCoef::values);
+        .def(py::init<const EntryValues&>())
+        .def_property("values", &EntryCoef::to_dict,
+            [](EntryCoef& c, const std::unordered_map<std::string, double>& v) { c.values = values_from_dict(v); });
 
     py::class_<EchoProfile>(m, "EchoProfile")
         .def(py::init<>())
         .def(py::init<int, const std::unordered_map<std::string, double>&>())
+        .def(py::init<int, const EntryValues&>())
         .def_readwrite("level", &EchoProfile::level)
-        .def_readwrite("values", &EchoProfile::values);
+        .def_property("values", &EchoProfile::to_dict, &EchoProfile::from_dict);
 
     py::class_<DiscardScheduler>(m, "DiscardScheduler")
         .def(py::init<>())
@@ -684,12 +2066,50 @@ PYBIND11_MODULE(profile_cpp, m) {
         .def_readwrite("expected_wasted_exp", &Result::expected_wasted_exp)
         .def_readwrite("expected_wasted_tuner", &Result::expected_wasted_tuner);
 
+    py::class_<SchedulerSolution>(m, "SchedulerSolution")
+        .def_readonly("scheduler", &SchedulerSolution::scheduler)
+        .def_readonly("method", &SchedulerSolution::method)
+        .def_readonly("iterations", &SchedulerSolution::iterations)
+        .def_readonly("residual", &SchedulerSolution::residual)
+        .def_readonly("wall_time", &SchedulerSolution::wall_time)
+        .def_property_readonly("expected_resource", [](const SchedulerSolution& s) {
+            return py::make_tuple(s.expected_resource.num_echo, s.expected_resource.exp, s.expected_resource.tuner);
+        });
+
     m.def("prob_above_score", &prob_above_score, "C++ version of prob_above_score",
         py::arg("profile"), py::arg("coef"), py::arg("threshold"), py::arg("locked_keys"), py::arg("stat_data"));
+    m.def("score_distribution", &score_distribution, "Final score distribution of a profile as (scores, probabilities)",
+        py::arg("profile"), py::arg("coef"), py::arg("locked_keys"), py::arg("stat_data"));
     m.def("get_statistics", &get_statistics, "C++ version of get_statistics",
         py::arg("profile"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("scheduler"), py::arg("stat_data"));
+    m.def("prob_above_score_gradient", &prob_above_score_gradient, "prob_above_score with its derivatives with respect to the coef weights and the threshold",
+        py::arg("profile"), py::arg("coef"), py::arg("threshold"), py::arg("locked_keys"), py::arg("stat_data"), py::arg("bandwidth")=0.5);
+    m.def("get_statistics_gradient", &get_statistics_gradient, "get_statistics with its derivatives with respect to the coef weights and the threshold",
+        py::arg("profile"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("scheduler"), py::arg("stat_data"), py::arg("bandwidth")=0.5);
+    m.def("analyze_profiles", &analyze_profiles, "Batched score, probability and statistics for an (N, 14) profile array",
+        py::arg("profiles"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("scheduler"), py::arg("stat_data"));
+    m.def("evaluate_coefs", &evaluate_coefs, "Score, expected score and probability of an (N, 14) profile array under a (C, 13) coef array",
+        py::arg("profiles"), py::arg("coefs"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("stat_data"), py::arg("num_threads")=0);
     m.def("get_example_profile_above_threshold", &get_example_profile_above_threshold, "Get an example profile with a similar probability to reach the threshold",
         py::arg("level"), py::arg("prob_above_threshold"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("stat_data"));
+    m.def("solve_optimal_scheduler", &solve_optimal_scheduler, "Optimal discard scheduler with solver diagnostics",
+        py::arg("num_echo_weight"), py::arg("exp_weight"), py::arg("tuner_weight"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("stat_data"),
+        py::arg("method")="dinkelbach", py::arg("iterations")=20, py::arg("num_threads")=0);
     m.def("get_optimal_scheduler", &get_optimal_scheduler, "C++ version of get_optimal_scheduler",
-        py::arg("num_echo_weight"), py::arg("exp_weight"), py::arg("tuner_weight"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("stat_data"), py::arg("iterations")=20);
-}
\ No newline at end of file
+        py::arg("num_echo_weight"), py::arg("exp_weight"), py::arg("tuner_weight"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("stat_data"), py::arg("iterations")=20, py::arg("num_threads")=0);
+    m.def("solve_scheduler_sweep", &solve_scheduler_sweep, "Optimal schedulers for an (N, 3) array of (num_echo, exp, tuner) weights",
+        py::arg("weights"), py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("stat_data"), py::arg("iterations")=20, py::arg("num_threads")=0);
+
+    m.def("export_statistics_table", &export_statistics_table, "Export the statistics memo table as (keys, values)",
+        py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("scheduler"), py::arg("stat_data"));
+    m.def("load_statistics_table", &load_statistics_table, "Seed the statistics memo table from (keys, values)",
+        py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("scheduler"), py::arg("keys"), py::arg("values"), py::arg("stat_data"));
+    m.def("export_reach_prob_table", &export_reach_prob_table, "Export the reach probability table as (states, probs)",
+        py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("stat_data"));
+    m.def("load_reach_prob_table", &load_reach_prob_table, "Seed the reach probability table from (states, probs)",
+        py::arg("coef"), py::arg("score_thres"), py::arg("locked_keys"), py::arg("states"), py::arg("probs"), py::arg("stat_data"));
+    m.def("export_example_table", &export_example_table, "Export the example profile table as an (N, 14) array",
+        py::arg("coef"), py::arg("stat_data"));
+    m.def("load_example_table", &load_example_table, "Replace the example profile table with an (N, 14) array",
+        py::arg("coef"), py::arg("profiles"));
+}
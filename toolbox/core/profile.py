@@ -1,15 +1,25 @@
 import re
+import time
 import json
 import yaml
-import profile_cpp
+import numpy as np
 
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from PIL import Image
 from copy import deepcopy
-from toolbox.utils.generic import get_config_dir, get_assets_dir
+from toolbox.utils.generic import get_config_dir, get_assets_dir, get_project_root
 from toolbox.utils.ocr import ocr
 from toolbox.utils.logger import logger
+from .solver_cache import SolverCache
+
+try:
+    import profile_cpp
+except ImportError:
+    # Same API in pure NumPy, for machines where the extension could not be built.
+    from . import profile_np as profile_cpp
+    logger.warning("profile_cpp is not available, falling back to the slower NumPy backend")
 
 stat_file = get_config_dir() / "entry_stats.yml"
 coef_file = get_config_dir() / "entry_coef.yml"
@@ -24,6 +34,33 @@ with open(coef_file, "r", encoding="utf-8") as f:
 with open(echo_file, "r", encoding="utf-8") as f:
     echo_data = json.load(f)
 
+# Accumulated exp required to reach each level.
+ECHO_EXP = [0, 500, 1000, 2000, 3000, 4500, 6500, 8500, 10500, 13500, 16500, 20500, 
+    24500, 29000, 34000, 40000, 46000, 53500, 61000, 70000, 79500, 90000, 101500, 114000, 127500, 143000]
+
+solver_cache = SolverCache(get_project_root() / "cache", stat_file)
+
+# Stat data converted to the backend layout once at import. Pass this to profile_cpp
+# instead of stat_data, which would otherwise be re-parsed on every call.
+stat_table = profile_cpp.StatTable(stat_data)
+
+def _entry_values(obj) -> tuple[float, ...]:
+    return tuple(float(getattr(obj, key)) for key in profile_cpp.ENTRY_KEYS)
+
+# The backend objects below are shared between callers with equal values and must
+# be treated as read-only.
+@lru_cache(maxsize=64)
+def _compile_scheduler(thresholds: tuple[float, ...]) -> profile_cpp.DiscardScheduler:
+    return profile_cpp.DiscardScheduler(list(thresholds))
+
+@lru_cache(maxsize=256)
+def _compile_coef(values: tuple[float, ...]) -> profile_cpp.EntryCoef:
+    return profile_cpp.EntryCoef(list(values))
+
+@lru_cache(maxsize=1024)
+def _compile_profile(level: int, values: tuple[float, ...]) -> profile_cpp.EchoProfile:
+    return profile_cpp.EchoProfile(level, list(values))
+
 @dataclass
 class DiscardScheduler:
     level_5_9: float = field(default=0.0)
@@ -32,8 +69,8 @@ class DiscardScheduler:
     level_20_24: float = field(default=0.0)
 
     def to_cpp(self):
-        thresholds = [self.level_5_9, self.level_10_14, self.level_15_19, self.level_20_24]
-        return profile_cpp.DiscardScheduler(thresholds)
+        thresholds = (self.level_5_9, self.level_10_14, self.level_15_19, self.level_20_24)
+        return _compile_scheduler(tuple(float(t) for t in thresholds))
 
 @dataclass 
 class EntryCoef:
@@ -91,7 +128,67 @@ class EntryCoef:
             setattr(self, key, value)
 
     def to_cpp(self):
-        return profile_cpp.EntryCoef({k: float(v) for k, v in self.__dict__.items()})
+        return _compile_coef(_entry_values(self))
+
+@dataclass
+class ScoreDistribution:
+    """Distribution of the final score of a profile after it is upgraded to lv 25.
+
+    scores is sorted ascending, pmf[i] is the probability of ending with scores[i], and
+    cdf is the running sum of pmf.
+    """
+    scores: np.ndarray
+    pmf: np.ndarray
+    cdf: np.ndarray
+
+    def prob_above(self, threshold: float) -> float:
+        """Probability that the final score is at least threshold."""
+        if len(self.pmf) == 0:
+            return 0.0
+        idx = int(np.searchsorted(self.scores, threshold - 1e-9))
+        return float(self.cdf[-1] - (self.cdf[idx - 1] if idx > 0 else 0.0))
+
+    def quantile(self, q: float) -> float:
+        """Smallest score whose cumulative probability reaches q of the total mass."""
+        if len(self.pmf) == 0:
+            return 0.0
+        idx = min(int(np.searchsorted(self.cdf, q * self.cdf[-1] - 1e-12)), len(self.scores) - 1)
+        return float(self.scores[idx])
+
+@dataclass
+class ScoreSensitivity:
+    """An exact solver output with its derivatives with respect to the coef weights and the
+    score threshold, so the weights page can extrapolate while a slider is dragged.
+
+    The exact output only changes when a score crosses a bin, so the derivatives are taken
+    with the success test smoothed over `bandwidth` score points and discard decisions fixed.
+    """
+    # Exact value of the output.
+    value: float
+    # Derivative with respect to every coef weight.
+    coef: dict[str, float]
+    # Derivative with respect to the score threshold.
+    threshold: float
+
+    def extrapolate(self, coef_delta: dict[str, float] = None, threshold_delta: float = 0.0) -> float:
+        """First-order estimate of the output after moving the weights and the threshold."""
+        delta = sum(self.coef[key] * value for key, value in (coef_delta or {}).items())
+        return self.value + delta + self.threshold * threshold_delta
+
+    @classmethod
+    def from_arrays(cls, value: float, coef_grad, threshold_grad: float) -> "ScoreSensitivity":
+        return cls(
+            value=float(value),
+            coef=dict(zip(profile_cpp.ENTRY_KEYS, map(float, coef_grad))),
+            threshold=float(threshold_grad)
+        )
+
+@dataclass
+class StatisticsSensitivity:
+    """EchoProfile.get_statistics with the derivatives of each of its outputs."""
+    prob_above_threshold_with_discard: ScoreSensitivity
+    expected_wasted_exp: ScoreSensitivity
+    expected_wasted_tuner: ScoreSensitivity
 
 @dataclass
 class EchoProfile:
@@ -283,12 +380,27 @@ class EchoProfile:
         return tmp_profile.get_score(coef)
     
     def to_cpp(self):
-        return profile_cpp.EchoProfile(self.level, {k: float(v) for k, v in self.__dict__.items() if k != "level" and k != "name"})
+        return _compile_profile(int(self.level), _entry_values(self))
 
     def prob_above_score(self, coef: 'EntryCoef', threshold: float, locked_keys: list = None) -> float:
         if locked_keys is None:
             locked_keys = []
-        return profile_cpp.prob_above_score(self.to_cpp(), coef.to_cpp(), threshold, locked_keys, stat_data)
+        return profile_cpp.prob_above_score(self.to_cpp(), coef.to_cpp(), threshold, locked_keys, stat_table)
+
+    def prob_above_score_gradient(self, coef: 'EntryCoef', threshold: float, locked_keys: list = None, bandwidth: float = 0.5) -> ScoreSensitivity:
+        """prob_above_score with its derivatives, computed in the same backend sweep."""
+        if locked_keys is None:
+            locked_keys = []
+        result = profile_cpp.prob_above_score_gradient(self.to_cpp(), coef.to_cpp(), threshold, locked_keys, stat_table, bandwidth)
+        return ScoreSensitivity.from_arrays(result["value"], result["coef"], result["threshold"])
+
+    def score_distribution(self, coef: 'EntryCoef', locked_keys: list = None) -> ScoreDistribution:
+        """Return the full distribution of the final score, so any number of thresholds
+        can be queried without calling into the backend again."""
+        if locked_keys is None:
+            locked_keys = []
+        scores, pmf = profile_cpp.score_distribution(self.to_cpp(), coef.to_cpp(), locked_keys, stat_table)
+        return ScoreDistribution(scores=scores, pmf=pmf, cdf=np.cumsum(pmf))
 
     def get_statistics(self, coef: 'EntryCoef', score_thres: float, scheduler: DiscardScheduler, locked_keys: list = None) -> tuple[float, float, float]:
         """Return statistics about current profile under the given scheduler.
@@ -305,6 +417,7 @@ class EchoProfile:
         """
         if locked_keys is None:
             locked_keys = []
+        _sync_statistics_tables(coef, score_thres, scheduler, locked_keys)
 
         # Call the updated C++ function which returns a Result struct
         res = profile_cpp.get_statistics(
@@ -313,7 +426,7 @@ class EchoProfile:
             score_thres,
             locked_keys,
             scheduler.to_cpp(),
-            stat_data,
+            stat_table,
         )
 
         # Unpack the struct to a plain python tuple for backwards-compatibility
@@ -323,17 +436,205 @@ class EchoProfile:
             float(res.expected_wasted_tuner),
         )
 
+    def get_statistics_gradient(self, coef: 'EntryCoef', score_thres: float, scheduler: DiscardScheduler, locked_keys: list = None, bandwidth: float = 0.5) -> StatisticsSensitivity:
+        """get_statistics with the derivatives of each output, computed in the same backend sweep."""
+        if locked_keys is None:
+            locked_keys = []
+        _sync_statistics_tables(coef, score_thres, scheduler, locked_keys)
+        result = profile_cpp.get_statistics_gradient(
+            self.to_cpp(), coef.to_cpp(), score_thres, locked_keys, scheduler.to_cpp(), stat_table, bandwidth
+        )
+        return StatisticsSensitivity(*(
+            ScoreSensitivity.from_arrays(value, coef_grad, threshold_grad)
+            for value, coef_grad, threshold_grad in zip(result["value"], result["coef"], result["threshold"])
+        ))
+
+def _coef_key(coef: EntryCoef) -> list[float]:
+    return list(_entry_values(coef))
+
+def _table_key(coef: EntryCoef, score_thres: float, locked_keys: list) -> dict:
+    return {"coef": _coef_key(coef), "score_thres": float(score_thres), "locked_keys": sorted(set(locked_keys))}
+
+def _sync_reach_prob_table(coef: EntryCoef, score_thres: float, locked_keys: list):
+    solver_cache.sync(
+        "reach_prob", _table_key(coef, score_thres, locked_keys), 2,
+        lambda states, probs: profile_cpp.load_reach_prob_table(coef.to_cpp(), score_thres, locked_keys, states, probs, stat_table),
+        lambda: profile_cpp.export_reach_prob_table(coef.to_cpp(), score_thres, locked_keys, stat_table)
+    )
+
+def _sync_statistics_tables(coef: EntryCoef, score_thres: float, scheduler: DiscardScheduler, locked_keys: list):
+    """Seed the backend memo tables for this build from the solver cache, or persist them."""
+    _sync_reach_prob_table(coef, score_thres, locked_keys)
+    solver_cache.sync(
+        "statistics",
+        {**_table_key(coef, score_thres, locked_keys), "scheduler": list(scheduler.to_cpp().thresholds)},
+        2,
+        lambda keys, values: profile_cpp.load_statistics_table(coef.to_cpp(), score_thres, locked_keys, scheduler.to_cpp(), keys, values, stat_table),
+        lambda: profile_cpp.export_statistics_table(coef.to_cpp(), score_thres, locked_keys, scheduler.to_cpp(), stat_table)
+    )
+
+def profiles_to_array(profiles: list[EchoProfile]) -> np.ndarray:
+    """Stack profiles into an (N, 14) array: the level followed by the entry values in profile_cpp.ENTRY_KEYS order."""
+    if hasattr(profiles, "to_array"):
+        # An EchoInventory already holds the columns.
+        return profiles.to_array()
+    rows = [[profile.level] + [getattr(profile, key) for key in profile_cpp.ENTRY_KEYS] for profile in profiles]
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(profile_cpp.ENTRY_KEYS) + 1)
+
+def analyze_profiles(
+    profiles: list[EchoProfile],
+    coef: EntryCoef,
+    score_thres: float,
+    scheduler: DiscardScheduler,
+    locked_keys: list = None
+) -> dict[str, np.ndarray]:
+    """Analyze a whole inventory in a single call to the C++ backend.
+
+    Args:
+        profiles: Profiles to analyze
+        coef: Entry coefficients
+        score_thres: Score threshold to achieve
+        scheduler: Discard scheduler applied when computing the statistics
+        locked_keys: List of entry keys that must be present
+
+    Returns:
+        dict[str, np.ndarray]: One array per field (score, expected_score, prob_above_threshold,
+        prob_above_threshold_with_discard, expected_wasted_exp, expected_wasted_tuner), aligned with profiles.
+    """
+    if locked_keys is None:
+        locked_keys = []
+    _sync_statistics_tables(coef, score_thres, scheduler, locked_keys)
+    return profile_cpp.analyze_profiles(
+        profiles_to_array(profiles), coef.to_cpp(), score_thres, locked_keys, scheduler.to_cpp(), stat_table
+    )
+
+@dataclass
+class CharacterEvaluation:
+    # Characters of the columns, as named in entry_coef.yml.
+    char_names: list[str]
+    # Current score of every profile for every character, shape (profiles, characters).
+    score: np.ndarray
+    # Expected score after upgraded to lv 25, shape (profiles, characters).
+    expected_score: np.ndarray
+    # Probability to reach the character's threshold after upgraded to lv 25, shape (profiles, characters).
+    prob_above_threshold: np.ndarray
+
+    def best_characters(self) -> list[str]:
+        """The character each profile is most likely to be good enough for."""
+        if not self.char_names:
+            return [None] * self.score.shape[0]
+        return [self.char_names[j] for j in np.argmax(self.prob_above_threshold, axis=1)]
+
+def evaluate_characters(
+    profiles: list[EchoProfile],
+    score_thres: float | dict[str, float],
+    char_names: list[str] = None,
+    locked_keys: list = None,
+    num_threads: int = 0
+) -> CharacterEvaluation:
+    """Evaluate an inventory against several characters in a single call to the C++ backend.
+
+    Args:
+        profiles: Profiles to evaluate
+        score_thres: Score threshold to achieve, either shared or per character name
+        char_names: Characters from entry_coef.yml to evaluate against, all of them by default
+        locked_keys: List of entry keys that must be present
+        num_threads: Worker threads used by the backend, 0 for one per CPU core
+
+    Returns:
+        CharacterEvaluation: Profiles x characters matrices of scores and probabilities.
+    """
+    if locked_keys is None:
+        locked_keys = []
+    if char_names is None:
+        char_names = [name for name in coef_data if name != "Default"]
+    coefs = np.array([_entry_values(EntryCoef(name)) for name in char_names], dtype=np.float64).reshape(-1, len(profile_cpp.ENTRY_KEYS))
+    if isinstance(score_thres, dict):
+        thresholds = np.array([score_thres[name] for name in char_names], dtype=np.float64)
+    else:
+        thresholds = np.full(len(char_names), score_thres, dtype=np.float64)
+
+    result = profile_cpp.evaluate_coefs(profiles_to_array(profiles), coefs, thresholds, locked_keys, stat_table, num_threads)
+    return CharacterEvaluation(
+        char_names=list(char_names),
+        score=result["score"],
+        expected_score=result["expected_score"],
+        prob_above_threshold=result["prob_above_threshold"]
+    )
+
 def get_example_profile_above_threshold(level: int, prob: float, coef: EntryCoef, score_thres: float, locked_keys: list = None) -> EchoProfile:
     if locked_keys is None:
         locked_keys = []
+    _sync_reach_prob_table(coef, score_thres, locked_keys)
+    solver_cache.sync(
+        "example", {"coef": _coef_key(coef)}, 1,
+        lambda profiles: profile_cpp.load_example_table(coef.to_cpp(), profiles),
+        lambda: (profile_cpp.export_example_table(coef.to_cpp(), stat_table),)
+    )
     cpp_profile = profile_cpp.get_example_profile_above_threshold(
-        level, prob, coef.to_cpp(), score_thres, locked_keys, stat_data
+        level, prob, coef.to_cpp(), score_thres, locked_keys, stat_table
     )
     # The C++ function returns an empty profile if not found
     if cpp_profile.level == 0 and not cpp_profile.values:
         return None
     return EchoProfile.from_cpp_profile(cpp_profile)
 
+@dataclass
+class SchedulerSolution:
+    scheduler: DiscardScheduler
+    # Solver that produced the scheduler, "dinkelbach" or "bisection".
+    method: str
+    # Number of passes over the upgrade tree.
+    iterations: int
+    # Gap between the restart cost and its re-evaluation at the last pass.
+    residual: float
+    # Solver wall time in seconds.
+    wall_time: float
+    # Expected (echoes, exp, tuners) spent per echo reaching the threshold.
+    expected_resource: tuple[float, float, float]
+
+def solve_optimal_scheduler(
+    num_echo_weight: float,
+    exp_weight: float,
+    tuner_weight: float,
+    coef: EntryCoef,
+    score_thres: float,
+    locked_keys: list = None,
+    method: str = "dinkelbach",
+    iterations: int = 20,
+    num_threads: int = 0
+) -> SchedulerSolution:
+    """Run the optimal scheduler search and report how the solver converged.
+
+    Args:
+        num_echo_weight: Weight for number of echoes used
+        exp_weight: Weight for experience wasted
+        tuner_weight: Weight for tuners wasted
+        coef: Entry coefficients
+        score_thres: Score threshold to achieve
+        locked_keys: List of entry keys that must be present
+        method: "dinkelbach" for the ratio iteration, "bisection" for the original search
+        iterations: Bisection steps, or the cap on Dinkelbach passes
+        num_threads: Worker threads used by the solver, 0 for one per CPU core
+
+    Returns:
+        SchedulerSolution: Optimal discard thresholds with solver diagnostics
+    """
+    if locked_keys is None:
+        locked_keys = []
+    solution = profile_cpp.solve_optimal_scheduler(
+        num_echo_weight, exp_weight, tuner_weight,
+        coef.to_cpp(), score_thres, locked_keys, stat_table, method, iterations, num_threads
+    )
+    return SchedulerSolution(
+        scheduler=DiscardScheduler(*solution.scheduler.thresholds),
+        method=solution.method,
+        iterations=solution.iterations,
+        residual=solution.residual,
+        wall_time=solution.wall_time,
+        expected_resource=tuple(solution.expected_resource)
+    )
+
 def get_optimal_scheduler(
     num_echo_weight: float,
     exp_weight: float,
@@ -341,7 +642,9 @@ def get_optimal_scheduler(
     coef: EntryCoef,
     score_thres: float,
     locked_keys: list = None,
-    iterations: int = 20
+    iterations: int = 20,
+    num_threads: int = 0,
+    method: str = "dinkelbach"
 ) -> DiscardScheduler:
     """Calculate optimal discard scheduler based on resource weights.
     
@@ -353,26 +656,192 @@ def get_optimal_scheduler(
         score_thres: Score threshold to achieve
         locked_keys: List of entry keys that must be present
         iterations: Number of optimization iterations
+        num_threads: Worker threads used by the solver, 0 for one per CPU core
+        method: Solver to use, see solve_optimal_scheduler
         
     Returns:
         DiscardScheduler: Optimal discard thresholds
     """
     if locked_keys is None:
         locked_keys = []
-    cpp_scheduler = profile_cpp.get_optimal_scheduler(
-        num_echo_weight, exp_weight, tuner_weight,
-        coef.to_cpp(), score_thres, locked_keys, stat_data, iterations
+    key = solver_cache.key(
+        "scheduler",
+        weights=[num_echo_weight, exp_weight, tuner_weight],
+        iterations=iterations,
+        method=method,
+        **_table_key(coef, score_thres, locked_keys)
     )
-    
-    # Convert C++ DiscardScheduler to Python DiscardScheduler
-    scheduler = DiscardScheduler()
-    scheduler.level_5_9 = cpp_scheduler.thresholds[0]
-    scheduler.level_10_14 = cpp_scheduler.thresholds[1]
-    scheduler.level_15_19 = cpp_scheduler.thresholds[2]
-    scheduler.level_20_24 = cpp_scheduler.thresholds[3]
-    
+    cached = solver_cache.load("scheduler", key, 1)
+    if cached is not None and cached[0].shape == (4,):
+        return DiscardScheduler(*cached[0].tolist())
+
+    solution = solve_optimal_scheduler(
+        num_echo_weight, exp_weight, tuner_weight, coef, score_thres, locked_keys, method, iterations, num_threads
+    )
+    logger.info(
+        f"Optimal scheduler ({solution.method}) found in {solution.iterations} iterations, "
+        f"residual {solution.residual:.2e}, {solution.wall_time:.3f}s"
+    )
+    scheduler = solution.scheduler
+    thresholds = [scheduler.level_5_9, scheduler.level_10_14, scheduler.level_15_19, scheduler.level_20_24]
+    solver_cache.save("scheduler", key, np.array(thresholds, dtype=np.float64))
     return scheduler
 
+@dataclass
+class SchedulerFrontPoint:
+    # First weights (num_echo, exp, tuner) of the sweep for which this scheduler is optimal, normalized to sum to 1.
+    weights: tuple[float, float, float]
+    scheduler: DiscardScheduler
+    # Expected (echoes, exp, tuners) spent per echo reaching the threshold.
+    expected_resource: tuple[float, float, float]
+
+def simplex_weights(steps: int) -> list[tuple[float, float, float]]:
+    """All weight vectors on the simplex with a resolution of 1 / steps, ordered so that neighbours differ little."""
+    weights = []
+    for i in range(steps + 1):
+        row = [(i, j, steps - i - j) for j in range(steps - i + 1)]
+        # Walk alternate rows backwards so consecutive vectors stay adjacent on the simplex.
+        weights.extend(row if i % 2 == 0 else row[::-1])
+    return [(a / steps, b / steps, c / steps) for a, b, c in weights]
+
+def get_scheduler_front(
+    coef: EntryCoef,
+    score_thres: float,
+    locked_keys: list = None,
+    weights: list[tuple[float, float, float]] = None,
+    steps: int = 6,
+    iterations: int = 20,
+    num_threads: int = 0
+) -> list[SchedulerFrontPoint]:
+    """Pareto front of the optimal schedulers over many resource weights.
+
+    Args:
+        coef: Entry coefficients
+        score_thres: Score threshold to achieve
+        locked_keys: List of entry keys that must be present
+        weights: (num_echo, exp, tuner) weight vectors to solve for; defaults to simplex_weights(steps)
+        steps: Resolution of the default weight grid
+        iterations: Maximum number of solver passes per weight vector
+        num_threads: Worker threads used by the solver, 0 for one per CPU core
+
+    Returns:
+        list[SchedulerFrontPoint]: Distinct schedulers whose expected resources are not dominated
+        by another one of the sweep, sorted by the expected number of echoes.
+    """
+    if locked_keys is None:
+        locked_keys = []
+    if weights is None:
+        weights = simplex_weights(steps)
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1, 3)
+    weights = weights[weights.sum(axis=1) > 0]
+    solutions = profile_cpp.solve_scheduler_sweep(weights, coef.to_cpp(), score_thres, locked_keys, stat_table, iterations, num_threads)
+
+    points = {}
+    for row, solution in zip(weights, solutions):
+        thresholds = tuple(solution.scheduler.thresholds)
+        if thresholds not in points:
+            points[thresholds] = SchedulerFrontPoint(
+                weights=tuple((row / row.sum()).tolist()),
+                scheduler=DiscardScheduler(*thresholds),
+                expected_resource=tuple(solution.expected_resource)
+            )
+    logger.info(
+        f"Scheduler sweep over {len(weights)} weights took {sum(s.iterations for s in solutions)} passes, "
+        f"{sum(s.wall_time for s in solutions):.3f}s, {len(points)} distinct schedulers"
+    )
+
+    candidates = list(points.values())
+    front = [
+        p for p in candidates
+        if not any(
+            all(a <= b + 1e-9 for a, b in zip(q.expected_resource, p.expected_resource)) and q.expected_resource != p.expected_resource
+            for q in candidates
+        )
+    ]
+    return sorted(front, key=lambda p: p.expected_resource)
+
+def compare_scheduler_methods(
+    score_thres: float,
+    num_echo_weight: float = 1.0,
+    exp_weight: float = 1.0,
+    tuner_weight: float = 1.0,
+    num_threads: int = 0
+) -> list[dict]:
+    """Run both scheduler solvers on every character in entry_coef.yml.
+
+    Returns:
+        list[dict]: One row per character with the thresholds, iterations and wall time of each method.
+    """
+    rows = []
+    for char_name in coef_data:
+        if char_name == "Default":
+            continue
+        coef = EntryCoef(char_name)
+        row = {"char_name": char_name}
+        for method in ["bisection", "dinkelbach"]:
+            solution = solve_optimal_scheduler(
+                num_echo_weight, exp_weight, tuner_weight, coef, score_thres, method=method, num_threads=num_threads
+            )
+            row[method] = solution
+        bisection, dinkelbach = row["bisection"], row["dinkelbach"]
+        logger.info(
+            f"{char_name}: bisection {bisection.iterations} it / {bisection.wall_time:.3f}s, "
+            f"dinkelbach {dinkelbach.iterations} it / {dinkelbach.wall_time:.3f}s, "
+            f"max threshold diff {max(abs(a - b) for a, b in zip(vars(bisection.scheduler).values(), vars(dinkelbach.scheduler).values())):.2e}"
+        )
+        rows.append(row)
+    return rows
+
+def compare_backends(
+    score_thres: float,
+    char_names: list[str] = None,
+    locked_keys: list = None
+) -> list[dict]:
+    """Differential benchmark of the NumPy fallback against the C++ backend.
+
+    For every character, both backends solve the optimal scheduler and analyze the profiles
+    of the example table under it. Requires the compiled profile_cpp extension.
+
+    Returns:
+        list[dict]: One row per character with the largest absolute difference of every
+        output and the wall time of each backend.
+    """
+    import profile_cpp as cpp_backend
+    from . import profile_np as np_backend
+
+    if locked_keys is None:
+        locked_keys = []
+    if char_names is None:
+        char_names = [name for name in coef_data if name != "Default"]
+    backends = {
+        "cpp": (cpp_backend, cpp_backend.StatTable(stat_data)),
+        "numpy": (np_backend, np_backend.StatTable(stat_data)),
+    }
+
+    rows = []
+    for char_name in char_names:
+        values = list(_entry_values(EntryCoef(char_name)))
+        profiles = cpp_backend.export_example_table(cpp_backend.EntryCoef(values), backends["cpp"][1])
+        outputs = {}
+        for name, (backend, table) in backends.items():
+            start = time.perf_counter()
+            coef = backend.EntryCoef(values)
+            solution = backend.solve_optimal_scheduler(1.0, 1.0, 1.0, coef, score_thres, locked_keys, table)
+            result = backend.analyze_profiles(profiles, coef, score_thres, locked_keys, solution.scheduler, table)
+            result["thresholds"] = np.array(solution.scheduler.thresholds)
+            result["expected_resource"] = np.array(solution.expected_resource)
+            outputs[name] = (result, time.perf_counter() - start)
+
+        (cpp_result, cpp_time), (np_result, np_time) = outputs["cpp"], outputs["numpy"]
+        row = {"char_name": char_name, "cpp_time": cpp_time, "numpy_time": np_time}
+        row.update({key: float(np.max(np.abs(cpp_result[key] - np_result[key]), initial=0.0)) for key in cpp_result})
+        logger.info(
+            f"{char_name}: C++ {cpp_time:.3f}s, NumPy {np_time:.3f}s ({np_time / cpp_time:.1f}x), "
+            f"max diff {max(v for k, v in row.items() if k not in ('char_name', 'cpp_time', 'numpy_time')):.2e}"
+        )
+        rows.append(row)
+    return rows
+
 def test():
 
     profile = EchoProfile(
@@ -0,0 +1,946 @@
+"""Pure NumPy version of the profile_cpp backend.
+
+toolbox.core.profile falls back to this module when the compiled extension cannot be
+imported, e.g. on a machine without a C++ compiler. It exposes the same classes and
+functions with the same signatures and follows profile.cpp closely: the upgrade graph
+is built one stage at a time as flat arrays, and every solver is a backward sweep over
+those arrays instead of a loop over states. Results agree with the C++ backend up to
+floating-point summation order.
+
+The num_threads arguments are accepted for compatibility and ignored.
+"""
+import math
+import threading
+import time
+import numpy as np
+
+from collections import OrderedDict
+
+ENTRY_KEYS = [
+    "cri_rate", "cri_dmg", "atk_rate", "atk_num", "def_rate", "def_num", "hp_rate",
+    "hp_num", "normal_dmg", "resonance_skill", "resonance_burst", "resonance_eff", "charged_atk"
+]
+NUM_ENTRIES = len(ENTRY_KEYS)
+
+# Scores are handled in fixed-point units of 1/20, as in profile.cpp.
+SCORE_BIN_SCALE = 20.0
+
+# Accumulated exp required to reach each level, the same table as in profile.cpp.
+_ECHO_EXP = [0, 500, 1000, 2000, 3000, 4500, 6500, 8500, 10500, 13500, 16500, 20500,
+    24500, 29000, 34000, 40000, 46000, 53500, 61000, 70000, 79500, 90000, 101500, 114000, 127500, 143000]
+
+_KEY_INDEX = {key: i for i, key in enumerate(ENTRY_KEYS)}
+_ENTRY_BITS = 1 << np.arange(NUM_ENTRIES, dtype=np.int64)
+
+# Graph states are sorted by mask << 32 | (score bin + _BIN_OFFSET), so lookups are a binary search.
+_BIN_OFFSET = 1 << 31
+
+def _entry_index(key: str) -> int:
+    try:
+        return _KEY_INDEX[key]
+    except KeyError:
+        raise RuntimeError(f"Unknown entry key: {key}") from None
+
+def _values_from(values) -> tuple[float, ...]:
+    if isinstance(values, dict):
+        result = [0.0] * NUM_ENTRIES
+        for key, value in values.items():
+            result[_entry_index(key)] = float(value)
+        return tuple(result)
+    result = tuple(float(value) for value in values)
+    if len(result) != NUM_ENTRIES:
+        raise TypeError(f"expected {NUM_ENTRIES} entry values, got {len(result)}")
+    return result
+
+def _round_half_away(x: float) -> float:
+    """std::round: halves are rounded away from zero, unlike Python's round."""
+    return math.copysign(math.floor(abs(x) + 0.5), x)
+
+def _lround(x: np.ndarray) -> np.ndarray:
+    return (np.sign(x) * np.floor(np.abs(x) + 0.5)).astype(np.int64)
+
+def _threshold_score_bin(threshold: float) -> int:
+    return int(math.ceil(threshold * SCORE_BIN_SCALE - 1e-9))
+
+def _locked_mask_of(locked_keys) -> int:
+    mask = 0
+    for key in locked_keys:
+        mask |= 1 << _entry_index(key)
+    return mask
+
+class StatTable:
+    """Entry value distributions in ENTRY_KEYS order, converted once from entry_stats.yml."""
+
+    def __init__(self, stat_data: dict):
+        self.data = []
+        for key in ENTRY_KEYS:
+            dist = stat_data[key].get("distribution", []) if key in stat_data else []
+            self.data.append((
+                np.array([float(entry["value"]) for entry in dist], dtype=np.float64),
+                np.array([float(entry["probability"]) for entry in dist], dtype=np.float64)
+            ))
+
+def _stat_table(stat_data) -> StatTable:
+    # The raw yaml dict is accepted too, like the implicit conversion of the C++ binding.
+    return stat_data if isinstance(stat_data, StatTable) else StatTable(stat_data)
+
+class EntryCoef:
+    def __init__(self, values=None):
+        self._set((0.0,) * NUM_ENTRIES if values is None else _values_from(values))
+
+    def _set(self, values: tuple[float, ...]):
+        self._values = values
+        # Cache key. Unlike EntryCoef::operator== in profile.cpp the values are not rounded,
+        # so characters whose coefs only differ below 0.1 never share tables.
+        self._key = values
+        self._effective_mask = sum(1 << i for i, v in enumerate(values) if abs(v) >= 1e-5)
+
+    @property
+    def values(self) -> dict[str, float]:
+        return dict(zip(ENTRY_KEYS, self._values))
+
+    @values.setter
+    def values(self, values: dict[str, float]):
+        self._set(_values_from(values))
+
+class EchoProfile:
+    def __init__(self, level: int = 0, values=None):
+        self.level = int(level)
+        self._values = (0.0,) * NUM_ENTRIES if values is None else _values_from(values)
+
+    @property
+    def values(self) -> dict[str, float]:
+        return {key: value for key, value in zip(ENTRY_KEYS, self._values) if abs(value) > 1e-5}
+
+    @values.setter
+    def values(self, values: dict[str, float]):
+        self._values = _values_from(values)
+
+class DiscardScheduler:
+    def __init__(self, thresholds: list[float] = None):
+        if thresholds is None:
+            thresholds = [0.0] * 4
+        if len(thresholds) != 4:
+            raise RuntimeError("DiscardScheduler needs 4 thresholds")
+        self.thresholds = [float(t) for t in thresholds]
+
+    def get_threshold_for_level(self, level: int) -> float:
+        if 5 <= level <= 24:
+            return self.thresholds[level // 5 - 1]
+        return 0.0
+
+class Result:
+    def __init__(self, prob_above_threshold_with_discard: float = 0.0, expected_wasted_exp: float = 0.0, expected_wasted_tuner: float = 0.0):
+        self.prob_above_threshold_with_discard = float(prob_above_threshold_with_discard)
+        self.expected_wasted_exp = float(expected_wasted_exp)
+        self.expected_wasted_tuner = float(expected_wasted_tuner)
+
+class SchedulerSolution:
+    def __init__(self, method: str):
+        self.scheduler = DiscardScheduler()
+        self.method = method
+        self.iterations = 0
+        self.residual = 0.0
+        self.wall_time = 0.0
+        # Expected resources spent per successful echo under the returned strategy.
+        self.expected_resource = (0.0, 0.0, 0.0)
+
+_cache_lock = threading.Lock()
+
+def _cached(cache: OrderedDict, key, factory, max_size: int = 20):
+    """LRU lookup; the value is built outside the lock and the first insert wins."""
+    with _cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    value = factory()
+    with _cache_lock:
+        value = cache.setdefault(key, value)
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+    return value
+
+def _pack(masks: np.ndarray, bins: np.ndarray) -> np.ndarray:
+    return (masks << 32) | (bins + _BIN_OFFSET)
+
+def _entry_bins(coef: EntryCoef, stat: StatTable) -> list[tuple[int, np.ndarray, np.ndarray]]:
+    """(index, score bins, probabilities) of every effective entry under `coef`."""
+    entry_bins = []
+    for i, c in enumerate(coef._values):
+        if abs(c) < 1e-5:
+            continue
+        values, probs = stat.data[i]
+        entry_bins.append((i, _lround(values * c * SCORE_BIN_SCALE), probs))
+    return entry_bins
+
+class _UpgradeGraph:
+    """Upgrade states reachable from a root state, grouped by stage (level / 5).
+
+    States of a stage are sorted by their packed (effective mask, score bin). The edges
+    leaving a stage are flat (parent, child, prob) arrays, enumerated key by key so that the
+    edges of every parent come in the order of profile.cpp. np.bincount adds its weights in
+    array order, so the expectations below are the same floating-point sums as in C++.
+    The graph of an empty echo covers all regular profiles; other profiles get a graph
+    rooted at their own state.
+    """
+
+    def __init__(self, coef: EntryCoef, stat: StatTable, root_stage: int = 0, root_mask: int = 0, root_bin: int = 0):
+        self.root_stage = root_stage
+        self.effective_mask = coef._effective_mask
+        self.keys = [np.zeros(0, dtype=np.int64) for _ in range(6)]
+        self.masks = [np.zeros(0, dtype=np.int64) for _ in range(6)]
+        self.bins = [np.zeros(0, dtype=np.int64) for _ in range(6)]
+        self.parents, self.children, self.probs = [None] * 5, [None] * 5, [None] * 5
+        # Entry drawn by every edge (-1 for the non-effective ones) and its value.
+        self.entries, self.values = [None] * 5, [None] * 5
+        # Per (threshold bin, locked mask, ...) tables computed on this graph.
+        self.reach_cache = OrderedDict()
+        self.statistics_cache = OrderedDict()
+        self.sensitivity_cache = OrderedDict()
+
+        entry_bins = _entry_bins(coef, stat)
+        masks = np.array([root_mask], dtype=np.int64)
+        bins = np.array([root_bin], dtype=np.int64)
+        for stage in range(root_stage, 6):
+            self.masks[stage], self.bins[stage] = masks, bins
+            self.keys[stage] = _pack(masks, bins)
+            if stage == 5:
+                break
+
+            m = NUM_ENTRIES - stage
+            n = len(masks)
+            num_avail = np.zeros(n)
+            parents, child_masks, child_bins, probs, entries, values = [], [], [], [], [], []
+            for i, adds, entry_probs in entry_bins:
+                idx = np.flatnonzero((masks >> i) & 1 == 0)
+                num_avail[idx] += 1
+                k = len(adds)
+                parents.append(np.repeat(idx, k))
+                child_masks.append(np.repeat(masks[idx] | (1 << i), k))
+                child_bins.append((bins[idx, None] + adds[None, :]).ravel())
+                probs.append(np.tile(entry_probs / m, len(idx)))
+                entries.append(np.full(k * len(idx), i))
+                values.append(np.tile(stat.data[i][0], len(idx)))
+            # Any other key leaves the mask and score unchanged.
+            parents.append(np.arange(n))
+            child_masks.append(masks)
+            child_bins.append(bins)
+            probs.append((m - num_avail) / m)
+            entries.append(np.full(n, -1))
+            values.append(np.zeros(n))
+
+            keys, children = np.unique(_pack(np.concatenate(child_masks), np.concatenate(child_bins)), return_inverse=True)
+            self.parents[stage] = np.concatenate(parents)
+            self.children[stage] = children.ravel()
+            self.probs[stage] = np.concatenate(probs)
+            self.entries[stage] = np.concatenate(entries)
+            self.values[stage] = np.concatenate(values)
+            masks = keys >> 32
+            bins = (keys & 0xffffffff) - _BIN_OFFSET
+
+    def find(self, stage: int, masks, bins) -> np.ndarray:
+        """Indices of the given states within their stage, -1 where a state is not in the graph."""
+        keys = self.keys[stage]
+        packed = _pack(np.atleast_1d(np.asarray(masks, dtype=np.int64)), np.atleast_1d(np.asarray(bins, dtype=np.int64)))
+        if len(keys) == 0:
+            return np.full(len(packed), -1)
+        idx = np.minimum(np.searchsorted(keys, packed), len(keys) - 1)
+        return np.where(keys[idx] == packed, idx, -1)
+
+    def edges(self, stage: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.parents[stage], self.children[stage], self.probs[stage]
+
+    def expectation(self, stage: int, values: np.ndarray, edges: tuple = None) -> np.ndarray:
+        """Expectation over the children of every state of `stage` of `values`, given per state
+        of stage + 1 as one row or as a (k, n) stack of rows. `edges` may be a subset of the edges."""
+        parents, children, probs = edges or self.edges(stage)
+        n = len(self.keys[stage])
+        if values.ndim == 1:
+            return np.bincount(parents, weights=values[children] * probs, minlength=n)
+        return np.stack([np.bincount(parents, weights=row[children] * probs, minlength=n) for row in values])
+
+    def finished(self, stage: int, thres_bin: int, locked_mask: int) -> np.ndarray:
+        return (self.bins[stage] >= thres_bin) & ((self.masks[stage] & locked_mask) == locked_mask)
+
+_graph_cache = OrderedDict()
+
+def _get_graph(coef: EntryCoef, stat: StatTable, stage: int = 0, mask: int = 0, score_bin: int = 0) -> _UpgradeGraph:
+    # Graphs rooted at irregular profiles are small, so they share the cache with a larger bound.
+    return _cached(_graph_cache, (coef._key, stage, mask, score_bin),
+        lambda: _UpgradeGraph(coef, stat, stage, mask, score_bin), max_size=64)
+
+def _locate(coef: EntryCoef, stat: StatTable, stage: int, mask: int, score_bin: int) -> tuple[_UpgradeGraph, int]:
+    graph = _get_graph(coef, stat)
+    idx = int(graph.find(stage, mask, score_bin)[0])
+    if idx < 0:
+        graph, idx = _get_graph(coef, stat, stage, mask, score_bin), 0
+    return graph, idx
+
+def _reach_probs(graph: _UpgradeGraph, thres_bin: int, locked_mask: int) -> list[np.ndarray]:
+    """Probability of finishing at or above the threshold from every state when nothing is discarded."""
+    locked_mask &= graph.effective_mask
+
+    def build():
+        probs = [None] * 6
+        probs[5] = graph.finished(5, thres_bin, locked_mask).astype(np.float64)
+        for stage in range(4, graph.root_stage - 1, -1):
+            probs[stage] = graph.expectation(stage, probs[stage + 1])
+        return probs
+    return _cached(graph.reach_cache, (thres_bin, locked_mask), build)
+
+def _statistics_table(graph: _UpgradeGraph, thres_bin: int, locked_mask: int, thresholds: tuple[float, ...]) -> list[np.ndarray]:
+    """(prob with discard, wasted exp, wasted tuner) rows over the states of every stage, as in sweep_statistics."""
+    def build():
+        scheduler = DiscardScheduler(list(thresholds))
+        reach = None
+        table = [None] * 6
+        for stage in range(5, graph.root_stage - 1, -1):
+            level = stage * 5
+            if stage == 5:
+                result = np.repeat([[0.0], [_ECHO_EXP[25]], [50.0]], len(graph.keys[5]), axis=1)
+            else:
+                result = graph.expectation(stage, table[stage + 1])
+                discard_thres = scheduler.get_threshold_for_level(level)
+                if discard_thres > 0.0:
+                    if reach is None:
+                        reach = _reach_probs(graph, thres_bin, locked_mask)
+                    result[:, reach[stage] < discard_thres] = [[0.0], [_ECHO_EXP[level]], [level // 5 * 10]]
+            result[:, graph.finished(stage, thres_bin, locked_mask)] = [[1.0], [0.0], [0.0]]
+            table[stage] = result
+        return table
+    return _cached(graph.statistics_cache, (thres_bin, locked_mask, thresholds), build)
+
+def _profile_bins(values: np.ndarray, coef: EntryCoef) -> tuple[np.ndarray, np.ndarray]:
+    """Entry masks and score bins of an (N, 13) value array."""
+    present = np.abs(values) > 1e-5
+    masks = (present * _ENTRY_BITS).sum(axis=1)
+    bins = np.where(present, _lround(values * np.array(coef._values) * SCORE_BIN_SCALE), 0).sum(axis=1)
+    return masks, bins
+
+def _reach_probs_of(coef: EntryCoef, stat: StatTable, levels: np.ndarray, masks: np.ndarray, bins: np.ndarray, thres_bin: int, locked_mask: int) -> np.ndarray:
+    """Reach probabilities of many states at once; states outside the graph are solved one by one."""
+    masks = masks & coef._effective_mask
+    stages = levels // 5
+    graph = _get_graph(coef, stat)
+    reach = _reach_probs(graph, thres_bin, locked_mask)
+    result = np.empty(len(levels))
+    for stage in np.unique(stages):
+        rows = np.flatnonzero(stages == stage)
+        idx = graph.find(stage, masks[rows], bins[rows])
+        found = idx >= 0
+        result[rows[found]] = reach[stage][idx[found]]
+        for r in rows[~found]:
+            sub_graph, sub_idx = _locate(coef, stat, int(stage), int(masks[r]), int(bins[r]))
+            result[r] = _reach_probs(sub_graph, thres_bin, locked_mask)[stage][sub_idx]
+    return result
+
+def _statistics_of(coef: EntryCoef, stat: StatTable, level: int, mask: int, score_bin: int, thres_bin: int, locked_mask: int, scheduler: DiscardScheduler) -> np.ndarray:
+    stage = level // 5
+    graph, idx = _locate(coef, stat, stage, mask, score_bin)
+    table = _statistics_table(graph, thres_bin, locked_mask, tuple(scheduler.thresholds))
+    if level % 5 == 0:
+        return table[stage][:, idx]
+
+    # Between two stages (e.g. lv 7) the rules of the level itself apply before moving on to the children.
+    if score_bin >= thres_bin and (mask & locked_mask) == locked_mask:
+        return np.array([1.0, 0.0, 0.0])
+    if _reach_probs(graph, thres_bin, locked_mask)[stage][idx] < scheduler.get_threshold_for_level(level):
+        return np.array([0.0, _ECHO_EXP[level], level // 5 * 10])
+    parents, children, probs = graph.edges(stage)
+    edges = parents == idx
+    # cumsum adds in order, like the recursion of profile.cpp.
+    return np.cumsum(table[stage + 1][:, children[edges]] * probs[edges], axis=1)[:, -1]
+
+# Rows of the sensitivity tables, as in profile.cpp: per output, the smoothed value, its
+# derivative with respect to the score collected so far, with respect to every coef through
+# the entries still to come, and through the non-effective entries summed over them.
+SENS_VALUE, SENS_DS, SENS_DC = 0, 1, 2
+SENS_DNONE = SENS_DC + NUM_ENTRIES
+SENS_STRIDE = SENS_DNONE + 1
+
+def _sensitivity_expectation(graph: _UpgradeGraph, stage: int, rows: np.ndarray, edges: np.ndarray = None) -> np.ndarray:
+    """Expectation of (outputs, SENS_STRIDE, n) child rows over the edges of every state of
+    `stage`, plus the tangent of the entry each edge draws. `edges` may select a subset."""
+    parents, children, probs = graph.edges(stage)
+    entries, values = graph.entries[stage], graph.values[stage]
+    if edges is not None:
+        parents, children, probs = parents[edges], children[edges], probs[edges]
+        entries, values = entries[edges], values[edges]
+    n = len(graph.keys[stage])
+    columns = np.arange(SENS_STRIDE)[:, None]
+    index = np.concatenate([(parents * SENS_STRIDE + columns).ravel(),
+        parents * SENS_STRIDE + np.where(entries >= 0, SENS_DC + entries, SENS_DNONE)])
+    # The drawn entry moves the score by its value per unit of its coef.
+    scale = probs * np.where(entries >= 0, values, 1.0)
+    result = np.empty((len(rows), SENS_STRIDE, n))
+    for o, row in enumerate(rows):
+        child = row[:, children]
+        weights = np.concatenate([(child * probs).ravel(), child[SENS_DS] * scale])
+        result[o] = np.bincount(index, weights=weights, minlength=n * SENS_STRIDE).reshape(n, SENS_STRIDE).T
+    return result
+
+def _smooth_finish(rows: np.ndarray, bins: np.ndarray, finishing: np.ndarray, thres_bin: int, bandwidth: float):
+    """Blend the rows of states that can finish with success, weighted by the logistic step."""
+    success = np.array([1.0, 0.0, 0.0])[:len(rows), None]
+    z = (bins - thres_bin + 0.5) / SCORE_BIN_SCALE / bandwidth
+    w = np.where(finishing, np.exp(-np.logaddexp(0.0, -z)), 0.0)
+    dw = w * (1.0 - w) / bandwidth
+    cont = rows[:, SENS_VALUE].copy()
+    rows[:, SENS_VALUE] = w * success + (1.0 - w) * cont
+    rows[:, SENS_DS] = dw * (success - cont) + (1.0 - w) * rows[:, SENS_DS]
+    rows[:, SENS_DC:] *= 1.0 - w
+
+def _stop_rows(outputs: int, n: int, level: int) -> np.ndarray:
+    rows = np.zeros((outputs, SENS_STRIDE, n))
+    if outputs == 3:
+        rows[1, SENS_VALUE] = _ECHO_EXP[level]
+        rows[2, SENS_VALUE] = level // 5 * 10
+    return rows
+
+def _sensitivity_table(graph: _UpgradeGraph, thres_bin: int, locked_mask: int, thresholds: tuple[float, ...], bandwidth: float) -> list[np.ndarray]:
+    """(outputs, SENS_STRIDE, n) rows over the states of every stage, as in sweep_sensitivities.
+    `thresholds` is None for the reach probability."""
+    def build():
+        outputs = 1 if thresholds is None else 3
+        scheduler = DiscardScheduler(list(thresholds or (0.0,) * 4))
+        table = [None] * 6
+        for stage in range(5, graph.root_stage - 1, -1):
+            level = stage * 5
+            if stage == 5:
+                rows = _stop_rows(outputs, len(graph.keys[5]), 25)
+            else:
+                rows = _sensitivity_expectation(graph, stage, table[stage + 1])
+                discard_thres = scheduler.get_threshold_for_level(level)
+                if discard_thres > 0.0:
+                    discard = _reach_probs(graph, thres_bin, locked_mask)[stage] < discard_thres
+                    rows[:, :, discard] = _stop_rows(outputs, 1, level)
+            if thresholds is not None or stage == 5:
+                finishing = (graph.masks[stage] & locked_mask) == locked_mask
+                _smooth_finish(rows, graph.bins[stage], finishing, thres_bin, bandwidth)
+            table[stage] = rows
+        return table
+    return _cached(graph.sensitivity_cache, (thres_bin, locked_mask, thresholds, bandwidth), build, max_size=2)
+
+def _sensitivity_of(coef: EntryCoef, stat: StatTable, level: int, mask: int, score_bin: int, thres_bin: int, locked_mask: int, thresholds: tuple[float, ...], bandwidth: float) -> np.ndarray:
+    stage = level // 5
+    if thresholds is None:
+        # The reach probability ignores locked keys that are not effective, and the level within a stage.
+        locked_mask &= coef._effective_mask
+    graph, idx = _locate(coef, stat, stage, mask, score_bin)
+    table = _sensitivity_table(graph, thres_bin, locked_mask, thresholds, bandwidth)
+    if level % 5 == 0 or thresholds is None:
+        return table[stage][:, :, idx]
+
+    # Between two stages the rules of the level itself apply before moving on to the children.
+    if _reach_probs(graph, thres_bin, locked_mask)[stage][idx] < DiscardScheduler(list(thresholds)).get_threshold_for_level(level):
+        rows = _stop_rows(3, 1, level)
+    else:
+        rows = _sensitivity_expectation(graph, stage, table[stage + 1], graph.parents[stage] == idx)[:, :, idx:idx + 1]
+    _smooth_finish(rows, np.array([score_bin]), np.array([(mask & locked_mask) == locked_mask]), thres_bin, bandwidth)
+    return rows[:, :, 0]
+
+def _sensitivity_gradient(rows: np.ndarray, profile: EchoProfile, coef: EntryCoef, stat: StatTable) -> tuple[np.ndarray, np.ndarray]:
+    """(outputs, 13) coef derivatives and (outputs,) threshold derivatives of a profile's rows."""
+    values = np.array(profile._values)
+    present = np.abs(values) > 1e-5
+    effective = np.array([abs(c) >= 1e-5 for c in coef._values])
+    # A non-effective entry still to come is drawn uniformly among the absent ones.
+    num_none = NUM_ENTRIES - profile.level // 5 - int((effective & ~present).sum())
+    expected_values = np.array([float(v @ p) for v, p in stat.data])
+    none_share = np.where(~effective & ~present, expected_values / num_none if num_none > 0 else 0.0, 0.0)
+    coef_grad = values * rows[:, SENS_DS, None] + np.where(effective, rows[:, SENS_DC:SENS_DNONE], 0.0) \
+        + none_share * rows[:, SENS_DNONE, None]
+    return coef_grad, -rows[:, SENS_DS]
+
+def _expected_scores(levels: np.ndarray, values: np.ndarray, masks: np.ndarray, coef: EntryCoef, stat: StatTable) -> np.ndarray:
+    coef_values = np.array(coef._values)
+    expected_values = np.array([float(v @ p) for v, p in stat.data])
+    present = (masks[:, None] & _ENTRY_BITS) != 0
+    remain_slots = (25 - levels) // 5
+    num_possible = NUM_ENTRIES - present.sum(axis=1)
+    scores = values @ coef_values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        extra = np.where(present, 0.0, expected_values * coef_values).sum(axis=1) * remain_slots / num_possible
+    return scores + np.where(num_possible == 0, 0.0, extra)
+
+def _check_profiles(profiles) -> np.ndarray:
+    profiles = np.ascontiguousarray(profiles, dtype=np.float64)
+    if profiles.ndim != 2 or profiles.shape[1] != NUM_ENTRIES + 1:
+        raise RuntimeError(f"profiles must be an (N, {NUM_ENTRIES + 1}) array")
+    return profiles
+
+def prob_above_score(profile: EchoProfile, coef: EntryCoef, threshold: float, locked_keys: list, stat_data) -> float:
+    stat = _stat_table(stat_data)
+    masks, bins = _profile_bins(np.array([profile._values]), coef)
+    return float(_reach_probs_of(coef, stat, np.array([profile.level]), masks, bins,
+        _threshold_score_bin(threshold), _locked_mask_of(locked_keys))[0])
+
+def score_distribution(profile: EchoProfile, coef: EntryCoef, locked_keys: list, stat_data) -> tuple[np.ndarray, np.ndarray]:
+    """Final score distribution of a profile as (scores, probabilities), restricted to reachable scores."""
+    stat = _stat_table(stat_data)
+    masks, bins = _profile_bins(np.array([profile._values]), coef)
+    stage = profile.level // 5
+    graph, idx = _locate(coef, stat, stage, int(masks[0]) & coef._effective_mask, int(bins[0]))
+
+    # Push the probability mass of the profile forward to the last stage.
+    mass = np.zeros(len(graph.keys[stage]))
+    mass[idx] = 1.0
+    for s in range(stage, 5):
+        mass = np.bincount(graph.children[s], weights=mass[graph.parents[s]] * graph.probs[s], minlength=len(graph.keys[s + 1]))
+
+    locked_mask = _locked_mask_of(locked_keys) & graph.effective_mask
+    keep = ((graph.masks[5] & locked_mask) == locked_mask) & (mass > 0.0)
+    final_bins, inverse = np.unique(graph.bins[5][keep], return_inverse=True)
+    pmf = np.bincount(inverse.ravel(), weights=mass[keep], minlength=len(final_bins))
+    return final_bins / SCORE_BIN_SCALE, pmf
+
+def get_statistics(profile: EchoProfile, coef: EntryCoef, score_thres: float, locked_keys: list, scheduler: DiscardScheduler, stat_data) -> Result:
+    stat = _stat_table(stat_data)
+    # Entries that do not count are ignored, as in _get_statistics_internal.
+    effective = np.array([abs(c) >= 1e-5 for c in coef._values])
+    masks, bins = _profile_bins(np.where(effective, profile._values, 0.0)[None, :], coef)
+    return Result(*_statistics_of(coef, stat, profile.level, int(masks[0]), int(bins[0]),
+        _threshold_score_bin(score_thres), _locked_mask_of(locked_keys), scheduler))
+
+def _check_bandwidth(bandwidth: float):
+    if not bandwidth > 0.0:
+        raise ValueError("bandwidth must be positive")
+
+def prob_above_score_gradient(profile: EchoProfile, coef: EntryCoef, threshold: float, locked_keys: list, stat_data, bandwidth: float = 0.5) -> dict:
+    """prob_above_score with its derivatives with respect to the coef weights and the threshold."""
+    _check_bandwidth(bandwidth)
+    stat = _stat_table(stat_data)
+    masks, bins = _profile_bins(np.array([profile._values]), coef)
+    rows = _sensitivity_of(coef, stat, profile.level, int(masks[0]) & coef._effective_mask, int(bins[0]),
+        _threshold_score_bin(threshold), _locked_mask_of(locked_keys), None, bandwidth)
+    coef_grad, thres_grad = _sensitivity_gradient(rows, profile, coef, stat)
+    return {
+        "value": prob_above_score(profile, coef, threshold, locked_keys, stat),
+        "coef": coef_grad[0],
+        "threshold": float(thres_grad[0]),
+    }
+
+def get_statistics_gradient(profile: EchoProfile, coef: EntryCoef, score_thres: float, locked_keys: list, scheduler: DiscardScheduler, stat_data, bandwidth: float = 0.5) -> dict:
+    """get_statistics with its derivatives with respect to the coef weights and the threshold."""
+    _check_bandwidth(bandwidth)
+    stat = _stat_table(stat_data)
+    effective = np.array([abs(c) >= 1e-5 for c in coef._values])
+    masks, bins = _profile_bins(np.where(effective, profile._values, 0.0)[None, :], coef)
+    rows = _sensitivity_of(coef, stat, profile.level, int(masks[0]), int(bins[0]),
+        _threshold_score_bin(score_thres), _locked_mask_of(locked_keys), tuple(scheduler.thresholds), bandwidth)
+    coef_grad, thres_grad = _sensitivity_gradient(rows, profile, coef, stat)
+    result = get_statistics(profile, coef, score_thres, locked_keys, scheduler, stat)
+    return {
+        "value": np.array([result.prob_above_threshold_with_discard, result.expected_wasted_exp, result.expected_wasted_tuner]),
+        "coef": coef_grad,
+        "threshold": thres_grad,
+    }
+
+def analyze_profiles(profiles, coef: EntryCoef, score_thres: float, locked_keys: list, scheduler: DiscardScheduler, stat_data) -> dict:
+    """Batched score, probability and statistics for an (N, 14) profile array."""
+    profiles = _check_profiles(profiles)
+    stat = _stat_table(stat_data)
+    locked_mask = _locked_mask_of(locked_keys)
+    thres_bin = _threshold_score_bin(score_thres)
+    levels = profiles[:, 0].astype(np.int64)
+    values = profiles[:, 1:]
+    masks, bins = _profile_bins(values, coef)
+    effective = np.array([abs(c) >= 1e-5 for c in coef._values])
+    effective_masks, effective_bins = _profile_bins(np.where(effective, values, 0.0), coef)
+
+    statistics = np.array([
+        _statistics_of(coef, stat, int(level), int(mask), int(score_bin), thres_bin, locked_mask, scheduler)
+        for level, mask, score_bin in zip(levels, effective_masks, effective_bins)
+    ]).reshape(len(profiles), 3)
+    return {
+        "score": values @ np.array(coef._values),
+        "expected_score": _expected_scores(levels, values, masks, coef, stat),
+        "prob_above_threshold": _reach_probs_of(coef, stat, levels, masks, bins, thres_bin, locked_mask),
+        "prob_above_threshold_with_discard": statistics[:, 0],
+        "expected_wasted_exp": statistics[:, 1],
+        "expected_wasted_tuner": statistics[:, 2],
+    }
+
+def evaluate_coefs(profiles, coefs, score_thres, locked_keys: list, stat_data, num_threads: int = 0) -> dict:
+    """Score, expected score and probability of an (N, 14) profile array under a (C, 13) coef array."""
+    profiles = _check_profiles(profiles)
+    coefs = np.ascontiguousarray(coefs, dtype=np.float64)
+    if coefs.ndim != 2 or coefs.shape[1] != NUM_ENTRIES:
+        raise RuntimeError(f"coefs must be a (C, {NUM_ENTRIES}) array")
+    score_thres = np.ascontiguousarray(score_thres, dtype=np.float64).ravel()
+    if len(score_thres) != len(coefs):
+        raise RuntimeError("score_thres must have one threshold per coef")
+    stat = _stat_table(stat_data)
+    locked_mask = _locked_mask_of(locked_keys)
+    levels = profiles[:, 0].astype(np.int64)
+    values = profiles[:, 1:]
+
+    n, c = len(profiles), len(coefs)
+    score, expected_score, prob = np.empty((n, c)), np.empty((n, c)), np.empty((n, c))
+    for j in range(c):
+        coef = EntryCoef(coefs[j].tolist())
+        masks, bins = _profile_bins(values, coef)
+        score[:, j] = values @ coefs[j]
+        expected_score[:, j] = _expected_scores(levels, values, masks, coef, stat)
+        prob[:, j] = _reach_probs_of(coef, stat, levels, masks, bins, _threshold_score_bin(score_thres[j]), locked_mask)
+    return {"score": score, "expected_score": expected_score, "prob_above_threshold": prob}
+
+_example_cache = OrderedDict()
+_example_index_cache = OrderedDict()
+
+def _get_example_table(coef: EntryCoef, stat: StatTable) -> list[dict]:
+    """Example profiles per stage as {score rounded to 0.1: (level, values)}, as in get_example_table."""
+    def build():
+        logs = [np.log(probs) for _, probs in stat.data]
+
+        def score_key(values):
+            total = 0.0
+            for v, c in zip(values, coef._values):
+                total += v * c
+            return _round_half_away(total * 10) / 10.0
+
+        table = [dict() for _ in range(5)]
+        # Log-probability of every entry of a stored profile, so significances sum in entry order.
+        entry_logs = [dict() for _ in range(5)]
+        significance = [dict() for _ in range(5)]
+        table[0][0.0] = (0, (0.0,) * NUM_ENTRIES)
+        entry_logs[0][0.0] = (0.0,) * NUM_ENTRIES
+        for i in range(4):
+            for key in sorted(table[i]):
+                _, values = table[i][key]
+                logs_of = entry_logs[i][key]
+                for key_idx in range(NUM_ENTRIES):
+                    if abs(values[key_idx]) > 1e-5:
+                        continue
+                    entry_values, _ = stat.data[key_idx]
+                    for value, log_p in zip(entry_values.tolist(), logs[key_idx].tolist()):
+                        new_values = values[:key_idx] + (value,) + values[key_idx + 1:]
+                        new_logs = logs_of[:key_idx] + (log_p if abs(value) > 1e-5 else 0.0,) + logs_of[key_idx + 1:]
+                        stat_sig = 0.0
+                        for log_v in new_logs:
+                            stat_sig += log_v
+                        score_rounded = score_key(new_values)
+                        if score_rounded not in significance[i + 1] or significance[i + 1][score_rounded] < stat_sig:
+                            significance[i + 1][score_rounded] = stat_sig
+                            table[i + 1][score_rounded] = ((i + 1) * 5, new_values)
+                            entry_logs[i + 1][score_rounded] = new_logs
+        return [{key: stage[key] for key in sorted(stage)} for stage in table]
+    return _cached(_example_cache, coef._key, build)
+
+def _get_example_index(coef: EntryCoef, score_thres: float, locked_mask: int, stat: StatTable) -> tuple:
+    """Example profiles of every stage sorted by their reach probability; rebuilt when the table is replaced."""
+    table = _get_example_table(coef, stat)
+    key = (coef._key, score_thres, locked_mask)
+    with _cache_lock:
+        cached = _example_index_cache.get(key)
+    if cached is not None and cached[0] is table:
+        return cached
+
+    stages = []
+    for stage in table:
+        profiles = list(stage.values())
+        if not profiles:
+            stages.append((np.zeros(0), []))
+            continue
+        levels = np.array([level for level, _ in profiles])
+        masks, bins = _profile_bins(np.array([values for _, values in profiles]), coef)
+        probs = _reach_probs_of(coef, stat, levels, masks, bins, _threshold_score_bin(score_thres), locked_mask)
+        order = np.argsort(probs, kind="stable")
+        stages.append((probs[order], [profiles[i] for i in order]))
+    index = (table, stages)
+    with _cache_lock:
+        _example_index_cache[key] = index
+        _example_index_cache.move_to_end(key)
+        while len(_example_index_cache) > 20:
+            _example_index_cache.popitem(last=False)
+    return index
+
+def get_example_profile_above_threshold(level: int, prob_above_threshold: float, coef: EntryCoef, score_thres: float, locked_keys: list, stat_data) -> EchoProfile:
+    """Get an example profile with a similar probability to reach the threshold."""
+    if level < 0 or level // 5 >= 5:
+        return EchoProfile()
+    _, stages = _get_example_index(coef, score_thres, _locked_mask_of(locked_keys), _stat_table(stat_data))
+    probs, profiles = stages[level // 5]
+    # The profile with the smallest probability that is still at least the requested one.
+    i = int(np.searchsorted(probs, prob_above_threshold, side="left"))
+    return EchoProfile() if i == len(profiles) else EchoProfile(*profiles[i])
+
+class _SchedulerSolver:
+    """Port of SchedulerSolver in profile.cpp. Resources are (num_echo, exp, tuner) rows over
+    the states of a stage. Finished states cost nothing, so the sweeps skip every edge from
+    or to one of them; adding their zeros would not change any sum."""
+
+    MAX_REFINEMENT_PASSES = 1000
+
+    def __init__(self, num_echo_weight: float, exp_weight: float, tuner_weight: float, coef: EntryCoef, score_thres: float, locked_mask: int, stat: StatTable):
+        self.coef, self.score_thres, self.locked_mask, self.stat = coef, score_thres, locked_mask, stat
+        self.graph = _get_graph(coef, stat)
+        thres_bin = _threshold_score_bin(score_thres)
+        self.finished = [self.graph.finished(stage, thres_bin, locked_mask) for stage in range(6)]
+        self.discards = [np.zeros(len(self.graph.keys[stage]), dtype=bool) for stage in range(6)]
+        self.active_edges = []
+        for stage in range(5):
+            parents, children, probs = self.graph.edges(stage)
+            active = ~self.finished[stage][parents] & ~self.finished[stage + 1][children]
+            self.active_edges.append((parents[active], children[active], probs[active]))
+        self.set_weights(num_echo_weight, exp_weight, tuner_weight)
+
+    def set_weights(self, num_echo_weight: float, exp_weight: float, tuner_weight: float):
+        sum_weights = num_echo_weight + exp_weight + tuner_weight
+        self.num_echo_weight = num_echo_weight / sum_weights
+        self.exp_weight = exp_weight / sum_weights
+        self.tuner_weight = tuner_weight / sum_weights
+
+    def score(self, resource):
+        return self.num_echo_weight * 10 * resource[0] + self.exp_weight / 1200 * resource[1] + self.tuner_weight * resource[2]
+
+    def solve_bisection(self, iterations: int) -> SchedulerSolution:
+        solution = SchedulerSolution("bisection")
+        table = _statistics_table(self.graph, _threshold_score_bin(self.score_thres), self.locked_mask, (0.0,) * 4)
+        prob, exp, tuner = table[0][:, 0]
+        if prob <= 0.0:
+            return solution
+
+        current = np.array([1.0 / prob - 1, exp / prob, tuner / prob])
+        stop_thres = 1e-4
+        lower, upper = np.zeros(3), current
+        for i in range(iterations + self.MAX_REFINEMENT_PASSES):
+            if i < iterations:
+                current = (lower + upper) * 0.5
+            after = self.improve(current)
+            score_after, score_current = self.score(after), self.score(current)
+            solution.iterations = i + 1
+            solution.residual = float(abs(score_after - score_current))
+            if score_after >= score_current:
+                lower = current
+            else:
+                upper = current
+            if i >= iterations:
+                if solution.residual < stop_thres:
+                    break
+                current = current + (after - current) * 7
+
+        solution.scheduler = self.extract_scheduler()
+        solution.expected_resource = tuple(float(v) for v in current)
+        return solution
+
+    def solve_dinkelbach(self, max_iterations: int, initial_ratio=None) -> SchedulerSolution:
+        solution = SchedulerSolution("dinkelbach")
+        if initial_ratio is not None:
+            ratio = np.asarray(initial_ratio, dtype=np.float64)
+        else:
+            cost, restart_prob = self.evaluate(True)
+            if restart_prob >= 1.0:
+                return solution
+            ratio = cost * (1.0 / (1.0 - restart_prob))
+        for i in range(max_iterations):
+            value = self.improve(ratio)
+            solution.iterations = i + 1
+            solution.residual = float(abs(self.score(ratio) - self.score(value)))
+            if solution.residual <= 1e-12 * max(1.0, self.score(ratio)):
+                break
+            cost, restart_prob = self.evaluate(False)
+            if restart_prob >= 1.0:
+                break
+            ratio = cost * (1.0 / (1.0 - restart_prob))
+
+        solution.scheduler = self.extract_scheduler()
+        solution.expected_resource = tuple(float(v) for v in ratio)
+        return solution
+
+    def improve(self, restart: np.ndarray) -> np.ndarray:
+        graph = self.graph
+        resources = np.where(self.finished[5], 0.0, (restart + np.array([1.0, _ECHO_EXP[25], 50.0]))[:, None])
+        for stage in range(4, -1, -1):
+            level = stage * 5
+            resource_if_discard = np.array([1.0, _ECHO_EXP[level], level // 5 * 10]) + restart
+            result = graph.expectation(stage, resources, self.active_edges[stage])
+            discard = (self.score(result) > self.score(resource_if_discard)) & ~self.finished[stage]
+            self.discards[stage] = discard
+            result[:, discard] = resource_if_discard[:, None]
+            resources = result
+        return resources[:, 0]
+
+    def evaluate(self, never_discard: bool) -> tuple[np.ndarray, float]:
+        """Expected resources of one echo and the probability of starting over, swept as
+        (num_echo, exp, tuner, restart) rows."""
+        graph = self.graph
+        values = np.where(self.finished[5], 0.0, np.array([[1.0], [_ECHO_EXP[25]], [50.0], [1.0]]))
+        for stage in range(4, -1, -1):
+            level = stage * 5
+            values = graph.expectation(stage, values, self.active_edges[stage])
+            if not never_discard:
+                values[:, self.discards[stage]] = [[1.0], [_ECHO_EXP[level]], [level // 5 * 10], [1.0]]
+        return values[:3, 0], float(values[3, 0])
+
+    def extract_scheduler(self) -> DiscardScheduler:
+        reach = _reach_probs(self.graph, _threshold_score_bin(self.score_thres), self.locked_mask)
+        thresholds = [1.0] * 4
+        for stage in range(1, 5):
+            kept = ~(self.finished[stage] | self.discards[stage])
+            if kept.any():
+                thresholds[stage - 1] = min(1.0, float(reach[stage][kept].min()))
+        return DiscardScheduler(thresholds)
+
+def _solve_optimal_scheduler_internal(num_echo_weight, exp_weight, tuner_weight, coef, score_thres, locked_mask, stat, method, iterations) -> SchedulerSolution:
+    start = time.perf_counter()
+    solver = _SchedulerSolver(num_echo_weight, exp_weight, tuner_weight, coef, score_thres, locked_mask, stat)
+    if method == "dinkelbach":
+        solution = solver.solve_dinkelbach(max(iterations, 1))
+    elif method == "bisection":
+        solution = solver.solve_bisection(iterations)
+    else:
+        raise ValueError(f"Unknown scheduler method: {method}")
+    solution.wall_time = time.perf_counter() - start
+    return solution
+
+def solve_optimal_scheduler(
+    num_echo_weight: float, exp_weight: float, tuner_weight: float, coef: EntryCoef, score_thres: float, locked_keys: list, stat_data,
+    method: str = "dinkelbach", iterations: int = 20, num_threads: int = 0
+) -> SchedulerSolution:
+    """Optimal discard scheduler with solver diagnostics."""
+    return _solve_optimal_scheduler_internal(num_echo_weight, exp_weight, tuner_weight, coef, score_thres,
+        _locked_mask_of(locked_keys), _stat_table(stat_data), method, iterations)
+
+def get_optimal_scheduler(
+    num_echo_weight: float, exp_weight: float, tuner_weight: float, coef: EntryCoef, score_thres: float, locked_keys: list, stat_data,
+    iterations: int = 20, num_threads: int = 0
+) -> DiscardScheduler:
+    return _solve_optimal_scheduler_internal(num_echo_weight, exp_weight, tuner_weight, coef, score_thres,
+        _locked_mask_of(locked_keys), _stat_table(stat_data), "bisection", iterations).scheduler
+
+def solve_scheduler_sweep(weights, coef: EntryCoef, score_thres: float, locked_keys: list, stat_data, iterations: int = 20, num_threads: int = 0) -> list[SchedulerSolution]:
+    """Optimal schedulers for an (N, 3) array of (num_echo, exp, tuner) weights, warm-started like the C++ sweep."""
+    weights = np.ascontiguousarray(weights, dtype=np.float64)
+    if weights.ndim != 2 or weights.shape[1] != 3:
+        raise RuntimeError("weights must have shape (N, 3)")
+    stat = _stat_table(stat_data)
+    locked_mask = _locked_mask_of(locked_keys)
+    solutions = []
+    solver = None
+    for row in weights:
+        start = time.perf_counter()
+        if solver is None:
+            solver = _SchedulerSolver(*row, coef, score_thres, locked_mask, stat)
+        else:
+            solver.set_weights(*row)
+        previous = solutions[-1] if solutions and solutions[-1].iterations > 0 else None
+        solution = solver.solve_dinkelbach(max(iterations, 1), previous.expected_resource if previous else None)
+        solution.wall_time = time.perf_counter() - start
+        solutions.append(solution)
+    return solutions
+
+# Hooks for the persistent solver cache, with the array layouts of profile.cpp so that
+# cache entries can be shared between both backends.
+
+def _memo_keys(stage: int, masks: np.ndarray, bins: np.ndarray) -> np.ndarray:
+    return np.uint64(stage * 5) | (masks.astype(np.uint64) << np.uint64(5)) | (bins.astype(np.int32).view(np.uint32).astype(np.uint64) << np.uint64(32))
+
+def export_statistics_table(coef: EntryCoef, score_thres: float, locked_keys: list, scheduler: DiscardScheduler, stat_data) -> tuple[np.ndarray, np.ndarray]:
+    """Export the statistics memo table as (keys, values)."""
+    stat = _stat_table(stat_data)
+    graph = _get_graph(coef, stat)
+    table = _statistics_table(graph, _threshold_score_bin(score_thres), _locked_mask_of(locked_keys), tuple(scheduler.thresholds))
+    keys = np.concatenate([_memo_keys(stage, graph.masks[stage], graph.bins[stage]) for stage in range(6)])
+    return keys, np.ascontiguousarray(np.concatenate(table, axis=1).T)
+
+def load_statistics_table(coef: EntryCoef, score_thres: float, locked_keys: list, scheduler: DiscardScheduler, keys, values, stat_data):
+    """Seed the statistics memo table from (keys, values)."""
+    keys = np.asarray(keys, dtype=np.uint64)
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2 or values.shape[1] != 3 or len(values) != keys.size:
+        raise RuntimeError("statistics table must be keys (N,) and values (N, 3)")
+    graph = _get_graph(coef, _stat_table(stat_data))
+    if keys.size != sum(len(k) for k in graph.keys):
+        raise RuntimeError("statistics table does not match the upgrade graph")
+
+    levels = (keys & np.uint64(0x1f)).astype(np.int64)
+    masks = ((keys >> np.uint64(5)) & np.uint64(0x1fff)).astype(np.int64)
+    bins = (keys >> np.uint64(32)).astype(np.uint32).view(np.int32).astype(np.int64)
+    table = [np.zeros((3, len(graph.keys[stage]))) for stage in range(6)]
+    for stage in range(6):
+        rows = np.flatnonzero(levels == stage * 5)
+        idx = graph.find(stage, masks[rows], bins[rows])
+        if (idx < 0).any():
+            raise RuntimeError("statistics table does not match the upgrade graph")
+        table[stage][:, idx] = values[rows].T
+    if np.count_nonzero(levels % 5) > 0:
+        raise RuntimeError("statistics table does not match the upgrade graph")
+
+    key = (_threshold_score_bin(score_thres), _locked_mask_of(locked_keys), tuple(scheduler.thresholds))
+    with _cache_lock:
+        graph.statistics_cache[key] = table
+        graph.statistics_cache.move_to_end(key)
+        while len(graph.statistics_cache) > 20:
+            graph.statistics_cache.popitem(last=False)
+
+def export_reach_prob_table(coef: EntryCoef, score_thres: float, locked_keys: list, stat_data) -> tuple[np.ndarray, np.ndarray]:
+    """Export the reach probability table as (states, probs) for stages 0 to 4."""
+    graph = _get_graph(coef, _stat_table(stat_data))
+    reach = _reach_probs(graph, _threshold_score_bin(score_thres), _locked_mask_of(locked_keys))
+    states = np.concatenate([
+        np.uint64(stage) | (graph.masks[stage].astype(np.uint64) << np.uint64(3))
+        | (graph.bins[stage].astype(np.int32).view(np.uint32).astype(np.uint64) << np.uint64(32))
+        for stage in range(5)
+    ])
+    return states, np.concatenate(reach[:5])
+
+def load_reach_prob_table(coef: EntryCoef, score_thres: float, locked_keys: list, states, probs, stat_data):
+    """Seed the reach probability table from (states, probs).
+
+    Reach probabilities take a single sweep here, so the table is only seeded when the
+    states cover the whole graph and is otherwise recomputed on first use.
+    """
+    states = np.asarray(states, dtype=np.uint64)
+    probs = np.asarray(probs, dtype=np.float64)
+    if probs.ndim != 1 or probs.size != states.size:
+        raise RuntimeError("reach probability table must be states (N,) and probs (N,)")
+    graph = _get_graph(coef, _stat_table(stat_data))
+    stages = (states & np.uint64(0x7)).astype(np.int64)
+    masks = ((states >> np.uint64(3)) & np.uint64(0x1fff)).astype(np.int64)
+    bins = (states >> np.uint64(32)).astype(np.uint32).view(np.int32).astype(np.int64)
+
+    thres_bin = _threshold_score_bin(score_thres)
+    locked_mask = _locked_mask_of(locked_keys) & graph.effective_mask
+    reach = [None] * 6
+    reach[5] = graph.finished(5, thres_bin, locked_mask).astype(np.float64)
+    for stage in range(5):
+        rows = np.flatnonzero(stages == stage)
+        idx = graph.find(stage, masks[rows], bins[rows])
+        known = idx >= 0
+        reach[stage] = np.full(len(graph.keys[stage]), np.nan)
+        reach[stage][idx[known]] = probs[rows[known]]
+        if np.isnan(reach[stage]).any():
+            return
+    with _cache_lock:
+        graph.reach_cache[(thres_bin, locked_mask)] = reach
+        graph.reach_cache.move_to_end((thres_bin, locked_mask))
+        while len(graph.reach_cache) > 20:
+            graph.reach_cache.popitem(last=False)
+
+def export_example_table(coef: EntryCoef, stat_data) -> np.ndarray:
+    """Export the example profile table as an (N, 14) array."""
+    table = _get_example_table(coef, _stat_table(stat_data))
+    rows = [[level, *values] for stage in table for level, values in stage.values()]
+    return np.array(rows, dtype=np.float64).reshape(-1, NUM_ENTRIES + 1)
+
+def load_example_table(coef: EntryCoef, profiles):
+    """Replace the example profile table with an (N, 14) array."""
+    profiles = _check_profiles(profiles)
+    table = [dict() for _ in range(5)]
+    for row in profiles.tolist():
+        level = int(row[0])
+        if level < 0 or level > 20:
+            raise RuntimeError("example profile level out of range")
+        values = tuple(row[1:])
+        total = 0.0
+        for v, c in zip(values, coef._values):
+            total += v * c
+        table[level // 5][_round_half_away(total * 10) / 10.0] = (level, values)
+    table = [{key: stage[key] for key in sorted(stage)} for stage in table]
+    with _cache_lock:
+        _example_cache[coef._key] = table
+        _example_cache.move_to_end(coef._key)
+        while len(_example_cache) > 20:
+            _example_cache.popitem(last=False)
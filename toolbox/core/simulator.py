@@ -0,0 +1,521 @@
+import time
+import numpy as np
+
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Callable, Union
+from toolbox.utils.logger import logger
+from .profile import ECHO_EXP, EchoProfile, EntryCoef, DiscardScheduler, profile_cpp, stat_data, stat_table
+
+NUM_ENTRIES = len(profile_cpp.ENTRY_KEYS)
+# Scores are compared in the same fixed-point bins as the backend.
+SCORE_BIN_SCALE = 20.0
+# Tuners spent on every upgrade by 5 levels.
+TUNER_PER_UPGRADE = 10
+MAX_LEVEL = 25
+
+# A policy receives the level (a single int when all echoes share it), entry mask and
+# score bin of a batch of echoes and returns True for every echo that should be discarded.
+# It is consulted at levels 5, 10, 15 and 20 (and at the starting level) for echoes that
+# have not reached the threshold yet.
+Policy = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+def _score_bin(value, coef_value):
+    # std::lround: halves are rounded away from zero.
+    x = np.asarray(value, dtype=np.float64) * coef_value * SCORE_BIN_SCALE
+    return (np.sign(x) * np.floor(np.abs(x) + 0.5)).astype(np.int32)
+
+def threshold_score_bin(threshold: float) -> int:
+    return int(np.ceil(threshold * SCORE_BIN_SCALE - 1e-9))
+
+def locked_mask_of(locked_keys: list) -> int:
+    mask = 0
+    for key in locked_keys:
+        mask |= 1 << profile_cpp.ENTRY_KEYS.index(key)
+    return mask
+
+class EntrySampler:
+    """Draws new entries of an echo, already converted to score bins under a coef.
+
+    Each entry key gets an alias table over its value distribution, so a value costs one
+    uniform number and two table lookups regardless of the key. Distributions are
+    normalized; entry_stats.yml sums to 1 only up to rounding.
+    """
+
+    def __init__(self, coef: EntryCoef):
+        coef_values = [float(getattr(coef, key)) for key in profile_cpp.ENTRY_KEYS]
+        self.coef_values = np.array(coef_values)
+        width = max(len(stat_data[key]["distribution"]) for key in profile_cpp.ENTRY_KEYS)
+        self.width = width
+        # Tables are flattened to (key * width + column) so every lookup is a 1-d gather.
+        self.bins = np.zeros(NUM_ENTRIES * width, dtype=np.int32)
+        self.accept = np.ones(NUM_ENTRIES * width, dtype=np.float64)
+        self.alias = np.arange(NUM_ENTRIES * width)
+
+        for i, key in enumerate(profile_cpp.ENTRY_KEYS):
+            dist = stat_data[key]["distribution"]
+            values = np.array([entry["value"] for entry in dist], dtype=np.float64)
+            probs = np.zeros(width)
+            probs[:len(dist)] = [entry["probability"] for entry in dist]
+            row = slice(i * width, (i + 1) * width)
+            self.bins[i * width:i * width + len(dist)] = _score_bin(values, coef_values[i])
+            accept, alias = self._alias_table(probs / probs.sum())
+            self.accept[row], self.alias[row] = accept, alias + i * width
+
+    @staticmethod
+    def _alias_table(probs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Vose's alias method.
+        n = len(probs)
+        scaled = probs * n
+        accept = np.ones(n)
+        alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            accept[s], alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        return accept, alias
+
+    def profile_state(self, profile: EchoProfile) -> tuple[int, int]:
+        """Entry mask and score bin of a profile, as used by the backend."""
+        mask, score_bin = 0, 0
+        for i, key in enumerate(profile_cpp.ENTRY_KEYS):
+            value = float(getattr(profile, key))
+            if abs(value) > 1e-5:
+                mask |= 1 << i
+                score_bin += int(_score_bin(value, self.coef_values[i]))
+        return mask, score_bin
+
+    def draw(self, mask: np.ndarray, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+        """Draw one new entry for every echo, uniformly among the keys it does not have yet.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The drawn key index and its score bin per echo.
+        """
+        u = rng.random(len(mask)) * NUM_ENTRIES
+        key = u.astype(np.int32)
+        taken = np.flatnonzero((mask >> key) & 1)
+        while len(taken):
+            u[taken] = rng.random(len(taken)) * NUM_ENTRIES
+            key[taken] = u[taken].astype(np.int32)
+            taken = taken[((mask[taken] >> key[taken]) & 1) == 1]
+
+        # What is left of the uniform number after picking the key is uniform again and picks the value.
+        x = (u - key) * self.width
+        col = x.astype(np.intp)
+        slot = key * self.width + col
+        slot = np.where(x - col < self.accept[slot], slot, self.alias[slot])
+        return key, self.bins[slot]
+
+class SchedulerPolicy:
+    """The reach-probability rule of a DiscardScheduler as a vectorized policy.
+
+    Reach probabilities come from the backend table of the same coef, threshold and locked
+    keys. Only states reachable from an empty echo are known; pass the starting profile of
+    a simulation so that the states below it are solved as well.
+    """
+
+    def __init__(
+        self,
+        coef: EntryCoef,
+        score_thres: float,
+        scheduler: DiscardScheduler,
+        locked_keys: list = None,
+        start_profile: EchoProfile = None
+    ):
+        if locked_keys is None:
+            locked_keys = []
+        if start_profile is not None and start_profile.level < MAX_LEVEL:
+            # Solving the statistics of the profile fills the reach probability of every
+            # state below it into the backend table, which the export then includes.
+            start_profile.get_statistics(coef, score_thres, scheduler, locked_keys)
+        states, probs = profile_cpp.export_reach_prob_table(coef.to_cpp(), score_thres, locked_keys, stat_table)
+        states = np.asarray(states, dtype=np.uint64)
+        self.thresholds = np.array([0.0, scheduler.level_5_9, scheduler.level_10_14, scheduler.level_15_19, scheduler.level_20_24, 0.0])
+
+        # The backend keys states by (stage, effective mask, score bin). They are laid out in
+        # a dense table instead, indexed by the stage, the effective entries packed into the
+        # low bits and the score bin, so a lookup is a single gather.
+        effective_keys = [i for i, key in enumerate(profile_cpp.ENTRY_KEYS) if abs(getattr(coef, key)) >= 1e-5]
+        masks = np.arange(1 << NUM_ENTRIES)
+        self.packed_mask = np.zeros(1 << NUM_ENTRIES, dtype=np.int64)
+        for j, i in enumerate(effective_keys):
+            self.packed_mask |= ((masks >> i) & 1) << j
+        self.num_masks = 1 << len(effective_keys)
+
+        stage = (states & np.uint64(0x7)).astype(np.int64)
+        mask = (states >> np.uint64(3)).astype(np.int64) & ((1 << NUM_ENTRIES) - 1)
+        score_bin = (states >> np.uint64(32)).astype(np.uint32).view(np.int32).astype(np.int64)
+        self.min_bin = int(score_bin.min()) if len(states) else 0
+        self.num_bins = int(score_bin.max()) - self.min_bin + 1 if len(states) else 1
+        # Unknown states are never discarded.
+        self.table = np.ones(6 * self.num_masks * self.num_bins)
+        self.table[self._index(stage, mask, score_bin)] = probs
+
+    def _index(self, stage: np.ndarray, mask: np.ndarray, score_bin: np.ndarray) -> np.ndarray:
+        return (stage * self.num_masks + self.packed_mask[mask]) * self.num_bins + (score_bin - self.min_bin)
+
+    def reach_prob(self, level: np.ndarray, mask: np.ndarray, score_bin: np.ndarray) -> np.ndarray:
+        offset = np.asarray(score_bin, dtype=np.int64) - self.min_bin
+        known = (offset >= 0) & (offset < self.num_bins)
+        index = self._index(np.asarray(level) // 5, np.asarray(mask), np.clip(offset, 0, self.num_bins - 1) + self.min_bin)
+        return np.where(known, self.table[index], 1.0)
+
+    def __call__(self, level: np.ndarray, mask: np.ndarray, score_bin: np.ndarray) -> np.ndarray:
+        thresholds = self.thresholds[np.asarray(level) // 5]
+        if np.ndim(level) == 0:
+            if thresholds <= 0.0:
+                return np.zeros(len(mask), dtype=bool)
+            return self.reach_prob(level, mask, score_bin) < thresholds
+        discard = np.zeros(len(mask), dtype=bool)
+        check = np.flatnonzero(thresholds > 0.0)
+        if len(check):
+            discard[check] = self.reach_prob(level[check], mask[check], score_bin[check]) < thresholds[check]
+        return discard
+
+class ScorePolicy:
+    """Discard an echo whose current score is below a minimum score for its level bracket.
+
+    Unlike a DiscardScheduler this ignores which entries are still missing, so the exact
+    solvers cannot express it.
+    """
+
+    def __init__(self, level_5_9: float = 0.0, level_10_14: float = 0.0, level_15_19: float = 0.0, level_20_24: float = 0.0):
+        min_scores = [level_5_9, level_10_14, level_15_19, level_20_24]
+        self.min_bins = np.array([np.iinfo(np.int32).min] + [threshold_score_bin(s) for s in min_scores] + [np.iinfo(np.int32).min])
+
+    def __call__(self, level: np.ndarray, mask: np.ndarray, score_bin: np.ndarray) -> np.ndarray:
+        return score_bin < self.min_bins[np.asarray(level) // 5]
+
+def _as_policy(policy, coef: EntryCoef, score_thres: float, locked_keys: list, start_profile: EchoProfile = None) -> Policy:
+    if policy is None:
+        return lambda level, mask, score_bin: np.zeros(len(mask), dtype=bool)
+    if isinstance(policy, DiscardScheduler):
+        return SchedulerPolicy(coef, score_thres, policy, locked_keys, start_profile)
+    return policy
+
+def _wilson_interval(successes: int, n: int, z: float) -> tuple[float, float]:
+    if n == 0:
+        return (0.0, 1.0)
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return (float(max(0.0, center - half)), float(min(1.0, center + half)))
+
+class _MeanAccumulator:
+    def __init__(self):
+        self.n, self.total, self.total_sq = 0, 0.0, 0.0
+
+    def add(self, values: np.ndarray):
+        self.n += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    def interval(self, z: float) -> tuple[float, float]:
+        if self.n < 2:
+            return (self.mean(), self.mean())
+        mean = self.mean()
+        var = max(0.0, (self.total_sq - self.n * mean * mean) / (self.n - 1))
+        half = z * np.sqrt(var / self.n)
+        return (float(mean - half), float(mean + half))
+
+@dataclass
+class SimulationResult:
+    # Number of simulated echoes.
+    num_echoes: int
+    # Number of simulated upgrades by 5 levels over all echoes.
+    num_tunings: int
+    # Fraction of echoes that reached the threshold with the policy applied.
+    prob_above_threshold_with_discard: float
+    # Mean exp spent on echoes that were discarded or missed the threshold, per echo.
+    expected_wasted_exp: float
+    # Mean tuners spent on echoes that were discarded or missed the threshold, per echo.
+    expected_wasted_tuner: float
+    # Confidence intervals of the three estimates above.
+    prob_above_threshold_with_discard_ci: tuple[float, float]
+    expected_wasted_exp_ci: tuple[float, float]
+    expected_wasted_tuner_ci: tuple[float, float]
+    # Seconds spent simulating.
+    wall_time: float
+
+    @property
+    def tunings_per_second(self) -> float:
+        return self.num_tunings / self.wall_time if self.wall_time > 0 else float("inf")
+
+@dataclass
+class CampaignResult:
+    # Number of simulated campaigns. A campaign upgrades new echoes until one reaches the threshold or a budget runs out.
+    num_campaigns: int
+    # Number of simulated upgrades by 5 levels over all campaigns.
+    num_tunings: int
+    # Fraction of campaigns that got an echo above the threshold within the budgets.
+    success_rate: float
+    # Mean number of echoes, exp and tuners spent per campaign, including the successful echo.
+    expected_num_echo: float
+    expected_exp: float
+    expected_tuner: float
+    # Confidence intervals of the four estimates above.
+    success_rate_ci: tuple[float, float]
+    expected_num_echo_ci: tuple[float, float]
+    expected_exp_ci: tuple[float, float]
+    expected_tuner_ci: tuple[float, float]
+    # Seconds spent simulating.
+    wall_time: float
+
+    @property
+    def tunings_per_second(self) -> float:
+        return self.num_tunings / self.wall_time if self.wall_time > 0 else float("inf")
+
+def _simulate_echo_batch(
+    sampler: EntrySampler,
+    start_level: int,
+    start_mask: int,
+    start_bin: int,
+    n: int,
+    thres_bin: int,
+    locked_mask: int,
+    policy: Policy,
+    rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """Upgrade n copies of one echo in lockstep. Mirrors get_statistics in profile_cpp."""
+    success = np.zeros(n, dtype=bool)
+    wasted_exp = np.zeros(n)
+    wasted_tuner = np.zeros(n)
+    lanes = np.arange(n)
+    mask = np.full(n, start_mask, dtype=np.int32)
+    score_bin = np.full(n, start_bin, dtype=np.int32)
+    level = start_level
+    num_tunings = 0
+
+    while len(lanes):
+        finished = (score_bin >= thres_bin) & ((mask & locked_mask) == locked_mask)
+        success[lanes[finished]] = True
+        if level >= MAX_LEVEL:
+            failed = lanes[~finished]
+            wasted_exp[failed] = ECHO_EXP[MAX_LEVEL]
+            wasted_tuner[failed] = MAX_LEVEL // 5 * TUNER_PER_UPGRADE
+            break
+
+        keep = ~finished
+        if level >= 5:
+            discard = keep & policy(level, mask, score_bin)
+            wasted_exp[lanes[discard]] = ECHO_EXP[level]
+            wasted_tuner[lanes[discard]] = level // 5 * TUNER_PER_UPGRADE
+            keep &= ~discard
+        if not keep.all():
+            lanes, mask, score_bin = lanes[keep], mask[keep], score_bin[keep]
+
+        key, add = sampler.draw(mask, rng)
+        mask |= np.int32(1) << key
+        score_bin += add
+        level = (level // 5 + 1) * 5
+        num_tunings += len(lanes)
+
+    return success, wasted_exp, wasted_tuner, num_tunings
+
+def simulate_echoes(
+    profile: EchoProfile,
+    coef: EntryCoef,
+    score_thres: float,
+    policy: Union[DiscardScheduler, Policy, None] = None,
+    locked_keys: list = None,
+    num_echoes: int = 1_000_000,
+    batch_size: int = 1 << 16,
+    confidence: float = 0.95,
+    seed: int = None
+) -> SimulationResult:
+    """Simulate upgrading num_echoes copies of a profile until each is finished, discarded or lv 25.
+
+    With a DiscardScheduler as the policy the estimates converge to EchoProfile.get_statistics.
+
+    Args:
+        policy: A DiscardScheduler, a Policy callable or None to never discard.
+        batch_size: Echoes simulated at once; bounds the memory used.
+        confidence: Level of the reported confidence intervals.
+        seed: Seed of the random generator, for reproducible runs.
+
+    Returns:
+        SimulationResult: Estimates with confidence intervals and throughput.
+    """
+    if locked_keys is None:
+        locked_keys = []
+    start_time = time.perf_counter()
+    sampler = EntrySampler(coef)
+    policy = _as_policy(policy, coef, score_thres, locked_keys, profile)
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    start_mask, start_bin = sampler.profile_state(profile)
+    thres_bin = threshold_score_bin(score_thres)
+    locked_mask = locked_mask_of(locked_keys)
+
+    num_success, num_tunings = 0, 0
+    exp_acc, tuner_acc = _MeanAccumulator(), _MeanAccumulator()
+    for begin in range(0, num_echoes, batch_size):
+        n = min(batch_size, num_echoes - begin)
+        success, wasted_exp, wasted_tuner, tunings = _simulate_echo_batch(
+            sampler, profile.level, start_mask, start_bin, n, thres_bin, locked_mask, policy, rng
+        )
+        num_success += int(success.sum())
+        num_tunings += tunings
+        exp_acc.add(wasted_exp)
+        tuner_acc.add(wasted_tuner)
+
+    return SimulationResult(
+        num_echoes=num_echoes,
+        num_tunings=num_tunings,
+        prob_above_threshold_with_discard=num_success / num_echoes if num_echoes else 0.0,
+        expected_wasted_exp=exp_acc.mean(),
+        expected_wasted_tuner=tuner_acc.mean(),
+        prob_above_threshold_with_discard_ci=_wilson_interval(num_success, num_echoes, z),
+        expected_wasted_exp_ci=exp_acc.interval(z),
+        expected_wasted_tuner_ci=tuner_acc.interval(z),
+        wall_time=time.perf_counter() - start_time
+    )
+
+def simulate_campaigns(
+    coef: EntryCoef,
+    score_thres: float,
+    policy: Union[DiscardScheduler, Policy, None] = None,
+    locked_keys: list = None,
+    exp_budget: float = None,
+    tuner_budget: float = None,
+    echo_budget: int = None,
+    num_campaigns: int = 100_000,
+    confidence: float = 0.95,
+    seed: int = None
+) -> CampaignResult:
+    """Simulate upgrading new echoes one after another until one reaches the threshold.
+
+    A campaign stops without success once the next upgrade would exceed the exp or tuner
+    budget, or once it would need more than echo_budget echoes. At least one budget must be set.
+
+    Returns:
+        CampaignResult: Success rate and resources spent per campaign, with confidence intervals.
+    """
+    if locked_keys is None:
+        locked_keys = []
+    if exp_budget is None and tuner_budget is None and echo_budget is None:
+        raise ValueError("simulate_campaigns needs at least one of exp_budget, tuner_budget or echo_budget")
+    exp_budget = float("inf") if exp_budget is None else exp_budget
+    tuner_budget = float("inf") if tuner_budget is None else tuner_budget
+    echo_budget = np.iinfo(np.int64).max if echo_budget is None else echo_budget
+
+    start_time = time.perf_counter()
+    sampler = EntrySampler(coef)
+    policy = _as_policy(policy, coef, score_thres, locked_keys)
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    thres_bin = threshold_score_bin(score_thres)
+    locked_mask = locked_mask_of(locked_keys)
+    echo_exp = np.array(ECHO_EXP, dtype=np.float64)
+
+    success = np.zeros(num_campaigns, dtype=bool)
+    num_echo_out = np.zeros(num_campaigns)
+    exp_out = np.zeros(num_campaigns)
+    tuner_out = np.zeros(num_campaigns)
+
+    lanes = np.arange(num_campaigns)
+    level = np.zeros(num_campaigns, dtype=np.int32)
+    mask = np.zeros(num_campaigns, dtype=np.int32)
+    score_bin = np.zeros(num_campaigns, dtype=np.int32)
+    num_echo = np.ones(num_campaigns, dtype=np.int64) if echo_budget > 0 else np.zeros(num_campaigns, dtype=np.int64)
+    spent_exp = np.zeros(num_campaigns)
+    spent_tuner = np.zeros(num_campaigns)
+    done = np.full(num_campaigns, echo_budget <= 0)
+    num_tunings = 0
+
+    while True:
+        if done.any():
+            finished_lanes = lanes[done]
+            num_echo_out[finished_lanes] = num_echo[done]
+            exp_out[finished_lanes] = spent_exp[done]
+            tuner_out[finished_lanes] = spent_tuner[done]
+            keep = ~done
+            lanes, level, mask, score_bin = lanes[keep], level[keep], mask[keep], score_bin[keep]
+            num_echo, spent_exp, spent_tuner = num_echo[keep], spent_exp[keep], spent_tuner[keep]
+        if not len(lanes):
+            break
+
+        finished = (score_bin >= thres_bin) & ((mask & locked_mask) == locked_mask)
+        success[lanes[finished]] = True
+        # Echoes that missed the threshold at lv 25 or were discarded make way for a new one.
+        discard = ~finished & (level >= 5) & (level < MAX_LEVEL) & policy(level, mask, score_bin)
+        restart = (~finished & (level >= MAX_LEVEL)) | discard
+        out_of_echoes = restart & (num_echo >= echo_budget)
+        restart &= ~out_of_echoes
+        level[restart], mask[restart], score_bin[restart] = 0, 0, 0
+        num_echo += restart
+
+        upgrade = ~finished & ~out_of_echoes
+        next_level = (level // 5 + 1) * 5
+        cost_exp = echo_exp[np.minimum(next_level, MAX_LEVEL)] - echo_exp[level]
+        affordable = (spent_exp + cost_exp <= exp_budget) & (spent_tuner + TUNER_PER_UPGRADE <= tuner_budget)
+        done = finished | out_of_echoes | (upgrade & ~affordable)
+        upgrade &= affordable
+
+        idx = np.flatnonzero(upgrade)
+        key, add = sampler.draw(mask[idx], rng)
+        mask[idx] |= np.int32(1) << key
+        score_bin[idx] += add
+        spent_exp[idx] += cost_exp[idx]
+        spent_tuner[idx] += TUNER_PER_UPGRADE
+        level[idx] = next_level[idx]
+        num_tunings += len(idx)
+
+    num_success = int(success.sum())
+    accumulators = []
+    for values in (num_echo_out, exp_out, tuner_out):
+        acc = _MeanAccumulator()
+        acc.add(values)
+        accumulators.append(acc)
+    echo_acc, exp_acc, tuner_acc = accumulators
+
+    return CampaignResult(
+        num_campaigns=num_campaigns,
+        num_tunings=num_tunings,
+        success_rate=num_success / num_campaigns if num_campaigns else 0.0,
+        expected_num_echo=echo_acc.mean(),
+        expected_exp=exp_acc.mean(),
+        expected_tuner=tuner_acc.mean(),
+        success_rate_ci=_wilson_interval(num_success, num_campaigns, z),
+        expected_num_echo_ci=echo_acc.interval(z),
+        expected_exp_ci=exp_acc.interval(z),
+        expected_tuner_ci=tuner_acc.interval(z),
+        wall_time=time.perf_counter() - start_time
+    )
+
+def check_statistics(
+    profile: EchoProfile,
+    coef: EntryCoef,
+    score_thres: float,
+    scheduler: DiscardScheduler,
+    locked_keys: list = None,
+    num_echoes: int = 1_000_000,
+    confidence: float = 0.999,
+    seed: int = None
+) -> bool:
+    """Check EchoProfile.get_statistics against a simulation of the same scheduler.
+
+    Returns:
+        bool: Whether all exact values fall into the confidence intervals of the simulation.
+    """
+    if locked_keys is None:
+        locked_keys = []
+    exact = profile.get_statistics(coef, score_thres, scheduler, locked_keys)
+    result = simulate_echoes(profile, coef, score_thres, scheduler, locked_keys, num_echoes, confidence=confidence, seed=seed)
+    intervals = (result.prob_above_threshold_with_discard_ci, result.expected_wasted_exp_ci, result.expected_wasted_tuner_ci)
+    # The backend uses entry_stats.yml without normalization, which moves results by up to ~0.2%.
+    tolerance = [0.0025, 0.0025 * ECHO_EXP[MAX_LEVEL], 0.0025 * (MAX_LEVEL // 5) * TUNER_PER_UPGRADE]
+    ok = all(lo - tol <= value <= hi + tol for value, (lo, hi), tol in zip(exact, intervals, tolerance))
+    (logger.info if ok else logger.warning)(
+        f"get_statistics {tuple(exact)} vs simulation "
+        f"{(result.prob_above_threshold_with_discard, result.expected_wasted_exp, result.expected_wasted_tuner)} "
+        f"({result.num_echoes} echoes, {result.tunings_per_second / 1e6:.1f}M tunings/s)"
+    )
+    return ok
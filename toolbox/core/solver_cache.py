@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from pathlib import Path
+from toolbox.utils.logger import logger
+
+class SolverCache:
+    """On-disk store for solver outputs that survives backend restarts.
+
+    Every entry is a group of .npy files named after a digest of entry_stats.yml and a
+    canonical hash of the inputs that produced it. Editing the stat data invalidates
+    everything at once, and the entries of older stat data are deleted on the next save.
+    The directory is kept under max_bytes by deleting the least recently used entries.
+    Arrays are opened memory-mapped, so loading only touches the pages the backend
+    actually copies into its tables.
+    """
+
+    # kind-digest-key.i.npy; files of the earlier kind-key.i.npy layout have no digest.
+    _FILE_PATTERN = re.compile(r"^(?P<kind>[a-z_]+)-(?:(?P<digest>[0-9a-f]{8})-)?(?P<key>[0-9a-f]{32})\.\d+\.npy$")
+
+    def __init__(self, cache_dir: Path, stat_file: Path, max_synced: int = 20, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        with open(stat_file, "rb") as f:
+            self.stat_digest = hashlib.sha256(f.read()).hexdigest()
+        self.max_bytes = max_bytes
+        # Keys already loaded or saved in this session, bounded like the C++ LRU caches.
+        self.max_synced = max_synced
+        self._synced: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, kind: str, **parts) -> str:
+        payload = json.dumps({"kind": kind, "stat_data": self.stat_digest, **parts}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _paths(self, kind: str, key: str, count: int) -> list[Path]:
+        return [self.cache_dir / f"{kind}-{self.stat_digest[:8]}-{key}.{i}.npy" for i in range(count)]
+
+    def load(self, kind: str, key: str, count: int) -> tuple[np.ndarray, ...] | None:
+        paths = self._paths(kind, key, count)
+        if not all(path.exists() for path in paths):
+            return None
+        try:
+            arrays = tuple(np.load(path, mmap_mode="r") for path in paths)
+            # The modification time orders the entries for prune.
+            for path in paths:
+                os.utime(path)
+            return arrays
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable solver cache entry {kind}-{key}: {e}")
+            return None
+
+    def save(self, kind: str, key: str, *arrays: np.ndarray):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            for path, array in zip(self._paths(kind, key, len(arrays)), arrays):
+                # Write to a temporary file first so a crash never leaves a truncated entry.
+                tmp_path = path.with_suffix(".tmp")
+                with open(tmp_path, "wb") as f:
+                    np.save(f, np.ascontiguousarray(array))
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write solver cache entry {kind}-{key}: {e}")
+            return
+        self.prune(keep=key)
+
+    def prune(self, keep: str = None):
+        """Delete the entries of other stat data, then the least recently used entries
+        until the directory holds at most max_bytes. The entry keep is never deleted."""
+        groups: dict[tuple[str, str], list[tuple[Path, os.stat_result]]] = {}
+        stale = []
+        try:
+            for path in self.cache_dir.iterdir():
+                match = self._FILE_PATTERN.match(path.name)
+                if match is None:
+                    continue
+                if match["digest"] != self.stat_digest[:8]:
+                    stale.append(path)
+                    continue
+                groups.setdefault((match["kind"], match["key"]), []).append((path, path.stat()))
+        except OSError as e:
+            logger.warning(f"Failed to list the solver cache: {e}")
+            return
+
+        # Oldest first, by the last time any file of the entry was written or loaded.
+        entries = sorted(groups.items(), key=lambda item: max(st.st_mtime for _, st in item[1]))
+        total = sum(st.st_size for _, files in entries for _, st in files)
+        for (_, key), files in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            stale.extend(path for path, _ in files)
+            total -= sum(st.st_size for _, st in files)
+
+        removed = 0
+        for path in stale:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                # Still memory-mapped on Windows; it goes on a later prune.
+                pass
+        if removed:
+            logger.info(f"Pruned {removed} solver cache files")
+
+    def sync(self, kind: str, parts: dict, count: int, load_fn, export_fn):
+        """Make sure the backend table described by parts is populated.
+
+        On the first request in a session the table is seeded from disk through load_fn,
+        or computed with export_fn and written to disk if no entry exists yet.
+        """
+        key = self.key(kind, **parts)
+        with self._lock:
+            if key in self._synced:
+                self._synced.move_to_end(key)
+                return
+            self._synced[key] = None
+            if len(self._synced) > self.max_synced:
+                self._synced.popitem(last=False)
+
+        arrays = self.load(kind, key, count)
+        if arrays is not None:
+            try:
+                load_fn(*arrays)
+                return
+            except (RuntimeError, ValueError) as e:
+                logger.warning(f"Discarding invalid solver cache entry {kind}-{key}: {e}")
+        self.save(kind, key, *export_fn())
@@ -3,6 +3,7 @@ import time
 
 from toolbox.tasks.echo_task import EchoTask, Page
 from toolbox.core.profile import EchoProfile
+from toolbox.core.inventory import EchoInventory
 from toolbox.utils.ocr import detect_and_merge_rectangles_pil, ocr_pattern
 from toolbox.utils.logger import logger
 
@@ -14,7 +15,11 @@ class EchoDiscard(EchoTask):
         self.interaction.ensure_connected()
         logger.info(f"Discarding selected echos: {discard_list}")
 
-        discard_list_hash = [hash(profile) for profile in discard_list]
+        # Looked up by content hash for every scanned echo.
+        discard_inventory = EchoInventory.from_profiles(discard_list)
+        # Cells whose level badge shows none of these levels are skipped without a click.
+        # Level 0 is always clicked: the panel, not the badge, decides where the pass ends.
+        click_levels = {profile.level for profile in discard_list} | {0}
 
         self.to_page(Page.MAIN)
 
@@ -36,8 +41,13 @@ class EchoDiscard(EchoTask):
 
         boxes = detect_and_merge_rectangles_pil(screenshot)
         num_checked = 0
+        badge_levels = self.read_level_badges(self.box_centers(boxes, left_top))
+
+        for box, level in zip(boxes, badge_levels):
+            if level is not None and level not in click_levels:
+                num_checked += 1
+                continue
 
-        for box in boxes:
             x, y, w, h = box
             self.interaction.click((x + w / 2) / width + left_top[0], (y + h / 2) / height + left_top[1])
 
@@ -50,7 +60,7 @@ class EchoDiscard(EchoTask):
                         return
                     
                     num_checked += 1
-                    if hash(profile) in discard_list_hash:
+                    if profile in discard_inventory:
                         discard()
                     break
 
@@ -78,8 +88,13 @@ class EchoDiscard(EchoTask):
                     _tmp_screenshot = self.interaction.screenshot_region(left_top[0], left_top[1], 
                             right_bottom[0], right_bottom[1] + 0.1)
                     boxes = detect_and_merge_rectangles_pil(_tmp_screenshot)
+                    badge_levels = self.read_level_badges(self.box_centers(boxes, left_top))
+
+                    for box, level in zip(boxes, badge_levels):
+                        if level is not None and level not in click_levels:
+                            num_checked += 1
+                            continue
 
-                    for box in boxes:
                         x, y, w, h = box
                         self.interaction.click((x + w / 2) / width + left_top[0], (y + h / 2) / height + left_top[1])
 
@@ -93,7 +108,7 @@ class EchoDiscard(EchoTask):
                                     return
 
                                 num_checked += 1
-                                if hash(profile) in discard_list_hash:
+                                if profile in discard_inventory:
                                     discard()
                                 break
 
@@ -1,13 +1,49 @@
 import subprocess
+import threading
 import time
 import keyboard
 import win32gui
+import numpy as np
+from PIL import Image
 from toolbox.core.profile import DiscardScheduler, EchoProfile, EntryCoef
-from toolbox.tasks.echo_task import EchoTask
+from toolbox.tasks.echo_task import PAGE_TITLES, EchoTask
 from toolbox.utils.logger import logger
 from toolbox.utils.ocr import setup_ocr
 from toolbox.utils.generic import get_assets_dir
 
+# Polling interval of the HUD loop: reset to the minimum on a change or a key press and
+# stretched by the backoff factor after every frame where nothing changed.
+MIN_POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+POLL_BACKOFF = 1.5
+# Regions watched by the HUD loop, as (x_0, y_0, x_1, y_1) ratios of the window.
+HEADER_REGION = PAGE_TITLES[0][1]
+PANEL_REGION = (0.7356, 0.1264, 0.952, 0.458)
+
+class RegionWatch:
+    """Tells whether a screen region changed since it was last read.
+
+    Frames are compared on a grayscale copy downscaled by an integer factor, which is
+    cheap next to OCR but keeps the digits of the panel legible. A frame has changed when
+    any of its pixels moves by more than the tolerance.
+    """
+
+    def __init__(self, factor: int = 2, tolerance: int = 16):
+        self.factor = factor
+        self.tolerance = tolerance
+        self.fingerprint = None
+
+    def changed(self, image: Image.Image) -> bool:
+        fingerprint = np.asarray(image.convert("L").reduce(self.factor), dtype=np.int16)
+        if self.fingerprint is not None and self.fingerprint.shape == fingerprint.shape \
+                and np.abs(fingerprint - self.fingerprint).max() <= self.tolerance:
+            return False
+        self.fingerprint = fingerprint
+        return True
+
+    def reset(self):
+        self.fingerprint = None
+
 class EchoManipulate(EchoTask):
     def run(self, coef: EntryCoef, score_thres: float, scheduler: DiscardScheduler, work_state: dict, locked_keys: list = None):
         self.interaction.ensure_connected()
@@ -25,19 +61,29 @@ class EchoManipulate(EchoTask):
 
         press_count = 0
         
-        current_profile, current_state = None, "clear"
+        current_profile, current_state, current_prob = None, "clear", None
         supress = False
+        last_line = None
+        widget_lock = threading.Lock()
         def update_widget_state(state: str, prob: float = None):
-            nonlocal current_state
-            current_state = state
-            if supress or state == "clear":
-                widget_subprocess.stdin.write(f"clear\n")
-            else:
-                widget_subprocess.stdin.write(f"{current_state} {prob}\n")
-            widget_subprocess.stdin.flush()
+            nonlocal current_state, current_prob, last_line
+            with widget_lock:
+                current_state = state
+                if prob is not None:
+                    current_prob = prob
+                line = "clear\n" if supress or state == "clear" else f"{current_state} {current_prob}\n"
+                # The widget redraws on every line, so only write when the HUD actually changes.
+                if line == last_line:
+                    return
+                last_line = line
+                widget_subprocess.stdin.write(line)
+                widget_subprocess.stdin.flush()
 
+        # Set on key presses to wake the HUD loop from its polling sleep.
+        wake = threading.Event()
         def on_key_press(event):
             nonlocal press_count, supress
+            wake.set()
             if event.name.lower() == 'f':
                 press_count += 1
                 if press_count % 2 == 1:
@@ -70,14 +116,46 @@ class EchoManipulate(EchoTask):
 
         keyboard.on_press(on_key_press)
         
+        def crop(screenshot: Image.Image, region: tuple[float, float, float, float]) -> Image.Image:
+            width, height = self.interaction.get_app_window_size()
+            x_0, y_0, x_1, y_1 = region
+            return screenshot.crop((int(width * x_0), int(height * y_0), int(width * x_1), int(height * y_1)))
+
+        # OCR and analysis only run when the header or the panel changed on screen.
+        header_watch, panel_watch = RegionWatch(), RegionWatch()
+        in_main_page = False
+        # Set after an invalid read: the panel is read again even if it did not change.
+        retry_panel = False
+        interval = MIN_POLL_INTERVAL
+        
         try:
             while True:
                 if work_state["cancel_requested"]:
                     break
 
-                if self.is_in_main_page():
-                    profile_img = self.interaction.screenshot_region(0.7356, 0.1264, 0.952, 0.458)
-                    profile = EchoProfile().from_image(profile_img)
+                if wake.wait(interval):
+                    wake.clear()
+                    interval = MIN_POLL_INTERVAL
+
+                screenshot = self.interaction.screenshot()
+                header_changed = header_watch.changed(crop(screenshot, HEADER_REGION))
+                if header_changed:
+                    in_main_page = self.shows_main_page(screenshot)
+                    if not in_main_page:
+                        # Re-read the panel when coming back to the main page.
+                        panel_watch.reset()
+                        retry_panel = False
+
+                panel_img = crop(screenshot, PANEL_REGION)
+                panel_changed = in_main_page and panel_watch.changed(panel_img)
+                interval = MIN_POLL_INTERVAL if header_changed or panel_changed else min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+                # Retries of an unchanged panel back off with the interval like idle frames.
+                if not header_changed and not panel_changed and not retry_panel:
+                    continue
+                retry_panel = False
+
+                if in_main_page:
+                    profile = EchoProfile().from_image(panel_img)
                     if profile != current_profile:
                         current_profile = profile
                         if profile.validate():
@@ -89,7 +167,9 @@ class EchoManipulate(EchoTask):
                             else:
                                 update_widget_state("ok", prob)
                         else:
+                            # Mid-animation or misread: read the panel again on a later poll.
                             current_profile = None
+                            retry_panel = True
                             update_widget_state("clear")
                 else:
                     current_profile = None
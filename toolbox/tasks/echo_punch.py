@@ -1,6 +1,6 @@
 from toolbox.tasks.echo_task import EchoTask, Page
 from toolbox.core.profile import EchoProfile
-from toolbox.utils.ocr import ocr_pattern, ocr
+from toolbox.utils.ocr import ocr_line, ocr_pattern, ocr
 from toolbox.utils.logger import logger
 from toolbox.core.interaction import Element
 import time
@@ -25,7 +25,8 @@ class EchoPunch(EchoTask):
         time.sleep(0.5)
 
         screenshot = self.interaction.screenshot_region(0.466, 0.18, 0.534, 0.212)
-        if len(ocr_pattern(screenshot, "不足")) > 0:
+        line = ocr_line(screenshot)
+        if line is not None and "不足" in line.text:
             logger.critical("Not enough materials") 
             raise Exception("Not enough materials")
 
@@ -101,9 +102,14 @@ class EchoPunch(EchoTask):
         self.interaction.click_ocr("调谐", region=(0, 0.87, 0.5, 1))
         time.sleep(1)
 
+        attempt = 0
         while True:
             screenshot = self.interaction.screenshot_region(0.346, 0.371, 0.679, 0.402)
-            entry_str = ocr(screenshot)
+            # The new entry is a single line at a fixed place: the recognizer alone reads it,
+            # with the full pipeline as the fallback when that fails.
+            line = ocr_line(screenshot) if attempt == 0 else None
+            entry_str = line.text if line is not None else ocr(screenshot)
+            attempt += 1
 
             result_profile = profile.upgrade(level, entry_str)
             if result_profile is not None:
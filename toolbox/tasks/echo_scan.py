@@ -3,17 +3,70 @@ import time
 
 from toolbox.tasks.echo_task import EchoTask, Page
 from toolbox.core.profile import EchoProfile
+from toolbox.core.inventory_store import InventoryStore, GridMatcher, grid_fingerprint
 from toolbox.utils.ocr import detect_and_merge_rectangles_pil, ocr_pattern
 from toolbox.utils.logger import logger
 
 class EchoScan(EchoTask):
     """
     Scan all the echos in the main page and return the list of profiles.
+
+    With a store, cells whose grid appearance did not change since the last scan of the
+    same view are taken from the store instead of being clicked and read, and the scan
+    is saved back to the store when it finishes.
     """
-    def run(self) -> list[EchoProfile]:
+    def run(self, store: InventoryStore = None, view: str = "") -> list[EchoProfile]:
         self.interaction.ensure_connected()
         logger.info("Scanning all echos in the main page")
 
+        self.matcher = GridMatcher(store.grid(view) if store is not None else [])
+        # (fingerprint, echo id or None, profile) of every scanned cell, for the store.
+        self.cells = []
+        profiles = self._scan()
+
+        num_reused = sum(1 for _, echo_id, _ in self.cells if echo_id is not None)
+        logger.info(f"Scanned {len(profiles)} echos, {num_reused} of them unchanged since the last scan")
+        if store is not None:
+            store.save_scan(view, self.cells)
+        return profiles
+
+    def _scan_cell(self, screenshot, boxes, index: int, left_top, width: int, height: int) -> EchoProfile | None:
+        """Profile of the echo in the grid cell boxes[index], None for an echo that is not upgraded."""
+        def fingerprint_of(box):
+            x, y, w, h = box
+            return grid_fingerprint(screenshot.crop((x, y, x + w, y + h)))
+
+        x, y, w, h = boxes[index]
+        position = len(self.cells)
+        fingerprint = fingerprint_of(boxes[index])
+        neighbours = []
+        if self.cells:
+            neighbours.append(self.cells[-1][0])
+        if index + 1 < len(boxes):
+            neighbours.append(fingerprint_of(boxes[index + 1]))
+        cell = self.matcher.match(position, fingerprint, neighbours)
+        if cell is not None:
+            self.cells.append((fingerprint, cell.echo_id, cell.profile))
+            return cell.profile
+
+        self.interaction.click((x + w / 2) / width + left_top[0], (y + h / 2) / height + left_top[1])
+
+        while True:
+            profile_img = self.interaction.screenshot_region(0.7356, 0.1264, 0.952, 0.458)
+            profile = EchoProfile().from_image(profile_img)
+
+            if profile.validate():
+                if profile.level == 0:
+                    return None
+
+                self.matcher.resync(position, fingerprint, profile)
+                self.cells.append((fingerprint, None, profile))
+                return profile
+
+            time.sleep(1)
+
+    def _scan(self) -> list[EchoProfile]:
+
         # 1. Ensure we are in the echo inspection page 
         self.to_page(Page.MAIN)
 
@@ -32,24 +85,13 @@ class EchoScan(EchoTask):
 
         boxes = detect_and_merge_rectangles_pil(screenshot)
 
-        for box in boxes:
-            x, y, w, h = box
-            self.interaction.click((x + w / 2) / width + left_top[0], (y + h / 2) / height + left_top[1])
-
-            while True:
-                profile_img = self.interaction.screenshot_region(0.7356, 0.1264, 0.952, 0.458)
-                profile = EchoProfile().from_image(profile_img)
+        for index in range(len(boxes)):
+            profile = self._scan_cell(screenshot, boxes, index, left_top, width, height)
+            if profile is None:
+                # all following echos are not upgraded yet, skip the rest and return
+                return profiles
+            profiles.append(profile)
 
-                if profile.validate():
-                    if profile.level == 0:
-                        # all following echos are not upgraded yet, skip the rest and return
-                        return profiles
-                        
-                    profiles.append(profile)
-                    break
-
-                time.sleep(1)
-            
         if len(profiles) < 15:
             # this indicates all echos have been scanned 
             logger.info("All echos have been scanned.")
@@ -76,24 +118,13 @@ class EchoScan(EchoTask):
                             right_bottom[0], right_bottom[1] + 0.1)
                     boxes = detect_and_merge_rectangles_pil(_tmp_screenshot)
 
-                    for box in boxes:
-                        x, y, w, h = box
-                        self.interaction.click((x + w / 2) / width + left_top[0], (y + h / 2) / height + left_top[1])
-
+                    for index in range(len(boxes)):
                         # extract the echo profile 
-                        while True:
-                            profile_img = self.interaction.screenshot_region(0.7356, 0.1264, 0.952, 0.458)
-                            profile = EchoProfile().from_image(profile_img)
-
-                            if profile.validate():
-                                if profile.level == 0:
-                                    # all following echos are not upgraded yet, skip the rest and return
-                                    return profiles
-
-                                profiles.append(profile)
-                                break
-
-                            time.sleep(1)
+                        profile = self._scan_cell(_tmp_screenshot, boxes, index, left_top, width, height)
+                        if profile is None:
+                            # all following echos are not upgraded yet, skip the rest and return
+                            return profiles
+                        profiles.append(profile)
 
                     self.interaction.scroll(0.192, 0.544, 4)
 
@@ -108,8 +139,6 @@ class EchoScan(EchoTask):
             # we reach the bottom of the whole page
             if continuous_valid_lines >= 20 or continuous_invalid_lines >= 20:
                 break
-        
-        logger.info(f"Scanned {len(profiles)} echos")
 
         return profiles
         
@@ -63,17 +63,18 @@ class EchoSearch(EchoTask):
             boxes = detect_and_merge_rectangles_pil(screenshot)
             
             num_checked = 0
+            badge_levels = self.read_level_badges(self.box_centers(boxes, left_top))
 
-            for box in boxes:
+            for box_index, box in enumerate(boxes):
                 x, y, w, h = box
                 x_ratio = (x + w / 2) / width + left_top[0]
                 y_ratio = (y + h / 2) / height + left_top[1]
 
                 num_checked += 1
-                level = None
                     
-                # quick check on the level 
-                for _ in range(5):
+                # quick check on the level, read for the whole page at once; retry the cells that failed
+                level = badge_levels[box_index]
+                for _ in range(0 if level is not None else 5):
                     if work_state["cancel_requested"]: return None
 
                     _screenshot = self.interaction.screenshot_region(x_ratio - 0.05, y_ratio + 0.01, x_ratio + 0.05, y_ratio + 0.05)
@@ -125,15 +126,15 @@ class EchoSearch(EchoTask):
 
                 if len(boxes) > 0:
                     if last_line_valid is False:
-                        for box in boxes:
+                        badge_levels = self.read_level_badges(self.box_centers(boxes, left_top))
+                        for box_index, box in enumerate(boxes):
                             x, y, w, h = box
                             x_ratio = (x + w / 2) / width + left_top[0]
                             y_ratio = (y + h / 2) / height + left_top[1]
 
-                            level = None
-
-                            # quick check on the level 
-                            for _ in range(5):
+                            # quick check on the level, read for the whole page at once; retry the cells that failed
+                            level = badge_levels[box_index]
+                            for _ in range(0 if level is not None else 5):
                                 if work_state["cancel_requested"]: return None
                                 
                                 _screenshot = self.interaction.screenshot_region(x_ratio - 0.05, y_ratio + 0.01, x_ratio + 0.05, y_ratio + 0.05)
@@ -1,8 +1,9 @@
 from enum import Enum
+import re
 import time
 from toolbox.core.interaction import Element
 from toolbox.tasks.base_task import BaseTask
-from toolbox.utils.ocr import ocr_pattern
+from toolbox.utils.ocr import ocr_line, ocr_numbers, ocr_pattern
 from toolbox.utils.logger import logger
 
 class Page(Enum):
@@ -12,6 +13,19 @@ class Page(Enum):
     UPGRADE = 3
     TUNE = 4
 
+# Title of every page and the (x_0, y_0, x_1, y_1) region of the window that shows it,
+# in the order the pages are checked.
+PAGE_TITLES = [
+    (Page.MAIN, (0.8, 0, 1, 0.1), "简述"),
+    (Page.UPGRADE, (0, 0, 0.2, 0.1), "强化"),
+    (Page.TUNE, (0, 0, 0.2, 0.1), "调谐"),
+    (Page.SORT, (0, 0, 0.2, 0.2), "排序"),
+    (Page.FILTER, (0, 0, 0.094, 0.134), "筛选"),
+]
+
+# Region of the "+N" level badge of a grid cell, relative to the center of the cell.
+LEVEL_BADGE_OFFSET = (-0.05, 0.01, 0.05, 0.05)
+
 class EchoTask(BaseTask):
     def __init__(self):
         super().__init__()
@@ -38,30 +52,58 @@ class EchoTask(BaseTask):
             },
         }
     
-    def is_in_main_page(self) -> bool:
-        screenshot = self.interaction.screenshot()
+    def _has_title(self, screenshot, region: tuple[float, float, float, float], title: str, fast: bool) -> bool:
         width, height = self.interaction.get_app_window_size()
-        return len(ocr_pattern(screenshot.crop((width * 0.8, 0, width, height * 0.1)), "简述")) > 0
-    
-    def current_page(self) -> Page:
-        screenshot = self.interaction.screenshot()
+        crop = screenshot.crop((width * region[0], height * region[1], width * region[2], height * region[3]))
+        if fast:
+            # The titles sit at fixed places, so the recognizer alone usually reads them.
+            line = ocr_line(crop)
+            return line is not None and title in line.text
+        return len(ocr_pattern(crop, title)) > 0
 
+    def box_centers(self, boxes: list[tuple[int, int, int, int]], left_top: tuple[float, float]) -> list[tuple[float, float]]:
+        """Centers, as ratios of the window, of the boxes detected in a region screenshot."""
         width, height = self.interaction.get_app_window_size()
+        return [((x + w / 2) / width + left_top[0], (y + h / 2) / height + left_top[1]) for x, y, w, h in boxes]
 
-        if len(ocr_pattern(screenshot.crop((width * 0.8, 0, width, height * 0.1)), "简述")) > 0:
-            return Page.MAIN
+    def read_level_badges(self, centers: list[tuple[float, float]]) -> list[int | None]:
+        """
+        Read the level badges of grid cells from one screenshot, with glyph templates and one
+        recognizer pass for the badges they could not read.
+        Args:
+            centers (list[tuple[float, float]]): The center of every cell, as ratios of the window.
+        Returns:
+            list[int | None]: The level of every cell, None where the badge could not be read.
+        """
+        if not centers:
+            return []
+        screenshot = self.interaction.screenshot()
+        width, height = self.interaction.get_app_window_size()
+        x_0, y_0, x_1, y_1 = LEVEL_BADGE_OFFSET
+        boxes = [(int(width * (x + x_0)), int(height * (y + y_0)), int(width * (x + x_1)), int(height * (y + y_1)))
+                 for x, y in centers]
 
-        if len(ocr_pattern(screenshot.crop((0, 0, width * 0.2, height * 0.1)), "强化")) > 0:
-            return Page.UPGRADE
+        levels = []
+        for line in ocr_numbers([screenshot.crop(box) for box in boxes], (width, height)):
+            match = re.match(r"\+(\d+)", line.text) if line is not None else None
+            levels.append(int(match.group(1)) if match else None)
+        return levels
 
-        if len(ocr_pattern(screenshot.crop((0, 0, width * 0.2, height * 0.1)), "调谐")) > 0:
-            return Page.TUNE
+    def shows_main_page(self, screenshot) -> bool:
+        _, region, title = PAGE_TITLES[0]
+        return self._has_title(screenshot, region, title, fast=True) or self._has_title(screenshot, region, title, fast=False)
 
-        if len(ocr_pattern(screenshot.crop((0, 0, width * 0.2, height * 0.2)), "排序")) > 0:
-            return Page.SORT
+    def is_in_main_page(self) -> bool:
+        return self.shows_main_page(self.interaction.screenshot())
+    
+    def current_page(self) -> Page:
+        screenshot = self.interaction.screenshot()
 
-        if len(ocr_pattern(screenshot.crop((0, 0, width * 0.094, height * 0.134)), "筛选")) > 0:
-            return Page.FILTER
+        # Only run the detection pipeline when no title was recognized on the fast path.
+        for fast in (True, False):
+            for page, region, title in PAGE_TITLES:
+                if self._has_title(screenshot, region, title, fast):
+                    return page
         
         logger.critical("Unknown page")
         raise Exception("Unknown page")
@@ -0,0 +1,174 @@
+from pathlib import Path
+from toolbox.utils.logger import logger
+
+import re
+import threading
+import numpy as np
+import cv2
+
+# Characters the recognizer reads: game numbers such as "+25", "10.5%" or "50".
+GLYPH_CHARS = "0123456789+.%"
+# Size every glyph is resampled to before the correlation, as (height, width).
+GLYPH_SIZE = (24, 16)
+# Templates kept per character and resolution; later samples replace the oldest.
+MAX_TEMPLATES = 4
+# Largest log-ratio between the aspect of a glyph and of the template it matches.
+_MAX_ASPECT_RATIO = 0.4
+# Components smaller than this many pixels are noise.
+_MIN_COMPONENT_AREA = 2
+
+def _segment(gray: np.ndarray) -> list[np.ndarray] | None:
+    """Split a single-line crop into glyphs, each resampled to GLYPH_SIZE over the line height.
+
+    Keeping the line height, instead of cropping every glyph to its own box, keeps the
+    vertical position that tells "." from the digits and "+" from "-".
+    """
+    background = np.median(np.concatenate([gray[0], gray[-1], gray[:, 0], gray[:, -1]]))
+    distance = np.abs(gray.astype(np.float32) - background).astype(np.uint8)
+    if distance.max() < 32:
+        return None
+    _, mask = cv2.threshold(distance, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    components = [stats[i] for i in range(1, count) if stats[i][cv2.CC_STAT_AREA] >= _MIN_COMPONENT_AREA]
+    if not components:
+        return None
+
+    # Components that overlap horizontally belong to one glyph, e.g. the three parts of "%".
+    spans = []
+    for x, _, w, _, _ in sorted(components, key=lambda stat: stat[cv2.CC_STAT_LEFT]):
+        if spans and x < spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], x + w)
+        else:
+            spans.append([x, x + w])
+    top = min(stat[cv2.CC_STAT_TOP] for stat in components)
+    bottom = max(stat[cv2.CC_STAT_TOP] + stat[cv2.CC_STAT_HEIGHT] for stat in components)
+
+    glyphs = []
+    for x_0, x_1 in spans:
+        glyph = mask[top:bottom, x_0:x_1].astype(np.float32) / 255
+        glyphs.append((cv2.resize(glyph, GLYPH_SIZE[::-1], interpolation=cv2.INTER_AREA), (x_1 - x_0) / (bottom - top)))
+    return glyphs
+
+def _normalize(features: np.ndarray) -> np.ndarray:
+    features = features - features.mean(axis=-1, keepdims=True)
+    return features / np.maximum(np.linalg.norm(features, axis=-1, keepdims=True), 1e-6)
+
+class GlyphSet:
+    """Templates of the glyphs at one window resolution."""
+
+    def __init__(self):
+        self.chars: list[str] = []
+        # One row per template: the resampled glyph, zero-mean and unit-norm.
+        self.templates = np.zeros((0, GLYPH_SIZE[0] * GLYPH_SIZE[1]), dtype=np.float32)
+        # Width over line height of every template.
+        self.aspects = np.zeros(0, dtype=np.float32)
+
+    def add(self, char: str, glyph: np.ndarray, aspect: float):
+        same = [i for i, c in enumerate(self.chars) if c == char]
+        if len(same) >= MAX_TEMPLATES:
+            keep = np.ones(len(self.chars), dtype=bool)
+            keep[same[0]] = False
+            self.chars = [c for c, k in zip(self.chars, keep) if k]
+            self.templates, self.aspects = self.templates[keep], self.aspects[keep]
+        self.chars.append(char)
+        self.templates = np.vstack([self.templates, _normalize(glyph.reshape(1, -1))])
+        self.aspects = np.append(self.aspects, np.float32(aspect))
+
+    def covers(self, text: str) -> bool:
+        return set(text) <= set(self.chars)
+
+class GlyphRecognizer:
+    """Reads numbers in the fixed game font by correlating glyphs with templates.
+
+    There are no shipped templates: every resolution starts empty and is calibrated from
+    the crops the neural OCR reads with confidence (see learn), after which reads of that
+    resolution take a fraction of a millisecond. The glyph sets are kept in cache_dir so
+    that calibration survives restarts.
+    """
+
+    def __init__(self, cache_dir: Path, min_confidence: float = 0.85):
+        self.cache_dir = Path(cache_dir)
+        self.min_confidence = min_confidence
+        self._sets: dict[tuple[int, int], GlyphSet] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, resolution: tuple[int, int]) -> Path:
+        return self.cache_dir / f"glyphs-{resolution[0]}x{resolution[1]}.npz"
+
+    def _glyph_set(self, resolution: tuple[int, int]) -> GlyphSet:
+        glyph_set = self._sets.get(resolution)
+        if glyph_set is None:
+            glyph_set = GlyphSet()
+            path = self._path(resolution)
+            if path.exists():
+                try:
+                    data = np.load(path)
+                    glyph_set.chars = list(str(data["chars"]))
+                    glyph_set.templates, glyph_set.aspects = data["templates"], data["aspects"]
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable glyph set {path.name}: {e}")
+                    glyph_set = GlyphSet()
+            self._sets[resolution] = glyph_set
+        return glyph_set
+
+    def read(self, image, resolution: tuple[int, int]) -> tuple[str, float] | None:
+        """
+        Read a single-line numeric crop.
+        Args:
+            image (PIL.Image.Image): The crop around the number.
+            resolution (tuple[int, int]): Size of the game window the crop was taken from.
+        Returns:
+            tuple[str, float] | None: The text and the lowest correlation over its glyphs, None
+                if the crop could not be segmented or the resolution is not calibrated.
+        """
+        with self._lock:
+            glyph_set = self._glyph_set(resolution)
+        if len(glyph_set.chars) == 0:
+            return None
+        glyphs = _segment(np.asarray(image.convert("L")))
+        if not glyphs:
+            return None
+
+        features = _normalize(np.stack([glyph.reshape(-1) for glyph, _ in glyphs]))
+        aspects = np.array([aspect for _, aspect in glyphs], dtype=np.float32)
+        scores = features @ glyph_set.templates.T
+        # A narrow "1" correlates well with the stems of wider glyphs: compare shapes of similar width only.
+        scores[np.abs(np.log(aspects[:, None] / glyph_set.aspects[None, :])) > _MAX_ASPECT_RATIO] = -1
+        best = scores.argmax(axis=1)
+        text = "".join(glyph_set.chars[i] for i in best)
+        return text, float(scores[np.arange(len(best)), best].min())
+
+    def learn(self, image, text: str, resolution: tuple[int, int]) -> bool:
+        """
+        Add the glyphs of a crop read by the neural OCR to the templates of its resolution.
+        The crop is only used when it splits into exactly one glyph per character of text.
+        Returns:
+            bool: Whether the crop was used.
+        """
+        text = text.replace(" ", "")
+        if not text or not re.fullmatch(f"[{re.escape(GLYPH_CHARS)}]+", text):
+            return False
+        glyphs = _segment(np.asarray(image.convert("L")))
+        if glyphs is None or len(glyphs) != len(text):
+            return False
+
+        with self._lock:
+            glyph_set = self._glyph_set(resolution)
+            new_chars = not glyph_set.covers(text)
+            for char, (glyph, aspect) in zip(text, glyphs):
+                glyph_set.add(char, glyph, aspect)
+            self._save(resolution, glyph_set)
+        if new_chars:
+            logger.info(f"Calibrated glyphs {''.join(sorted(set(glyph_set.chars)))} at {resolution[0]}x{resolution[1]}")
+        return True
+
+    def _save(self, resolution: tuple[int, int], glyph_set: GlyphSet):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(resolution)
+            tmp_path = path.with_suffix(".tmp.npz")
+            np.savez(tmp_path, chars=np.array("".join(glyph_set.chars)), templates=glyph_set.templates, aspects=glyph_set.aspects)
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"Failed to save the glyph set for {resolution[0]}x{resolution[1]}: {e}")
@@ -1,17 +1,97 @@
 from rapidocr import RapidOCR, EngineType
+from rapidocr.ch_ppocr_rec import TextRecInput
 from PIL import Image, ImageFilter, ImageEnhance
+from collections import OrderedDict
 from dataclasses import dataclass
 from toolbox.utils.logger import logger
+from toolbox.utils.generic import get_project_root
+from toolbox.utils.glyph import GlyphRecognizer
 
+import hashlib
 import math
 import re
+import threading
 import numpy as np
 import cv2
 import random
 
 engine = None
 
-def setup_ocr():
+class OCRCache:
+    """Bounded LRU cache of engine results, keyed by the preprocessed image.
+
+    The tasks poll the same panels and headers in loops, so most OCR calls see pixels that
+    were already read. By default an entry is only reused for byte-identical pixels. In
+    perceptual mode, an image also reuses the entry of a same-sized image whose difference
+    hash is within max_distance bits, which absorbs rendering noise but may also hide
+    small changes such as a single digit, so it is off by default.
+    """
+
+    def __init__(self, max_size: int = 256, perceptual: bool = False, max_distance: int = 2):
+        self.max_size = max_size
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple] = OrderedDict()
+        # Difference hash of every entry, for the perceptual lookup.
+        self._dhashes: dict[bytes, tuple[str, tuple[int, ...], int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(pixels: np.ndarray, kind: str) -> bytes:
+        h = hashlib.blake2b(np.array(pixels.shape, dtype=np.int64).tobytes(), digest_size=16, person=kind.encode())
+        h.update(np.ascontiguousarray(pixels).data)
+        return h.digest()
+
+    @staticmethod
+    def _dhash(pixels: np.ndarray) -> int:
+        gray = cv2.resize(cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+        return int(np.packbits(bits).view(">u8")[0])
+
+    def get(self, pixels: np.ndarray, kind: str = "det") -> tuple | None:
+        """Cached result for the pixels, kind telling apart the pipelines run on them."""
+        key = self._key(pixels, kind)
+        with self._lock:
+            if key not in self._entries and self.perceptual:
+                dhash = self._dhash(pixels)
+                key = next((k for k, (entry_kind, shape, h) in self._dhashes.items()
+                            if entry_kind == kind and shape == pixels.shape and bin(h ^ dhash).count("1") <= self.max_distance), key)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, pixels: np.ndarray, result: tuple, kind: str = "det"):
+        key = self._key(pixels, kind)
+        dhash = self._dhash(pixels) if self.perceptual else None
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if dhash is not None:
+                self._dhashes[key] = (kind, pixels.shape, dhash)
+            while len(self._entries) > self.max_size:
+                old_key, _ = self._entries.popitem(last=False)
+                self._dhashes.pop(old_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dhashes.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0}
+
+ocr_cache = OCRCache()
+glyph_recognizer = GlyphRecognizer(get_project_root() / "cache")
+
+def setup_ocr(cache_size: int = 256, perceptual_cache: bool = False):
     global engine
     engine = RapidOCR(
         params={
@@ -20,6 +100,9 @@ def setup_ocr():
             "Rec.engine_type": EngineType.OPENVINO,
         }
     )
+    ocr_cache.max_size = cache_size
+    ocr_cache.perceptual = perceptual_cache
+    ocr_cache.clear()
 
 @dataclass
 class OCRResult:
@@ -27,6 +110,21 @@ class OCRResult:
     box: tuple[int, int, int, int]
     confidence: float
 
+def _run_engine(image: Image.Image) -> tuple[list, list, list]:
+    """Texts, boxes and scores the engine reads in an image, served from ocr_cache when possible."""
+    pixels = np.array(image.convert("L").convert("RGB").filter(ImageFilter.SHARPEN))
+    cached = ocr_cache.get(pixels, kind="det")
+    if cached is not None:
+        return cached
+
+    # The engine keeps the stage flags of its last call, so set them every time.
+    result = engine(pixels, use_det=True, use_cls=True, use_rec=True)
+    texts, boxes, scores = result.txts, result.boxes, result.scores
+    # The engine returns None instead of empty sequences when nothing is detected.
+    cached = (tuple(texts or ()), tuple(boxes if boxes is not None else ()), tuple(scores or ()))
+    ocr_cache.put(pixels, cached, kind="det")
+    return cached
+
 def ocr(image: Image.Image, split: str = ' ') -> str:
     """
     Perform OCR on a PIL Image and return the detected text.
@@ -35,9 +133,7 @@ def ocr(image: Image.Image, split: str = ' ') -> str:
     Returns:
         str: The text detected in the image.
     """
-    image = image.convert("L").convert("RGB").filter(ImageFilter.SHARPEN)
-    result = engine(np.array(image))
-    texts, boxes = result.txts, result.boxes
+    texts, boxes, _ = _run_engine(image)
 
     predicted = ""
     last_right_bottom_y = 0
@@ -68,9 +164,7 @@ def ocr_pattern(image: Image.Image, pattern: str) -> list[OCRResult]:
     except re.error:
         raise ValueError(f'Invalid pattern: {pattern}')
 
-    image = image.convert("L").convert("RGB").filter(ImageFilter.SHARPEN)
-    result = engine(np.array(image))
-    texts, boxes, scores = result.txts, result.boxes, result.scores
+    texts, boxes, scores = _run_engine(image)
 
     results = []
     try:
@@ -83,6 +177,103 @@ def ocr_pattern(image: Image.Image, pattern: str) -> list[OCRResult]:
 
     return results
 
+def _normalize_line(image: Image.Image) -> np.ndarray:
+    """Grayscale, sharpened crop with a margin around the text, as the recognizer expects."""
+    image = image.convert("L").filter(ImageFilter.SHARPEN)
+    # Tight crops cut into the glyphs at the borders; pad with the border color instead.
+    pixels = cv2.copyMakeBorder(np.array(image), 4, 4, 4, 4, cv2.BORDER_REPLICATE)
+    return cv2.cvtColor(pixels, cv2.COLOR_GRAY2RGB)
+
+def ocr_lines(images: list[Image.Image]) -> list[OCRResult | None]:
+    """
+    Read crops that each hold a single line of text with the recognizer alone.
+    Text detection and angle classification are skipped, which makes this many times
+    faster than ocr() but only valid for fixed layouts where a crop is known to contain
+    one horizontal line. The crops missing from the cache go through the recognizer
+    in a single call, which batches them.
+    Args:
+        images (list[PIL.Image.Image]): The crops around the lines.
+    Returns:
+        list[OCRResult | None]: Per crop, the line with the whole crop as its box, None if
+            nothing was read.
+    """
+    pixels = [_normalize_line(image) for image in images]
+    results = [ocr_cache.get(p, kind="rec") for p in pixels]
+
+    missing = [i for i, cached in enumerate(results) if cached is None]
+    if missing:
+        output = engine.text_rec(TextRecInput(img=[pixels[i] for i in missing]))
+        for i, text, score in zip(missing, output.txts, output.scores):
+            results[i] = (text, float(score))
+            ocr_cache.put(pixels[i], results[i], kind="rec")
+
+    lines = []
+    for image, (text, score) in zip(images, results):
+        lines.append(OCRResult(text.strip(), (0, 0, image.width, image.height), score) if text.strip() else None)
+    return lines
+
+def ocr_line(image: Image.Image) -> OCRResult | None:
+    """
+    Read a crop that holds a single line of text with the recognizer alone, see ocr_lines.
+    Args:
+        image (PIL.Image.Image): The crop around the line.
+    Returns:
+        OCRResult | None: The line with the whole crop as its box, None if nothing was read.
+    """
+    return ocr_lines([image])[0]
+
+def ocr_boxes(image: Image.Image, boxes: list[tuple[int, int, int, int]]) -> list[OCRResult | None]:
+    """
+    Read the single line of text inside every box of one frame, in one batched pass.
+    Args:
+        image (PIL.Image.Image): The frame, e.g. one screenshot of the whole window.
+        boxes (list[tuple[int, int, int, int]]): (x_0, y_0, x_1, y_1) of every line in pixels.
+    Returns:
+        list[OCRResult | None]: Per box, the line with the box as its box, None if nothing was read.
+    """
+    lines = ocr_lines([image.crop(box) for box in boxes])
+    return [OCRResult(line.text, tuple(box), line.confidence) if line is not None else None
+            for line, box in zip(lines, boxes)]
+
+def ocr_numbers(images: list[Image.Image], resolution: tuple[int, int]) -> list[OCRResult | None]:
+    """
+    Read single-line crops that hold a number in the game font, e.g. "+25" or "10.5%".
+    Every crop is first read by glyph_recognizer; the crops it reads with low confidence go
+    through ocr_lines in one call, and the numbers read there calibrate the glyphs of the
+    resolution, so that later reads skip the neural OCR.
+    Args:
+        images (list[PIL.Image.Image]): The crops around the numbers.
+        resolution (tuple[int, int]): Size of the game window the crops were taken from.
+    Returns:
+        list[OCRResult | None]: Per crop, the text with the whole crop as its box, None if
+            nothing was read.
+    """
+    results = []
+    for image in images:
+        read = glyph_recognizer.read(image, resolution)
+        ok = read is not None and read[1] >= glyph_recognizer.min_confidence
+        results.append(OCRResult(read[0], (0, 0, image.width, image.height), read[1]) if ok else None)
+
+    fallback = [i for i, result in enumerate(results) if result is None]
+    if fallback:
+        for i, line in zip(fallback, ocr_lines([images[i] for i in fallback])):
+            results[i] = line
+            if line is not None and line.confidence >= 0.9:
+                glyph_recognizer.learn(images[i], line.text, resolution)
+    return results
+
+def ocr_digits(image: Image.Image) -> int | None:
+    """
+    Read the first number of a single-line crop, e.g. the "+15" level badge.
+    Args:
+        image (PIL.Image.Image): The crop around the line.
+    Returns:
+        int | None: The number, None if the line holds no digits.
+    """
+    result = ocr_line(image)
+    match = re.search(r"\d+", result.text) if result is not None else None
+    return int(match.group(0)) if match else None
+
 def match_single_object_template(
     query_img: Image.Image, 
     target_img: Image.Image, 